@@ -6,3 +6,6 @@ class AuthConfig(AppConfig):
     name = 'apps.auth'
     label = 'transfer_auth'
     verbose_name="Регистрация и аутентификация"
+
+    def ready(self):
+        import apps.auth.signals
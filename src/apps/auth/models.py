@@ -3,6 +3,7 @@ from django.db import models
 from phonenumber_field.modelfields import PhoneNumberField
 
 from .managers import UserManager
+from .permission_cache import get_permission_set
 
 class User(AbstractBaseUser):
     """Кастомная модель пользователя с аутентификацией по phone_number."""
@@ -47,14 +48,16 @@ class User(AbstractBaseUser):
         return f"{self.phone_number} {self.first_name} {self.last_name}"
 
     def has_perm(self, perm, obj=None):
-        """Проверка прав доступа с учетом групп и разрешений"""
+        """
+        Проверка прав доступа с учетом групп и разрешений.
+        Права загружаются один раз на запрос и кэшируются в Redis (см. permission_cache)
+        """
         # Суперпользователи имеют все права
         if self.is_superuser:
             return True
 
         # Проверяем конкретное разрешение
-        return self.user_permissions.filter(codename=perm.split('.')[1]).exists() or \
-            self.groups.filter(permissions__codename=perm.split('.')[1]).exists()
+        return perm.split('.')[1] in get_permission_set(self).codenames
 
     def has_module_perms(self, app_label):
         """Проверка прав доступа к модулю с учетом групп и разрешений"""
@@ -63,8 +66,7 @@ class User(AbstractBaseUser):
             return True
 
         # Проверяем разрешения для указанного приложения
-        return self.user_permissions.filter(content_type__app_label=app_label).exists() or \
-            self.groups.filter(permissions__content_type__app_label=app_label).exists()
+        return app_label in get_permission_set(self).app_labels
 
     class Meta:
         verbose_name = "Пользователь"
@@ -0,0 +1,90 @@
+import logging
+import time
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# Права пользователя (прямые и через группы) кэшируются в Redis одной записью
+# {'version': ..., 'perms': [[app_label, codename], ...]} под ключом PERMISSIONS_KEY.
+# Запись действительна, пока её версия совпадает с версией пользователя (VERSION_KEY):
+# любое изменение групп или разрешений увеличивает версию затронутых пользователей.
+# Версия и запись читаются одним обращением к Redis.
+VERSION_KEY = 'user_perms_version:{}'
+PERMISSIONS_KEY = 'user_perms:{}'
+PERMISSIONS_TIMEOUT = 24 * 60 * 60
+
+
+class PermissionSet:
+    """Действующие права пользователя: коды разрешений и приложения, к которым они относятся"""
+
+    def __init__(self, perms):
+        self.codenames = frozenset(codename for _, codename in perms)
+        self.app_labels = frozenset(app_label for app_label, _ in perms)
+
+
+def _load_permissions(user_id):
+    """Разрешения пользователя, выданные напрямую и через группы, одним запросом"""
+    return [
+        list(perm) for perm in
+        Permission.objects.filter(Q(customuser=user_id) | Q(group__customuser=user_id))
+        .values_list('content_type__app_label', 'codename')
+        .distinct()
+    ]
+
+
+def get_permission_set(user):
+    """
+    Права пользователя. Загружаются один раз на объект пользователя (то есть на запрос),
+    между запросами берутся из Redis и читаются из базы только после изменения прав.
+    """
+    permission_set = getattr(user, '_permission_set', None)
+    if permission_set is not None:
+        return permission_set
+
+    version_key = VERSION_KEY.format(user.pk)
+    permissions_key = PERMISSIONS_KEY.format(user.pk)
+    values = cache.get_many([version_key, permissions_key])
+    version = values.get(version_key)
+    entry = values.get(permissions_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+
+    if entry is not None and entry['version'] == version:
+        perms = entry['perms']
+    else:
+        # Версия прочитана до запроса к базе: если права изменятся во время запроса,
+        # запись окажется со старой версией и будет перечитана
+        perms = _load_permissions(user.pk)
+        cache.set(permissions_key, {'version': version, 'perms': perms}, PERMISSIONS_TIMEOUT)
+        logger.debug(f"Permissions of user {user.pk} loaded from the database")
+
+    user._permission_set = PermissionSet(perms)
+    return user._permission_set
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ версии вытеснен из кэша: начинаем с новой уникальной версии
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_permissions(user_ids):
+    """
+    Сбрасывает кэш прав пользователей. Версии увеличиваются сразу и повторно после коммита
+    транзакции: права, закэшированные конкурентным запросом до коммита, не будут использованы
+    """
+    keys = [VERSION_KEY.format(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    for key in keys:
+        _bump_version(key)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: [_bump_version(key) for key in keys])
+    logger.debug(f"Permission cache invalidated for users {sorted(set(user_ids))}")
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from apps.auth.models import User
+from apps.auth.permission_cache import invalidate_permissions
+
+
+def _user_ids(**filters):
+    return list(User.objects.filter(**filters).values_list('pk', flat=True).distinct())
+
+
+def _invalidate_on_change(instance, action, pk_set, users_of_pk_set, users_of_instance):
+    """
+    Сбрасывает кэш прав пользователей, затронутых изменением связи.
+    При очистке связи её пользователи запоминаются до удаления строк (pre_clear)
+    """
+    if action in ('post_add', 'post_remove'):
+        invalidate_permissions(users_of_pk_set(pk_set))
+    elif action == 'pre_clear':
+        instance._permission_user_ids = users_of_instance(instance)
+    elif action == 'post_clear':
+        invalidate_permissions(getattr(instance, '_permission_user_ids', []))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш прав при изменении групп и разрешений пользователя"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            # Права, загруженные в этот объект пользователя, тоже устарели
+            instance._permission_set = None
+            invalidate_permissions([instance.pk])
+        return
+    # Изменение со стороны группы или разрешения: pk_set — id пользователей
+    if sender is User.groups.through:
+        users_of_instance = lambda group: _user_ids(groups=group.pk)
+    else:
+        users_of_instance = lambda permission: _user_ids(user_permissions=permission.pk)
+    _invalidate_on_change(instance, action, pk_set, list, users_of_instance)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш прав участников групп при изменении разрешений группы"""
+    if not reverse:
+        _invalidate_on_change(
+            instance, action, pk_set,
+            lambda permission_ids: _user_ids(groups=instance.pk),
+            lambda group: _user_ids(groups=group.pk),
+        )
+    else:
+        # Изменение со стороны разрешения: pk_set — id групп
+        _invalidate_on_change(
+            instance, action, pk_set,
+            lambda group_ids: _user_ids(groups__in=group_ids),
+            lambda permission: _user_ids(groups__permissions=permission.pk),
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    """Удаление группы удаляет её связи без m2m_changed: сбрасываем права её участников"""
+    invalidate_permissions(_user_ids(groups=instance.pk))
+
+
+@receiver(pre_delete, sender=Permission)
+def invalidate_deleted_permission(sender, instance, **kwargs):
+    """Удаление разрешения отзывает его у пользователей и групп без m2m_changed"""
+    invalidate_permissions(
+        _user_ids(user_permissions=instance.pk) + _user_ids(groups__permissions=instance.pk)
+    )
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
@@ -503,3 +505,63 @@ class UserUpdateTest(APITestCase):
         self.assertEqual(response.data.get("first_name"), "AdminUpdated")
         self.assertEqual(response.data.get("chat_id"), "55555")
 
+
+class PermissionCacheTest(TestCase):
+    """Тесты кэширования прав пользователя"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(phone_number='+79991112233', password='password')
+        content_type = ContentType.objects.get_for_model(User)
+        self.permission = Permission.objects.create(
+            codename='can_test_permission_cache', name='Can test permission cache', content_type=content_type
+        )
+        self.group = Group.objects.create(name='Permission cache testers')
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_permissions_are_loaded_once(self):
+        """Права загружаются одним запросом, повторные проверки не обращаются к базе"""
+        self.user.user_permissions.add(self.permission)
+        user = self.fresh_user()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm('transfer_auth.can_test_permission_cache'))
+            self.assertFalse(user.has_perm('transfer_auth.missing_permission'))
+            self.assertTrue(user.has_module_perms('transfer_auth'))
+            self.assertFalse(user.has_module_perms('transfer_booking'))
+
+        # Следующий запрос берёт права из Redis
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('transfer_auth.can_test_permission_cache'))
+
+    def test_group_changes_invalidate_cache(self):
+        """Изменение групп пользователя и разрешений группы сразу отражается в правах"""
+        self.user.groups.add(self.group)
+        self.assertFalse(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.user.groups.remove(self.group)
+        self.assertFalse(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
+
+    def test_permission_changes_invalidate_cache(self):
+        """Выдача, отзыв и удаление разрешения сразу отражаются в правах"""
+        self.assertFalse(self.user.has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.user.has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.permission.customuser_set.clear()
+        self.assertFalse(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.group.permissions.add(self.permission)
+        self.user.groups.add(self.group)
+        self.assertTrue(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
+
+        self.permission.delete()
+        self.assertFalse(self.fresh_user().has_perm('transfer_auth.can_test_permission_cache'))
@@ -51,20 +51,9 @@ class BookingForm(forms.ModelForm):
 
         # Проверяем только если все нужные поля заполнены
         if payment and trip and trip_seats:
-            # Рассчитываем ожидаемую стоимость на основе данных формы
-            expected_total_price = Decimal(0)
-            for trip_seat in trip_seats:
-                seat = trip_seat.seat
-                # Используем ту же логику расчета, что и в модели
-                
-                if seat.price_zone == "front":
-                    expected_total_price += trip.front_seat_price
-                elif seat.price_zone == "middle":
-                    expected_total_price += trip.middle_seat_price
-                elif seat.price_zone == "back":
-                    expected_total_price += trip.back_seat_price
+            # Ожидаемая стоимость — сумма цен выбранных мест, как и при создании бронирования
+            expected_total_price = sum((trip_seat.cost for trip_seat in trip_seats), Decimal(0))
 
-            
             # Сравниваем сумму платежа с рассчитанной стоимостью
             if payment.amount != expected_total_price:
                 raise ValidationError(
@@ -76,10 +65,19 @@ class BookingForm(forms.ModelForm):
 
 class BookingAdmin(admin.ModelAdmin):
     form = BookingForm
-    list_display = ('id', 'user', 'trip', 'pickup_location', 'dropoff_location', 'booking_datetime', 'total_price', 'payment', 'is_active')
-    list_filter = ('is_active', 'booking_datetime')
+    list_display = ('id', 'user', 'trip', 'pickup_location', 'dropoff_location', 'booking_datetime', 'display_total_price', 'payment', 'is_active', 'address_status')
+    list_filter = ('is_active', 'address_status', 'booking_datetime')
+    list_select_related = ('user', 'trip__from_city', 'trip__to_city', 'payment')
     search_fields = ('user__phone_number', 'trip__departure_time')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_total_price()
+
+    def display_total_price(self, obj):
+        return obj.get_total_price()
+    display_total_price.short_description = 'Итоговая стоимость'
+    display_total_price.admin_order_field = 'seats_total_price'
+
     class Media:
         js = ('admin/js/booking_admin.js',) 
 
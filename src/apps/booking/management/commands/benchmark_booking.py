@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.auth.models import User
+from apps.booking.models import Booking
+from apps.booking.services import BookingService
+from apps.trip.models import City, Trip
+from apps.vehicle.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность бронирования разных мест одной поездки: '
+        'последовательно в одном потоке и параллельно в нескольких. Бронирования в параллельных '
+        'потоках должны фиксироваться в отдельных транзакциях, поэтому данные создаются в базе '
+        'и удаляются по завершении. Адреса не проверяются: замеряется только резервирование мест.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Количество параллельных потоков')
+        parser.add_argument('--bookings', type=int, default=200, help='Количество бронирований в каждом замере')
+        parser.add_argument('--seats-per-booking', type=int, default=1, help='Количество мест в бронировании')
+
+    def handle(self, *args, **options):
+        if min(options['threads'], options['bookings'], options['seats_per_booking']) < 1:
+            raise CommandError('Значения параметров должны быть положительными')
+
+        suffix = int(time.time())
+        cities = [City.objects.create(name=f'Бенчмарк {suffix}-{i}') for i in range(2)]
+        users = [
+            User.objects.create_user(f'+7900{random.randint(0, 9_999_999):07d}', 'benchmark')
+            for _ in range(options['threads'] + 1)
+        ]
+        driver, users = users[0], users[1:]
+        driver.groups.add(Group.objects.get_or_create(name='Водитель')[0])
+        vehicles = []
+        try:
+            sequential = self.measure(options, cities, driver, users[:1], vehicles)
+            concurrent = self.measure(options, cities, driver, users, vehicles)
+            self.stdout.write(f"Последовательно (1 поток): {sequential:.1f} бронирований/с")
+            self.stdout.write(f"Параллельно ({options['threads']} потоков): {concurrent:.1f} бронирований/с, "
+                              f"ускорение ×{concurrent / sequential:.2f}")
+        finally:
+            Booking.objects.filter(trip__vehicle__in=vehicles).delete()
+            Trip.objects.filter(vehicle__in=vehicles).delete()
+            Vehicle.objects.filter(pk__in=[vehicle.pk for vehicle in vehicles]).delete()
+            User.objects.filter(pk__in=[user.pk for user in [driver, *users]]).delete()
+            City.objects.filter(pk__in=[city.pk for city in cities]).delete()
+            self.stdout.write(self.style.SUCCESS('Сгенерированные данные удалены'))
+
+    def measure(self, options, cities, driver, users, vehicles):
+        """Бронирует все места новой поездки потоками по числу users, возвращает бронирований в секунду"""
+        bookings = options['bookings']
+        seats_per_booking = options['seats_per_booking']
+        vehicle = Vehicle.objects.create(
+            vehicle_type='bus',
+            license_plate=f'В{random.randint(0, 999):03d}ВВ{random.randint(100, 999)}',
+            total_seats=bookings * seats_per_booking,
+        )
+        vehicles.append(vehicle)
+        # Поездки одного водителя не должны пересекаться: каждый замер — на следующий день
+        departure_time = timezone.now() + timedelta(days=len(vehicles))
+        trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=driver,
+            from_city=cities[0],
+            to_city=cities[1],
+            departure_time=departure_time,
+            arrival_time=departure_time + timedelta(hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('800.00'),
+            back_seat_price=Decimal('600.00'),
+        )
+
+        # Каждый поток бронирует свои места: запросы не пересекаются и не должны ждать друг друга
+        seat_groups = [
+            list(range(index * seats_per_booking + 1, (index + 1) * seats_per_booking + 1))
+            for index in range(bookings)
+        ]
+        barrier = threading.Barrier(len(users))
+
+        def worker(position):
+            try:
+                barrier.wait()
+                for seat_numbers in seat_groups[position::len(users)]:
+                    with transaction.atomic():
+                        BookingService.book_seats({
+                            'user': users[position],
+                            'trip': trip,
+                            'pickup_location': 'ул. Ленина, д. 1',
+                            'dropoff_location': 'ул. Ленина, д. 2',
+                        }, seat_numbers)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            list(executor.map(worker, range(len(users))))
+        return bookings / (time.perf_counter() - started)
@@ -1,5 +1,7 @@
 from decimal import Decimal
 from django.db import models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 
 from apps.auth.models import User
@@ -9,7 +11,32 @@ from apps.trip.models import Trip
 from utils.address import find_address_by_name
 
 
+class BookingQuerySet(models.QuerySet):
+    def with_total_price(self):
+        """
+        Добавляет seats_total_price — итоговую стоимость бронирования: сохранённую total_price,
+        а для бронирований, созданных до появления поля, сумму цен мест (TripSeat.cost).
+        Для новых бронирований подзапрос не выполняется: COALESCE вычисляет его лишь при total_price IS NULL
+        """
+        seats_total = Booking.trip_seats.through.objects.filter(
+            booking=OuterRef('pk')
+        ).order_by().values('booking').annotate(total=Sum('tripseat__cost')).values('total')
+        return self.annotate(seats_total_price=Coalesce(
+            'total_price', Subquery(seats_total), Value(Decimal(0)),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
+
+
 class Booking(models.Model):
+    ADDRESS_STATUS_PENDING = 'pending'
+    ADDRESS_STATUS_CONFIRMED = 'confirmed'
+    ADDRESS_STATUS_REJECTED = 'rejected'
+    ADDRESS_STATUS_CHOICES = [
+        (ADDRESS_STATUS_PENDING, 'Проверяется'),
+        (ADDRESS_STATUS_CONFIRMED, 'Подтверждены'),
+        (ADDRESS_STATUS_REJECTED, 'Не найдены'),
+    ]
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -40,6 +67,19 @@ class Booking(models.Model):
         null=True,
         verbose_name="Данные об оплате"
         )
+    address_status = models.CharField(
+        max_length=16,
+        choices=ADDRESS_STATUS_CHOICES,
+        default=ADDRESS_STATUS_CONFIRMED,
+        verbose_name="Статус проверки адресов",
+        help_text="При асинхронной проверке бронирование создаётся со статусом 'Проверяется'"
+        )
+    address_error = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name="Причина отклонения адресов"
+        )
     booking_datetime = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Дата и время бронирования"
@@ -55,31 +95,35 @@ class Booking(models.Model):
         verbose_name="Места в поездке",
     )
 
-    @property
-    def total_price(self):
-        """Расчёт итоговой стоимости бронирования"""
-        # Пропускаем расчет для несохраненных экземпляров
+    # Стоимость фиксируется при создании бронирования из TripSeat.cost.
+    # NULL — бронирование создано до появления поля, см. get_total_price
+    total_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Итоговая стоимость"
+        )
+
+    objects = BookingQuerySet.as_manager()
+
+    def get_total_price(self):
+        """Итоговая стоимость бронирования"""
+        if self.total_price is not None:
+            return self.total_price
+        # Старые бронирования: сумма цен мест из аннотации with_total_price или отдельным запросом
+        seats_total_price = getattr(self, 'seats_total_price', None)
+        if seats_total_price is not None:
+            return seats_total_price
         if not self.pk:
             return Decimal(0)
-
-        price = Decimal(0)
-        # Получаем все TripSeat для этого бронирования
-        for trip_seat in self.trip_seats.all():
-            # Получаем объект Seat через связь в TripSeat
-            seat = trip_seat.seat
-            
-            if seat.price_zone == "front":
-                price += self.trip.front_seat_price 
-            elif seat.price_zone == "middle":
-                price += self.trip.middle_seat_price
-            elif seat.price_zone == "back":
-                price += self.trip.back_seat_price
-        return price
+        return self.trip_seats.aggregate(total=Sum('cost'))['total'] or Decimal(0)
 
     def __str__(self):
         if not self.pk:
             return f"New booking - {self.trip}" if self.trip else "New booking"
-        return f"{self.booking_datetime} - {self.user} - {self.trip} - {self.total_price}"
+        return f"{self.booking_datetime} - {self.user} - {self.trip} - {self.get_total_price()}"
 
     class Meta:
         verbose_name = "Бронирование"
@@ -36,7 +36,7 @@ class HasBookingPermission(permissions.BasePermission):
             return True
 
         # Пользователи со специальным разрешением могут просматривать все
-        if view.action == 'retrieve' and request.user.has_perm('booking.can_view_all_booking'):
+        if view.action in ('retrieve', 'address_status') and request.user.has_perm('booking.can_view_all_booking'):
             return True
 
         # В остальных случаях запрещаем
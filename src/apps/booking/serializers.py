@@ -12,16 +12,26 @@ class BookingDetailSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     trip = TripDetailSerializer(read_only=True)
     payment = PaymentSerializer(read_only=True)
-    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, source='get_total_price')
 
     class Meta:
         model = Booking
         fields = ['id', 'user', 'trip', 'payment', 'booking_datetime',
-                  'is_active', 'seat_numbers', 'total_price', 'pickup_location', 'dropoff_location']
-        read_only_fields = ['booking_datetime', 'user', 'total_price']
+                  'is_active', 'seat_numbers', 'total_price', 'pickup_location', 'dropoff_location',
+                  'address_status', 'address_error']
+        read_only_fields = ['booking_datetime', 'user', 'total_price', 'address_status', 'address_error']
     
     def get_seat_numbers(self, obj):
         return [trip_seat.seat.seat_number for trip_seat in obj.trip_seats.all()]
 
     def create(self, validated_data):
-        return BookingService.create_booking(validated_data, self.initial_data)
\ No newline at end of file
+        return BookingService.create_booking(validated_data, self.initial_data)
+
+
+class BookingAddressStatusSerializer(serializers.ModelSerializer):
+    """Короткий ответ для опроса статуса проверки адресов бронирования"""
+
+    class Meta:
+        model = Booking
+        fields = ['id', 'is_active', 'address_status', 'address_error', 'pickup_location', 'dropoff_location']
+        read_only_fields = fields
@@ -1,14 +1,27 @@
 import logging
+from collections import Counter
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
 from rest_framework import serializers
 from apps.booking.models import Booking
+from apps.booking.signals import booking_address_status_changed, invalidate_booking_cache
 from apps.trip.models import Trip
+from apps.trip.services.TripService import TripService
 from apps.seat.models import TripSeat
+from apps.seat.services.seat_hold_service import SeatHoldService
 from django.contrib.auth import get_user_model
-from utils.address import find_address_by_name
+from utils.address import GeocoderUnavailable, find_address_by_name
 from apps.payment.models import Payment
 
 logger = logging.getLogger(__name__)
+trip_service = TripService()
+seat_hold_service = SeatHoldService()
+
+# Максимальное количество поездок в одном пакетном бронировании
+MAX_BOOKING_LEGS = 5
 
 class BookingService:
     
@@ -17,13 +30,62 @@ class BookingService:
         trip_seats = TripSeat.objects.filter(trip_id=trip_id, seat__seat_number__in=seat_numbers, is_booked=False)
         
         if trip_seats.count() != len(seat_numbers):
-            available_seat_ids = [ts.seat_id for ts in trip_seats]
-            unavailable_ids = [s_id for s_id in seat_numbers if s_id not in available_seat_ids]
-            raise ValidationError(
-                f"Места с номером {', '.join(map(str, unavailable_ids))} недоступны для бронирования"
-            )
+            available_numbers = set(trip_seats.values_list('seat__seat_number', flat=True))
+            BookingService.raise_seats_unavailable(seat_numbers, available_numbers)
         return trip_seats
 
+    def raise_seats_unavailable(seat_numbers, available_numbers):
+        """Сообщает, какие именно из запрошенных мест нельзя забронировать"""
+        unavailable_numbers = [number for number in seat_numbers if number not in available_numbers]
+        raise ValidationError(
+            f"Места с номером {', '.join(map(str, unavailable_numbers))} недоступны для бронирования"
+        )
+
+    def reserve_seats(trip_id, seat_numbers, user=None):
+        """
+        Атомарное резервирование мест поездки.
+
+        Должно вызываться внутри transaction.atomic(). Свободные места блокируются
+        через SELECT ... FOR UPDATE SKIP LOCKED в порядке первичного ключа, поэтому
+        место, которое прямо сейчас бронирует другая транзакция, считается занятым
+        и не может быть забронировано дважды. Места, удерживаемые другим пользователем
+        (SeatHoldService), тоже считаются занятыми; у мест, удерживаемых самим user,
+        выставляется held_by_user: они уже учтены в счётчике свободных мест при
+        удержании, поэтому счётчик уменьшается только на неудержанные места.
+        Если хотя бы одно место недоступно,
+        выбрасывается ValidationError со списком таких мест, и вся транзакция
+        откатывается.
+        """
+        trip_seats = list(
+            TripSeat.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(trip_id=trip_id, seat__seat_number__in=seat_numbers, is_booked=False)
+            .select_related('seat')
+            .order_by('pk')
+        )
+
+        user_id = user.pk if user else None
+        holders = seat_hold_service.get_holders([ts.pk for ts in trip_seats])
+        for trip_seat in trip_seats:
+            trip_seat.held_by_user = user_id is not None and holders.get(trip_seat.pk) == user_id
+        trip_seats = [ts for ts in trip_seats if holders.get(ts.pk, user_id) == user_id]
+
+        if len(trip_seats) != len(set(seat_numbers)):
+            logger.warning(f"Some of seats {seat_numbers} of trip {trip_id} are unavailable")
+            BookingService.raise_seats_unavailable(seat_numbers, {ts.seat.seat_number for ts in trip_seats})
+
+        TripSeat.objects.filter(pk__in=[ts.pk for ts in trip_seats]).update(is_booked=True)
+        for trip_seat in trip_seats:
+            trip_seat.is_booked = True
+        trip_service.change_available_seats(trip_id, -sum(not ts.held_by_user for ts in trip_seats))
+        return trip_seats
+
+    def get_held_seat_numbers(user, trip_id):
+        """Номера мест поездки, которые удерживает пользователь"""
+        held_ids = seat_hold_service.get_user_holds(user, trip_id)
+        if not held_ids:
+            return []
+        return sorted(TripSeat.objects.filter(pk__in=held_ids).values_list('seat__seat_number', flat=True))
+
     def calculate_booking_price(trip, seat_numbers):
         """Расчет стоимости бронирования"""
         total_price = 0
@@ -41,13 +103,115 @@ class BookingService:
             return Booking.objects.none()
         # Возвращаем все бронирования для администраторов и пользователей с правом просмотра
         if user.has_perm('booking.can_view_all_booking') or user.is_staff:
-            return Booking.objects.all()
+            return Booking.objects.with_total_price()
         # Для обычных пользователей показываем только их бронирования
-        return Booking.objects.filter(user=user)
+        return Booking.objects.with_total_price().filter(user=user)
 
-    def create_booking(validated_data, initial_data):
-        """Создание нового бронирования"""
-        logger.debug("Creating new booking")
+    def validate_locations(validated_data, trip, pickup_location, dropoff_location):
+        """
+        Синхронная проверка и нормализация адресов посадки и высадки в потоке запроса.
+        Недоступность геокодера не является ошибкой адреса: GeocoderUnavailable передаётся вызывающему
+        """
+        try:
+            refactored_pickup = find_address_by_name(pickup_location, trip.from_city.name)
+            if not refactored_pickup:
+                logger.error(f"Invalid pickup location: {pickup_location}")
+                raise serializers.ValidationError({"pickup_location": f"Адрес '{pickup_location}' не найден в городе {trip.from_city.name}"})
+            validated_data['pickup_location'] = refactored_pickup
+        except GeocoderUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error validating pickup location: {str(e)}")
+            raise serializers.ValidationError({"pickup_location": f"Ошибка проверки адреса посадки: {str(e)}"})
+
+        try:
+            refactored_dropoff = find_address_by_name(dropoff_location, trip.to_city.name)
+            if not refactored_dropoff:
+                logger.error(f"Invalid dropoff location: {dropoff_location}")
+                raise serializers.ValidationError({"dropoff_location": f"Адрес '{dropoff_location}' не найден в городе {trip.to_city.name}"})
+            validated_data['dropoff_location'] = refactored_dropoff
+        except GeocoderUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error validating dropoff location: {str(e)}")
+            raise serializers.ValidationError({"dropoff_location": f"Ошибка проверки адреса высадки: {str(e)}"})
+
+    def check_raw_location_length(location, field_name):
+        """Адрес до нормализации сохраняется как есть, поэтому его длина проверяется заранее"""
+        max_length = Booking._meta.get_field(field_name).max_length
+        if len(location) > max_length:
+            raise serializers.ValidationError({field_name: f"Адрес не должен быть длиннее {max_length} символов"})
+
+    def normalize_locations(trip, pickup_location, dropoff_location):
+        """
+        Параллельно приводит адреса посадки и высадки к формату 'улица, д. N'.
+        Возвращает пару (посадка, высадка), ненайденный адрес возвращается как None.
+        """
+        def find(address, city):
+            try:
+                return find_address_by_name(address, city)
+            finally:
+                # Поток пула работает со справочником адресов через собственное соединение
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            pickup = executor.submit(find, pickup_location, trip.from_city.name)
+            dropoff = executor.submit(find, dropoff_location, trip.to_city.name)
+            return pickup.result(), dropoff.result()
+
+    def complete_address_validation(booking_id):
+        """
+        Завершает отложенную проверку адресов бронирования.
+
+        Если оба адреса найдены, они заменяются нормализованными и бронирование
+        подтверждается. Иначе бронирование отклоняется и деактивируется, а удерживаемые
+        места освобождаются. Геокодер вызывается вне транзакции; бронирование, которое
+        уже обработано, повторно не меняется. Если геокодер недоступен, выбрасывается
+        GeocoderUnavailable и бронирование остаётся в ожидании до повтора задачи.
+        """
+        booking = Booking.objects.select_related('trip__from_city', 'trip__to_city').filter(pk=booking_id).first()
+        if booking is None or booking.address_status != Booking.ADDRESS_STATUS_PENDING:
+            logger.info(f"Booking {booking_id} does not wait for address validation")
+            return booking
+
+        trip = booking.trip
+        pickup, dropoff = BookingService.normalize_locations(trip, booking.pickup_location, booking.dropoff_location)
+
+        with transaction.atomic():
+            booking = Booking.objects.select_for_update().get(pk=booking_id)
+            if booking.address_status != Booking.ADDRESS_STATUS_PENDING:
+                return booking
+
+            errors = []
+            if not pickup:
+                errors.append(f"Адрес '{booking.pickup_location}' не найден в городе {trip.from_city.name}")
+            if not dropoff:
+                errors.append(f"Адрес '{booking.dropoff_location}' не найден в городе {trip.to_city.name}")
+
+            if errors:
+                booking.address_status = Booking.ADDRESS_STATUS_REJECTED
+                booking.address_error = "; ".join(errors)[:Booking._meta.get_field('address_error').max_length]
+                # При сохранении деактивированного бронирования места освобождаются сигналом pre_save
+                booking.is_active = False
+                logger.warning(f"Booking {booking_id} rejected: {booking.address_error}")
+            else:
+                booking.pickup_location = pickup
+                booking.dropoff_location = dropoff
+                booking.address_status = Booking.ADDRESS_STATUS_CONFIRMED
+                logger.info(f"Booking {booking_id} addresses confirmed")
+            booking.save()
+
+            transaction.on_commit(
+                lambda: booking_address_status_changed.send(sender=Booking, booking=booking)
+            )
+
+        return booking
+
+    def prepare_booking(validated_data, initial_data):
+        """
+        Проверяет данные одного бронирования до резервирования мест: поездку, оплату и адреса.
+        Возвращает поля бронирования и номера мест
+        """
         trip_id = initial_data.get('trip_id')
         seat_numbers = initial_data.get('seat_numbers', [])
         pickup_location = initial_data.get('pickup_location', '')
@@ -58,6 +222,10 @@ class BookingService:
             logger.error("Trip ID is required")
             raise serializers.ValidationError({"trip_id": "Необходимо указать ID поездки"})
 
+        if not seat_numbers and validated_data.get('user'):
+            # Без номеров мест бронируются места, удержанные пользователем на этой поездке
+            seat_numbers = BookingService.get_held_seat_numbers(validated_data['user'], trip_id)
+
         if not seat_numbers:
             logger.error("seat numbers required")
             raise serializers.ValidationError({"seat_numbers": "Необходимо выбрать хотя бы одно место"})
@@ -84,66 +252,171 @@ class BookingService:
 
         validated_data['trip'] = trip
         
-        # Проверка адреса посадки
+        # Проверка наличия адресов посадки и высадки
         if not pickup_location:
             logger.error("Pickup location is required")
             raise serializers.ValidationError({"pickup_location": "Необходимо указать место посадки"})
-            
-        try:
-            refactored_pickup = find_address_by_name(pickup_location, trip.from_city.name)
-            if not refactored_pickup:
-                logger.error(f"Invalid pickup location: {pickup_location}")
-                raise serializers.ValidationError({"pickup_location": f"Адрес '{pickup_location}' не найден в городе {trip.from_city.name}"})
-            validated_data['pickup_location'] = refactored_pickup
-        except Exception as e:
-            logger.error(f"Error validating pickup location: {str(e)}")
-            raise serializers.ValidationError({"pickup_location": f"Ошибка проверки адреса посадки: {str(e)}"})
-        
-        # Проверка адреса высадки
+
         if not dropoff_location:
             logger.error("Dropoff location is required")
             raise serializers.ValidationError({"dropoff_location": "Необходимо указать место высадки"})
-            
-        try:
-            refactored_dropoff = find_address_by_name(dropoff_location, trip.to_city.name)
-            if not refactored_dropoff:
-                logger.error(f"Invalid dropoff location: {dropoff_location}")
-                raise serializers.ValidationError({"dropoff_location": f"Адрес '{dropoff_location}' не найден в городе {trip.to_city.name}"})
-            validated_data['dropoff_location'] = refactored_dropoff
-        except Exception as e:
-            logger.error(f"Error validating dropoff location: {str(e)}")
-            raise serializers.ValidationError({"dropoff_location": f"Ошибка проверки адреса высадки: {str(e)}"})
 
-        # Проверяем доступность мест
-        trip_seats = BookingService.check_seats_availability(trip_id, seat_numbers)
+        if settings.BOOKING_ASYNC_ADDRESS_VALIDATION:
+            # Адреса проверит задача Celery после фиксации бронирования,
+            # до этого они хранятся в том виде, в котором их ввёл пользователь
+            BookingService.check_raw_location_length(pickup_location, 'pickup_location')
+            BookingService.check_raw_location_length(dropoff_location, 'dropoff_location')
+            validated_data['pickup_location'] = pickup_location
+            validated_data['dropoff_location'] = dropoff_location
+            validated_data['address_status'] = Booking.ADDRESS_STATUS_PENDING
+        else:
+            BookingService.validate_locations(validated_data, trip, pickup_location, dropoff_location)
 
-        # Создаем бронирование
+        return validated_data, seat_numbers
+
+    def book_seats(validated_data, seat_numbers):
+        """
+        Резервирует места и создаёт бронирование.
+        Должно вызываться внутри transaction.atomic()
+        """
+        # Резервируем места одной блокирующей выборкой и одним UPDATE
+        trip_id = validated_data['trip'].id
+        user = validated_data.get('user')
+        trip_seats = BookingService.reserve_seats(trip_id, seat_numbers, user)
+
+        # Создаем бронирование в той же транзакции; стоимость фиксируется по ценам мест
+        validated_data['total_price'] = sum((ts.cost for ts in trip_seats), Decimal(0))
         booking = Booking.objects.create(**validated_data)
         logger.info(f"Created new booking: {booking}")
 
-        # Бронируем места
-        logger.debug("Booking some seats")
-        for trip_seat in trip_seats:
-            trip_seat.is_booked = True
-            trip_seat.save()
-            booking.trip_seats.add(trip_seat)
-            
+        # Места уже помечены занятыми, поэтому связываем их напрямую, без сигнала m2m_changed
+        Booking.trip_seats.through.objects.bulk_create([
+            Booking.trip_seats.through(booking=booking, tripseat=trip_seat) for trip_seat in trip_seats
+        ])
+
+        # Удержанные пользователем места уже вычтены из счётчика: удержания снимаются без возврата
+        # в счётчик. Удержание, истёкшее до снятия, вернёт место в счётчик при очистке, поэтому
+        # такие места вычитаются здесь. Если транзакция всё же откатится, счётчик исправит
+        # reconcile_available_seats
+        held_ids = [ts.pk for ts in trip_seats if ts.held_by_user]
+        if held_ids:
+            consumed = seat_hold_service.consume_seats(user, trip_id, held_ids)
+            trip_service.change_available_seats(trip_id, consumed - len(held_ids))
+
+        if booking.address_status == Booking.ADDRESS_STATUS_PENDING:
+            from apps.booking.tasks import validate_booking_addresses
+            transaction.on_commit(lambda: validate_booking_addresses.delay(booking.pk))
+        return booking
+
+    def create_booking(validated_data, initial_data):
+        """Создание нового бронирования"""
+        logger.debug("Creating new booking")
+        validated_data, seat_numbers = BookingService.prepare_booking(validated_data, initial_data)
+
+        with transaction.atomic():
+            booking = BookingService.book_seats(validated_data, seat_numbers)
+
         logger.info("Seats successfully booked")
 
         return booking
 
+    def create_bookings(user, legs):
+        """
+        Создание нескольких бронирований (например, туда и обратно) одной транзакцией.
+
+        Сначала проверяются данные всех участков, затем места всех поездок резервируются
+        в одной транзакции: если хотя бы одно место недоступно, не создаётся ни одно
+        бронирование. Поездки обрабатываются в порядке их id, поэтому конкурентные
+        запросы с теми же поездками берут блокировки в одном порядке и не
+        взаимоблокируются. Бронирования возвращаются в порядке участков запроса.
+        """
+        if not isinstance(legs, list) or not legs:
+            raise serializers.ValidationError({"legs": "Необходимо указать хотя бы одну поездку"})
+        if len(legs) > MAX_BOOKING_LEGS:
+            raise serializers.ValidationError({"legs": f"Можно забронировать не больше {MAX_BOOKING_LEGS} поездок за раз"})
+
+        prepared = []
+        errors = {}
+        for position, leg in enumerate(legs):
+            try:
+                if not isinstance(leg, dict):
+                    raise serializers.ValidationError({"detail": "Ожидается объект с данными поездки"})
+                prepared.append(BookingService.prepare_booking({'user': user}, leg))
+            except serializers.ValidationError as e:
+                errors[str(position)] = e.detail
+        if errors:
+            raise serializers.ValidationError({"legs": errors})
+
+        trip_ids = [validated_data['trip'].pk for validated_data, _ in prepared]
+        if len(set(trip_ids)) != len(trip_ids):
+            raise serializers.ValidationError({"legs": "Поездка не может повторяться: укажите все места в одном участке"})
+
+        payment_ids = [validated_data['payment'].pk for validated_data, _ in prepared if validated_data.get('payment')]
+        if len(set(payment_ids)) != len(payment_ids):
+            raise serializers.ValidationError({"legs": "Одна оплата не может относиться к нескольким бронированиям"})
+
+        bookings = {}
+        with transaction.atomic():
+            for position, (validated_data, seat_numbers) in sorted(
+                enumerate(prepared), key=lambda item: item[1][0]['trip'].pk
+            ):
+                try:
+                    bookings[position] = BookingService.book_seats(validated_data, seat_numbers)
+                except ValidationError as e:
+                    raise serializers.ValidationError({"legs": {str(position): e.messages}})
+
+        logger.info(f"Created {len(bookings)} bookings in one transaction")
+        return [bookings[position] for position in range(len(prepared))]
+
+    def release_seats(booking_ids):
+        """
+        Освобождает занятые места бронирований одним UPDATE ... WHERE id IN (...)
+        и корректирует счётчики свободных мест их поездок одним UPDATE.
+        Вызывается ровно один раз при деактивации или удалении бронирований (см. deactivate_bookings).
+        Возвращает количество освобождённых мест.
+        """
+        trip_seats = set(
+            TripSeat.objects.filter(booking__in=booking_ids, is_booked=True).values_list('pk', 'trip_id')
+        )
+        if not trip_seats:
+            return 0
+
+        TripSeat.objects.filter(pk__in=[pk for pk, _ in trip_seats]).update(is_booked=False)
+        trip_service.change_available_seats_many(Counter(trip_id for _, trip_id in trip_seats))
+        logger.debug(f"Released {len(trip_seats)} seats of bookings {list(booking_ids)}")
+        return len(trip_seats)
+
+    def deactivate_bookings(queryset):
+        """
+        Деактивирует активные бронирования из queryset и освобождает их места.
+
+        Бронирования блокируются и деактивируются одним UPDATE, поэтому переход
+        активное → неактивное и освобождение мест происходят ровно один раз, даже
+        при конкурентной отмене. Например, отмена всех бронирований поездки —
+        Booking.objects.filter(trip=trip) — выполняется фиксированным числом запросов.
+        Возвращает (количество бронирований, количество освобождённых мест).
+        """
+        with transaction.atomic():
+            bookings = list(
+                queryset.filter(is_active=True).select_for_update(of=('self',)).values_list('pk', 'user_id')
+            )
+            if not bookings:
+                return 0, 0
+
+            booking_ids = [pk for pk, _ in bookings]
+            Booking.objects.filter(pk__in=booking_ids).update(is_active=False)
+            released_count = BookingService.release_seats(booking_ids)
+
+        for user_id in {user_id for _, user_id in bookings}:
+            invalidate_booking_cache(user_id)
+        logger.info(f"Deactivated {len(booking_ids)} bookings, released {released_count} seats")
+        return len(booking_ids), released_count
+
     def cancel_booking(booking):
         """Отмена бронирования"""
-        if not booking.is_active:
+        deactivated_count, _ = BookingService.deactivate_bookings(Booking.objects.filter(pk=booking.pk))
+        if not deactivated_count:
             raise ValidationError("Бронирование уже отменено")
 
-        # Отмечаем бронирование как неактивное
         booking.is_active = False
-        booking.save()
-
-        # Освобождаем места
-        for trip_seat in booking.trip_seats.all():
-            trip_seat.is_booked = False
-            trip_seat.save()
-
-        return booking
\ No newline at end of file
+        return booking
@@ -1,17 +1,29 @@
+from decimal import Decimal
+from django.db.models import Sum
 from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 import logging
-from django.conf import settings
 from apps.booking.models import Booking
 from apps.seat.models import TripSeat
-import requests
-from datetime import datetime
+from apps.trip.services.TripService import TripService
 from django.utils import timezone
 from django.db import transaction
 from django.core.cache import cache
 
 
 logger = logging.getLogger(__name__)
+trip_service = TripService()
+
+# Отправляется после фиксации результата отложенной проверки адресов бронирования
+# (статус 'confirmed' или 'rejected'), аргумент booking
+booking_address_status_changed = Signal()
+
+
+def refresh_total_price(booking):
+    """Пересчитывает сохранённую стоимость после изменения мест бронирования (например, в админке)"""
+    total_price = booking.trip_seats.aggregate(total=Sum('cost'))['total'] or Decimal(0)
+    Booking.objects.filter(pk=booking.pk).update(total_price=total_price)
+    booking.total_price = total_price
 
 
 @receiver(m2m_changed, sender=Booking.trip_seats.through)
@@ -20,20 +32,25 @@ def update_trip_seat_status(sender, instance, action, pk_set, **kwargs):
     Обновляет статус is_booked у TripSeat при изменении M2M связи с Booking.
     """
     
+    if action in ("post_add", "post_remove") and isinstance(instance, Booking):
+        refresh_total_price(instance)
+
     if action == "post_add":
         # Места были добавлены к бронированию - помечаем их как забронированные
         added_seats = TripSeat.objects.filter(pk__in=pk_set)
         updated_count = 0
-        for seat in added_seats:
-            if not seat.is_booked:
-                seat.is_booked = True
-                seat.save(update_fields=['is_booked'])
-                updated_count += 1
-                logger.debug(f"Marked TripSeat {seat.pk} as booked for Booking {instance.pk}")
-            else:
-                # Это может произойти, если место уже было забронировано 
-                # (хотя валидация должна была это предотвратить)
-                logger.warning(f"TripSeat {seat.pk} was already booked when adding to Booking {instance.pk}")
+        with transaction.atomic():
+            for seat in added_seats:
+                if not seat.is_booked:
+                    seat.is_booked = True
+                    seat.save(update_fields=['is_booked'])
+                    trip_service.change_available_seats(seat.trip_id, -1)
+                    updated_count += 1
+                    logger.debug(f"Marked TripSeat {seat.pk} as booked for Booking {instance.pk}")
+                else:
+                    # Это может произойти, если место уже было забронировано 
+                    # (хотя валидация должна была это предотвратить)
+                    logger.warning(f"TripSeat {seat.pk} was already booked when adding to Booking {instance.pk}")
         if updated_count > 0:
             logger.info(f"Marked {updated_count} TripSeat(s) as booked for Booking {instance.pk}")
 
@@ -50,17 +67,19 @@ def update_trip_seat_status(sender, instance, action, pk_set, **kwargs):
             removed_seats = TripSeat.objects.filter(pk__in=pk_set)
             updated_count = 0
             # Прежде чем освободить место, убедимся, что оно не привязано к ДРУГОМУ АКТИВНОМУ бронированию
-            for seat in removed_seats:
-                 other_bookings = Booking.objects.filter(trip_seats=seat, is_active=True).exclude(pk=instance.pk)
-                 if not other_bookings.exists():
-                     if seat.is_booked:
-                        seat.is_booked = False
-                        seat.save(update_fields=['is_booked'])
-                        updated_count += 1
-                        logger.debug(f"Marked TripSeat {seat.pk} as unbooked after removing from Booking {instance.pk}")
-                 else:
-                     logger.warning(f"TripSeat {seat.pk} is still linked to other active bookings, not marking as unbooked.")
-                     
+            with transaction.atomic():
+                for seat in removed_seats:
+                    other_bookings = Booking.objects.filter(trip_seats=seat, is_active=True).exclude(pk=instance.pk)
+                    if not other_bookings.exists():
+                        if seat.is_booked:
+                            seat.is_booked = False
+                            seat.save(update_fields=['is_booked'])
+                            trip_service.change_available_seats(seat.trip_id, 1)
+                            updated_count += 1
+                            logger.debug(f"Marked TripSeat {seat.pk} as unbooked after removing from Booking {instance.pk}")
+                    else:
+                        logger.warning(f"TripSeat {seat.pk} is still linked to other active bookings, not marking as unbooked.")
+
             if updated_count > 0:
                  logger.info(f"Marked {updated_count} TripSeat(s) as unbooked after removing from Booking {instance.pk}")
 
@@ -68,42 +87,37 @@ def update_trip_seat_status(sender, instance, action, pk_set, **kwargs):
 @receiver(pre_delete, sender=Booking)
 def release_seats_on_booking_delete(sender, instance, **kwargs):
     """
-    Освобождает места при удалении бронирования
+    Освобождает места при удалении активного бронирования
     """
-    # Освобождаем все места, связанные с этим бронированием
-    for trip_seat in instance.trip_seats.all():
-        trip_seat.is_booked = False
-        trip_seat.save()
+    from apps.booking.services import BookingService
+    BookingService.deactivate_bookings(Booking.objects.filter(pk=instance.pk))
+
 
 @receiver(pre_save, sender=Booking)
 def release_seats_on_deactivation(sender, instance, **kwargs):
     """
-    Освобождает места при деактивации бронирования
-    """
-    # Проверяем, что это существующий объект бронирования
-    if instance.pk:
-        # Получаем предыдущее состояние объекта
-        try:
-            previous = Booking.objects.get(pk=instance.pk)
-            # Если бронирование становится неактивным
-            if previous.is_active and not instance.is_active:
-                # Освобождаем места
-                for trip_seat in instance.trip_seats.all():
-                    trip_seat.is_booked = False
-                    trip_seat.save()
-        except Booking.DoesNotExist:
-            pass
+    Освобождает места при сохранении деактивированного бронирования.
+    Бронирование повторно не загружается: deactivate_bookings условным UPDATE
+    освобождает места, только если в базе бронирование ещё активно
+    """
+    if instance.pk and not instance.is_active:
+        from apps.booking.services import BookingService
+        BookingService.deactivate_bookings(Booking.objects.filter(pk=instance.pk))
 
 def format_booking(booking):
-
+    """
+    Текст уведомления о бронировании. Стоимость хранится в бронировании,
+    номера мест читаются одним запросом
+    """
     local_tz = timezone.get_current_timezone()
     local_time = booking.trip.departure_time.astimezone(local_tz)
 
     dt = local_time.strftime("%d.%m.%Y %H:%M")
     status = "✅ Активно" if booking.is_active else "❌ Отменено"
-    price = booking.total_price
+    price = booking.get_total_price()
     price_str = f"{int(price)} руб." if price == int(price) else f"{price:.2f} руб."
-    seats_info = ", ".join([str(ts.seat.seat_number) for ts in booking.trip_seats.all()])
+    seat_numbers = booking.trip_seats.order_by('seat__seat_number').values_list('seat__seat_number', flat=True)
+    seats_info = ", ".join(map(str, seat_numbers))
     text = (
         f"🚖 Новое бронирование создано!\n"
         f"📅 Дата: {dt}\n"
@@ -115,27 +129,40 @@ def format_booking(booking):
     )
     return text
 
-def send_telegram_message(chat_id, text):
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {'chat_id': chat_id, 'text': text}
-    try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка отправки сообщения: {e}")
+
+def format_booking_notification(booking):
+    """Текст уведомления по текущему статусу проверки адресов или None, если уведомлять рано"""
+    if booking.address_status == Booking.ADDRESS_STATUS_CONFIRMED:
+        return format_booking(booking)
+    if booking.address_status == Booking.ADDRESS_STATUS_REJECTED:
+        return f"❌ Бронирование №{booking.pk} отклонено: {booking.address_error}. Места освобождены."
+    # Адреса ещё проверяются: пользователь получит уведомление после проверки
+    return None
+
+
+def enqueue_booking_notification(booking):
+    """
+    Ставит уведомление пользователя в очередь Celery. Сообщение формируется и отправляется
+    воркером, поэтому время ответа API не включает запрос к Telegram
+    """
+    if not booking.user.chat_id:
+        return
+    from apps.booking.tasks import send_booking_notification
+    send_booking_notification.delay(booking.pk)
+
 
 @receiver(post_save, sender=Booking)
 def booking_post_save(sender, instance, created, **kwargs):
-    if created:
-        transaction.on_commit(lambda: handle_new_booking(instance))
+    if created and instance.address_status != Booking.ADDRESS_STATUS_PENDING:
+        transaction.on_commit(lambda: enqueue_booking_notification(instance))
 
-def handle_new_booking(booking):
-    user = booking.user
-    if user.chat_id:
-        message = format_booking(booking)
-        send_telegram_message(user.chat_id, message)
 
+@receiver(booking_address_status_changed)
+def notify_address_status_changed(sender, booking, **kwargs):
+    """
+    Уведомляет пользователя о результате отложенной проверки адресов бронирования
+    """
+    enqueue_booking_notification(booking)
 
 
 def invalidate_booking_cache(user_id):
@@ -0,0 +1,63 @@
+from celery import shared_task
+from django.conf import settings
+from apps.booking.models import Booking
+from apps.booking.services import BookingService
+from apps.booking.signals import format_booking_notification
+from utils.telegram import TelegramError, TelegramUnavailable, get_telegram_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def validate_booking_addresses(booking_id: int) -> None:
+    """
+    Задача, которая проверяет адреса посадки и высадки бронирования со статусом 'pending'
+    и подтверждает или отклоняет его. При ошибке задача повторяется с нарастающей задержкой.
+    """
+    booking = BookingService.complete_address_validation(booking_id)
+    if booking is not None:
+        logger.info(f"Address validation of booking {booking_id} finished: {booking.address_status}")
+
+
+@shared_task()
+def send_booking_notification(booking_id: int) -> None:
+    """
+    Задача, которая формирует уведомление о бронировании и ставит его в очередь доставки Telegram.
+    """
+    booking = Booking.objects.select_related('user', 'trip').filter(pk=booking_id).first()
+    if booking is None or not booking.user.chat_id:
+        return
+    text = format_booking_notification(booking)
+    if text:
+        send_telegram_messages.delay([[booking.user.chat_id, text]])
+
+
+@shared_task(bind=True, max_retries=settings.TELEGRAM_MAX_RETRIES)
+def send_telegram_messages(self, messages: list) -> int:
+    """
+    Задача, которая доставляет пакет сообщений Telegram [[chat_id, text], ...].
+
+    Сообщения отправляются через общий для процесса пул соединений с общим для кластера
+    лимитом отправки. При временной ошибке (сеть, 429/5xx, исчерпан лимит) недоставленный
+    остаток пакета повторяется с нарастающей задержкой или через retry_after от Telegram.
+    Сообщения, которые Telegram отклонил (например, бот заблокирован), не повторяются.
+    Возвращает количество доставленных сообщений.
+    """
+    client = get_telegram_client()
+    delivered = 0
+    for position, (chat_id, text) in enumerate(messages):
+        try:
+            client.send_message(chat_id, text)
+            delivered += 1
+        except TelegramUnavailable as e:
+            remaining = messages[position:]
+            if self.request.retries >= self.max_retries:
+                logger.error(f"Gave up delivering {len(remaining)} Telegram messages: {e}")
+                return delivered
+            countdown = max(e.retry_after or 0, 2 ** self.request.retries)
+            logger.warning(f"Telegram is unavailable, retrying {len(remaining)} messages in {countdown}s: {e}")
+            raise self.retry(args=[remaining], countdown=countdown)
+        except TelegramError as e:
+            logger.error(f"Telegram message to {chat_id} was rejected: {e}")
+    return delivered
@@ -64,7 +64,7 @@ class BookingAPITest(APITestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
         
-    @patch('utils.address.find_address_by_name')
+    @patch('apps.booking.services.find_address_by_name')
     def test_create_booking(self, mock_find_address):
         """Тест создания бронирования"""
         # Настраиваем мок
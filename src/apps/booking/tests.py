@@ -5,16 +5,26 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import patch
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 
-from apps.auth.models import User
+from apps.booking.services import BookingService
+from apps.booking.signals import format_booking_notification
+from utils.address import GeocoderUnavailable
+
 from apps.booking.models import Booking, Payment
 from apps.trip.models import Trip, City
 from apps.vehicle.models import Vehicle
 from apps.seat.models import TripSeat, Seat
+from apps.seat.services.seat_hold_service import SeatHoldService
 
 User = get_user_model()
 
@@ -614,7 +624,7 @@ class BookingAPITest(APITestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
-    @patch('utils.address.find_address_by_name')
+    @patch('apps.booking.services.find_address_by_name')
     def test_create_booking(self, mock_find_address):
         """Тест создания бронирования"""
         # Настраиваем мок
@@ -651,3 +661,563 @@ class BookingAPITest(APITestCase):
         # Проверяем, что место отмечено как забронированное
         available_trip_seat.refresh_from_db()
         self.assertTrue(available_trip_seat.is_booked)
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Нагрузочные тесты параллельного бронирования мест одной поездки"""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.driver = User.objects.create_user('+79555555556', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.users = [
+            User.objects.create_user(f'+7900000000{i}', 'userpass') for i in range(self.THREADS)
+        ]
+
+        vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='В456ВВ', total_seats=40)
+        self.trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=self.driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('1000.00')
+        )
+
+        patcher = patch('apps.booking.services.find_address_by_name', return_value='ул. Ленина, 1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def book(self, user, seat_numbers):
+        initial_data = {
+            'trip_id': self.trip.id,
+            'seat_numbers': seat_numbers,
+            'pickup_location': 'ул. Ленина, 1',
+            'dropoff_location': 'ул. Ленина, 2',
+        }
+        return BookingService.create_booking({'user': user}, initial_data)
+
+    def book_concurrently(self, seat_numbers_per_user):
+        """Запускает бронирования одновременно в отдельных потоках, возвращает (успехи, ошибки)"""
+        barrier = threading.Barrier(len(seat_numbers_per_user))
+
+        def worker(user, seat_numbers):
+            try:
+                barrier.wait()
+                self.book(user, seat_numbers)
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(seat_numbers_per_user)) as executor:
+            results = list(executor.map(worker, self.users, seat_numbers_per_user))
+        return results.count(True), results.count(False)
+
+    def assertNoDoubleBooking(self):
+        booked = TripSeat.objects.filter(trip=self.trip, is_booked=True)
+        linked = Booking.trip_seats.through.objects.filter(booking__is_active=True, tripseat__trip=self.trip)
+        self.assertEqual(linked.count(), linked.values('tripseat').distinct().count())
+        self.assertEqual(booked.count(), linked.count())
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, TripSeat.objects.filter(trip=self.trip, is_booked=False).count())
+
+    def test_same_seat_booked_only_once(self):
+        """Одно и то же место при одновременных запросах достаётся ровно одному пользователю"""
+        succeeded, failed = self.book_concurrently([[1, 2]] * self.THREADS)
+
+        self.assertEqual(succeeded, 1)
+        self.assertEqual(failed, self.THREADS - 1)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertNoDoubleBooking()
+
+    def test_overlapping_requests_do_not_double_book(self):
+        """Пересекающиеся запросы не приводят к двойному бронированию"""
+        succeeded, failed = self.book_concurrently([[i + 1, i + 2] for i in range(self.THREADS)])
+
+        self.assertGreaterEqual(succeeded, 1)
+        self.assertEqual(succeeded + failed, self.THREADS)
+        self.assertEqual(Booking.objects.count(), succeeded)
+        self.assertNoDoubleBooking()
+
+    def test_disjoint_requests_do_not_block_each_other(self):
+        """
+        Запросы на разные места выполняются параллельно и все завершаются успешно.
+        Каждый поток ждёт остальных, удерживая блокировки своих мест: если бы блокировки
+        одного запроса задевали места другого, потоки не встретились бы на барьере.
+        Пропускная способность замеряется командой benchmark_booking.
+        """
+        locked = threading.Barrier(self.THREADS, timeout=10)
+        get_holders = SeatHoldService.get_holders
+
+        def get_holders_when_all_locked(service, trip_seat_ids):
+            locked.wait()
+            return get_holders(service, trip_seat_ids)
+
+        with patch.object(SeatHoldService, 'get_holders', get_holders_when_all_locked):
+            succeeded, failed = self.book_concurrently([[2 * i + 1, 2 * i + 2] for i in range(self.THREADS)])
+
+        self.assertFalse(locked.broken)
+        self.assertEqual((succeeded, failed), (self.THREADS, 0))
+        self.assertNoDoubleBooking()
+
+    def test_partial_failure_is_reported_and_rolled_back(self):
+        """При недоступности части мест бронирование не создаётся, а ошибка перечисляет эти места"""
+        self.book(self.users[0], [3])
+
+        with self.assertRaisesMessage(ValidationError, 'Места с номером 3, 99 недоступны для бронирования'):
+            self.book(self.users[1], [1, 3, 99])
+
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(TripSeat.objects.get(trip=self.trip, seat__seat_number=1).is_booked)
+        self.assertNoDoubleBooking()
+
+    def test_query_count_does_not_depend_on_seat_count(self):
+        """Число запросов к базе при бронировании не зависит от количества мест"""
+        with CaptureQueriesContext(connection) as one_seat:
+            self.book(self.users[0], [1])
+        with CaptureQueriesContext(connection) as many_seats:
+            self.book(self.users[1], [2, 3, 4, 5, 6])
+
+        self.assertEqual(len(one_seat), len(many_seats))
+
+    def test_batch_bookings_with_reversed_legs_do_not_deadlock(self):
+        """Пакетные бронирования одних и тех же поездок в разном порядке не взаимоблокируются"""
+        return_trip = Trip.objects.create(
+            vehicle=self.trip.vehicle,
+            driver=self.driver,
+            from_city=self.trip.to_city,
+            to_city=self.trip.from_city,
+            departure_time=timezone.now() + timedelta(days=2),
+            arrival_time=timezone.now() + timedelta(days=2, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('1000.00')
+        )
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker(position):
+            legs = [
+                {'trip_id': trip_id, 'seat_numbers': [position + 1],
+                 'pickup_location': 'ул. Ленина, 1', 'dropoff_location': 'ул. Ленина, 2'}
+                for trip_id in (self.trip.id, return_trip.id)
+            ]
+            if position % 2:
+                legs.reverse()
+            try:
+                barrier.wait()
+                BookingService.create_bookings(self.users[position], legs)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            list(executor.map(worker, range(self.THREADS)))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Booking.objects.count(), 2 * self.THREADS)
+        self.assertNoDoubleBooking()
+
+
+@override_settings(BOOKING_ASYNC_ADDRESS_VALIDATION=True)
+class AsyncAddressValidationTest(APITestCase):
+    """Бронирование с отложенной проверкой адресов в задаче Celery"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('+79111111112', 'userpass')
+        self.other_user = User.objects.create_user('+79111111113', 'userpass')
+        driver = User.objects.create_user('+79555555557', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        driver.groups.add(driver_group)
+
+        vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='Е789ЕЕ', total_seats=10)
+        self.trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('1000.00')
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_pending_booking(self, seat_numbers=(1, 2)):
+        data = {
+            'trip_id': self.trip.id,
+            'seat_numbers': list(seat_numbers),
+            'pickup_location': 'Ленина 1',
+            'dropoff_location': 'Невский 2',
+        }
+        with patch('apps.booking.services.find_address_by_name') as mock_find_address, \
+                patch('apps.booking.tasks.validate_booking_addresses.delay') as mock_delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('booking-list'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_find_address.assert_not_called()
+        mock_delay.assert_called_once_with(response.data['id'])
+        return Booking.objects.get(pk=response.data['id'])
+
+    def test_booking_committed_with_pending_status_and_held_seats(self):
+        """Бронирование создаётся сразу, места удерживаются, геокодер в запросе не вызывается"""
+        booking = self.create_pending_booking()
+
+        self.assertEqual(booking.address_status, Booking.ADDRESS_STATUS_PENDING)
+        self.assertEqual(booking.pickup_location, 'Ленина 1')
+        self.assertTrue(all(ts.is_booked for ts in booking.trip_seats.all()))
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, 8)
+
+    def test_task_confirms_booking_with_normalized_addresses(self):
+        """Если оба адреса найдены, бронирование подтверждается с нормализованными адресами"""
+        booking = self.create_pending_booking()
+        formatted = {'Ленина 1': 'улица Ленина, д. 1', 'Невский 2': 'Невский проспект, д. 2'}
+
+        with patch('apps.booking.services.find_address_by_name', side_effect=lambda address, city: formatted[address]):
+            BookingService.complete_address_validation(booking.pk)
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.address_status, Booking.ADDRESS_STATUS_CONFIRMED)
+        self.assertEqual(booking.pickup_location, 'улица Ленина, д. 1')
+        self.assertEqual(booking.dropoff_location, 'Невский проспект, д. 2')
+        self.assertTrue(booking.is_active)
+
+    def test_task_rejects_booking_and_releases_seats(self):
+        """Если адрес не найден, бронирование отклоняется, а места освобождаются"""
+        booking = self.create_pending_booking()
+
+        with patch('apps.booking.services.find_address_by_name',
+                   side_effect=lambda address, city: 'улица Ленина, д. 1' if address == 'Ленина 1' else None):
+            BookingService.complete_address_validation(booking.pk)
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.address_status, Booking.ADDRESS_STATUS_REJECTED)
+        self.assertIn("Невский 2", booking.address_error)
+        self.assertFalse(booking.is_active)
+        self.assertFalse(TripSeat.objects.filter(trip=self.trip, is_booked=True).exists())
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, 10)
+
+    def test_processed_booking_is_not_validated_again(self):
+        """Повторный запуск задачи не вызывает геокодер и не меняет бронирование"""
+        booking = self.create_pending_booking()
+        Booking.objects.filter(pk=booking.pk).update(address_status=Booking.ADDRESS_STATUS_CONFIRMED)
+
+        with patch('apps.booking.services.find_address_by_name') as mock_find_address:
+            BookingService.complete_address_validation(booking.pk)
+
+        mock_find_address.assert_not_called()
+
+    def test_unavailable_geocoder_keeps_booking_pending(self):
+        """Недоступность геокодера не отклоняет бронирование: ошибка уходит в задачу для повтора"""
+        booking = self.create_pending_booking()
+
+        with patch('apps.booking.services.find_address_by_name', side_effect=GeocoderUnavailable('timeout')):
+            with self.assertRaises(GeocoderUnavailable):
+                BookingService.complete_address_validation(booking.pk)
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.address_status, Booking.ADDRESS_STATUS_PENDING)
+        self.assertTrue(booking.is_active)
+
+    @override_settings(BOOKING_ASYNC_ADDRESS_VALIDATION=False)
+    def test_unavailable_geocoder_in_request_returns_503(self):
+        """При синхронной проверке недоступность геокодера — 503, а не ошибка адреса"""
+        data = {
+            'trip_id': self.trip.id,
+            'seat_numbers': [1],
+            'pickup_location': 'Ленина 1',
+            'dropoff_location': 'Невский 2',
+        }
+        with patch('apps.booking.services.find_address_by_name', side_effect=GeocoderUnavailable('timeout')):
+            response = self.client.post(reverse('booking-list'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_status_change_notifies_user(self):
+        """После фиксации результата проверки пользователь получает уведомление"""
+        self.user.chat_id = '12345'
+        self.user.save()
+        booking = self.create_pending_booking()
+
+        with patch('apps.booking.services.find_address_by_name', return_value=None), \
+                patch('apps.booking.tasks.send_booking_notification.delay') as mock_delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            BookingService.complete_address_validation(booking.pk)
+
+        mock_delay.assert_called_once_with(booking.pk)
+        booking.refresh_from_db()
+        self.assertIn('отклонено', format_booking_notification(booking))
+
+    def test_poll_address_status(self):
+        """Владелец может опрашивать статус проверки адресов, чужой пользователь — нет"""
+        booking = self.create_pending_booking()
+        url = reverse('booking-address-status', args=[booking.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['address_status'], Booking.ADDRESS_STATUS_PENDING)
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BatchBookingTest(APITestCase):
+    """Бронирование нескольких поездок одним запросом"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('+79111111115', 'userpass')
+        driver = User.objects.create_user('+79555555558', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        driver.groups.add(driver_group)
+
+        vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='К321КК', total_seats=10)
+        moscow = City.objects.create(name='Москва')
+        petersburg = City.objects.create(name='Санкт-Петербург')
+        self.trips = [
+            Trip.objects.create(
+                vehicle=vehicle,
+                driver=driver,
+                from_city=from_city,
+                to_city=to_city,
+                departure_time=timezone.now() + timedelta(days=days),
+                arrival_time=timezone.now() + timedelta(days=days, hours=5),
+                front_seat_price=Decimal('1000.00'),
+                middle_seat_price=Decimal('1000.00'),
+                back_seat_price=Decimal('1000.00')
+            )
+            for days, from_city, to_city in ((1, moscow, petersburg), (3, petersburg, moscow))
+        ]
+        self.url = reverse('booking-batch')
+        self.client.force_authenticate(user=self.user)
+
+        patcher = patch('apps.booking.services.find_address_by_name', return_value='ул. Ленина, 1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def leg(self, trip, seat_numbers):
+        return {
+            'trip_id': trip.id,
+            'seat_numbers': seat_numbers,
+            'pickup_location': 'ул. Ленина, 1',
+            'dropoff_location': 'ул. Ленина, 2',
+        }
+
+    def test_round_trip_booked_in_one_request(self):
+        """Бронирования туда и обратно создаются одним запросом в порядке участков"""
+        response = self.client.post(self.url, {
+            'legs': [self.leg(self.trips[1], [2]), self.leg(self.trips[0], [1, 2])]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([booking['trip']['id'] for booking in response.data], [self.trips[1].id, self.trips[0].id])
+        self.assertEqual(response.data[1]['seat_numbers'], [1, 2])
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(TripSeat.objects.filter(is_booked=True).count(), 3)
+
+    def test_unavailable_seat_rolls_back_all_legs(self):
+        """Если место одного участка занято, не создаётся ни одно бронирование"""
+        BookingService.create_booking({'user': self.user}, self.leg(self.trips[1], [3]))
+
+        response = self.client.post(self.url, {
+            'legs': [self.leg(self.trips[0], [1]), self.leg(self.trips[1], [3, 4])]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1', response.data['legs'])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(TripSeat.objects.filter(trip=self.trips[0], is_booked=True).exists())
+        self.trips[0].refresh_from_db()
+        self.assertEqual(self.trips[0].available_seats, 10)
+
+    def test_invalid_legs_are_reported_by_position(self):
+        """Ошибки проверки возвращаются по номерам участков до резервирования мест"""
+        Trip.objects.filter(pk=self.trips[1].pk).update(is_bookable=False)
+
+        response = self.client.post(self.url, {
+            'legs': [self.leg(self.trips[0], [1]), self.leg(self.trips[1], [1])]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data['legs']), ['1'])
+        self.assertIn('trip_id', response.data['legs']['1'])
+        self.assertFalse(TripSeat.objects.filter(is_booked=True).exists())
+
+    def test_repeated_trip_and_empty_request_are_rejected(self):
+        """Одна поездка не может повторяться, а пустой запрос не принимается"""
+        response = self.client.post(self.url, {
+            'legs': [self.leg(self.trips[0], [1]), self.leg(self.trips[0], [2])]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'legs': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Booking.objects.exists())
+
+
+class BookingTotalPriceTest(APITestCase):
+    """Итоговая стоимость хранится в бронировании"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('+79111111120', 'userpass')
+        driver = User.objects.create_user('+79555555559', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        driver.groups.add(driver_group)
+
+        vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='М654ММ', total_seats=20)
+        self.trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('800.00'),
+            back_seat_price=Decimal('600.00')
+        )
+        self.client.force_authenticate(user=self.user)
+
+        patcher = patch('apps.booking.services.find_address_by_name', return_value='ул. Ленина, 1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def book(self, seat_numbers):
+        return BookingService.create_booking({'user': self.user}, {
+            'trip_id': self.trip.id,
+            'seat_numbers': seat_numbers,
+            'pickup_location': 'ул. Ленина, 1',
+            'dropoff_location': 'ул. Ленина, 2',
+        })
+
+    def test_price_is_frozen_at_creation(self):
+        """Стоимость берётся из цен мест и не меняется при изменении цен поездки"""
+        booking = self.book([1, 2])
+        self.assertEqual(booking.total_price, Decimal('1600.00'))
+
+        self.trip.back_seat_price = Decimal('700.00')
+        self.trip.save()
+        booking.refresh_from_db()
+        self.assertEqual(booking.get_total_price(), Decimal('1600.00'))
+
+    def test_legacy_booking_uses_seat_costs(self):
+        """Для бронирований без сохранённой стоимости она считается по ценам мест"""
+        booking = self.book([1, 3])
+        Booking.objects.filter(pk=booking.pk).update(total_price=None)
+
+        response = self.client.get(reverse('booking-detail', args=[booking.pk]))
+        self.assertEqual(response.data['total_price'], '1600.00')
+
+    def test_list_query_count_does_not_depend_on_booking_count(self):
+        """Число запросов при выводе списка бронирований не зависит от их количества"""
+        self.book([1])
+        # Права пользователя загружаются из базы при первом запросе, дальше берутся из кэша
+        self.client.get(reverse('booking-list'))
+        with CaptureQueriesContext(connection) as one_booking:
+            self.client.get(reverse('booking-list'))
+
+        for seat_number in range(2, 12):
+            self.book([seat_number])
+        Booking.objects.filter(trip_seats__seat__seat_number=5).update(total_price=None)
+        with CaptureQueriesContext(connection) as many_bookings:
+            response = self.client.get(reverse('booking-list'))
+
+        self.assertEqual(response.data['count'], 11)
+        self.assertEqual(len(one_booking), len(many_bookings))
+
+
+class SeatReleaseTest(APITestCase):
+    """Освобождение мест при отмене, деактивации и удалении бронирований"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'+7911111113{i}', 'userpass') for i in range(6)]
+        driver = User.objects.create_user('+79555555560', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        driver.groups.add(driver_group)
+
+        vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='Р987РР', total_seats=20)
+        self.trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('1000.00')
+        )
+
+        patcher = patch('apps.booking.services.find_address_by_name', return_value='ул. Ленина, 1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def book(self, user, seat_numbers):
+        return BookingService.create_booking({'user': user}, {
+            'trip_id': self.trip.id,
+            'seat_numbers': seat_numbers,
+            'pickup_location': 'ул. Ленина, 1',
+            'dropoff_location': 'ул. Ленина, 2',
+        })
+
+    def assertFreeSeats(self, expected):
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, expected)
+        self.assertEqual(TripSeat.objects.filter(trip=self.trip, is_booked=False).count(), expected)
+
+    def test_cancel_releases_seats_once(self):
+        """Отмена освобождает места один раз; повторная отмена отклоняется и не трогает места"""
+        booking = self.book(self.users[0], [1, 2])
+        BookingService.cancel_booking(booking)
+        self.assertFreeSeats(20)
+
+        # Место отменённого бронирования забрал другой пользователь
+        self.book(self.users[1], [1])
+        with self.assertRaisesMessage(ValidationError, 'Бронирование уже отменено'):
+            BookingService.cancel_booking(Booking.objects.get(pk=booking.pk))
+        booking.save()
+        booking.delete()
+        self.assertFreeSeats(19)
+        self.assertTrue(TripSeat.objects.get(trip=self.trip, seat__seat_number=1).is_booked)
+
+    def test_cancel_issues_single_seat_update(self):
+        """Места освобождаются одним UPDATE, без сохранения каждого места"""
+        booking = self.book(self.users[0], [1, 2, 3, 4])
+
+        with CaptureQueriesContext(connection) as queries:
+            BookingService.cancel_booking(booking)
+
+        seat_updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE') and 'tripseat' in q['sql']]
+        self.assertEqual(len(seat_updates), 1)
+        self.assertFreeSeats(20)
+
+    def test_deactivate_all_bookings_of_trip(self):
+        """Отмена всех бронирований поездки выполняется фиксированным числом запросов"""
+        self.book(self.users[0], [1])
+        with CaptureQueriesContext(connection) as one_booking:
+            BookingService.deactivate_bookings(Booking.objects.filter(trip=self.trip))
+
+        for position, user in enumerate(self.users):
+            self.book(user, [2 * position + 2, 2 * position + 3])
+        with CaptureQueriesContext(connection) as many_bookings:
+            deactivated, released = BookingService.deactivate_bookings(Booking.objects.filter(trip=self.trip))
+
+        self.assertEqual((deactivated, released), (len(self.users), 2 * len(self.users)))
+        self.assertEqual(len(one_booking), len(many_bookings))
+        self.assertFalse(Booking.objects.filter(trip=self.trip, is_active=True).exists())
+        self.assertFreeSeats(20)
@@ -9,19 +9,25 @@ from django.core.cache import cache
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
 
 import logging
 
 from .permissions import HasBookingPermission
-from .serializers import BookingDetailSerializer
+from .serializers import BookingAddressStatusSerializer, BookingDetailSerializer
 from .services import BookingService
 from apps.trip.models import Trip
+from apps.trip.services.TripService import TripService
 from apps.seat.models import TripSeat
+from utils.address import GeocoderUnavailable
 from .models import Booking
 
 logger = logging.getLogger(__name__)
 
 bookingService = BookingService
+trip_service = TripService()
+
+ADDRESS_VALIDATION_UNAVAILABLE = "Проверка адресов временно недоступна, повторите попытку позже"
 
 class BookingViewSet(viewsets.ModelViewSet):
     """
@@ -51,7 +57,13 @@ class BookingViewSet(viewsets.ModelViewSet):
         tags=["Бронирования"]
     )
     def get_queryset(self):
-        queryset = Booking.objects.select_related('user', 'trip', 'payment').prefetch_related('trip_seats__seat')
+        # Поездки подгружаются одним запросом вместе с городами, транспортом,
+        # водителем и количеством свободных мест
+        # Итоговая стоимость хранится в бронировании, для старых бронирований считается в том же запросе
+        queryset = Booking.objects.with_total_price().select_related('user', 'payment').prefetch_related(
+            Prefetch('trip', queryset=trip_service.get_trip_queryset()),
+            'trip_seats__seat',
+        )
         
         # Добавляем специальную обработку для параметра is_active
         is_active = self.request.query_params.get('is_active')
@@ -97,7 +109,46 @@ class BookingViewSet(viewsets.ModelViewSet):
         tags=["Бронирования"]
     )
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        try:
+            return super().create(request, *args, **kwargs)
+        except GeocoderUnavailable:
+            return Response({"detail": ADDRESS_VALIDATION_UNAVAILABLE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @swagger_auto_schema(
+        operation_description="Создание нескольких бронирований одним запросом, например поездки туда и обратно. Места всех поездок резервируются в одной транзакции: если хотя бы один участок не удалось забронировать, не создаётся ни одно бронирование. Ошибки проверки возвращаются по номерам участков.",
+        operation_summary="Пакетное бронирование",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['legs'],
+            properties={
+                'legs': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description='Участки поездки',
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        required=['trip_id', 'seat_numbers', 'pickup_location', 'dropoff_location'],
+                        properties={
+                            'trip_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='ID поездки'),
+                            'seat_numbers': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER),
+                                                        description='Массив номеров мест для бронирования'),
+                            'pickup_location': openapi.Schema(type=openapi.TYPE_STRING, description='Адрес посадки'),
+                            'dropoff_location': openapi.Schema(type=openapi.TYPE_STRING, description='Адрес высадки')
+                        }
+                    )
+                )
+            }
+        ),
+        responses={201: BookingDetailSerializer(many=True)},
+        tags=["Бронирования"]
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        try:
+            bookings = BookingService.create_bookings(request.user, request.data.get('legs'))
+        except GeocoderUnavailable:
+            return Response({"detail": ADDRESS_VALIDATION_UNAVAILABLE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        serializer = self.get_serializer(bookings, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @swagger_auto_schema(
         operation_description="Полное обновление бронирования. Доступно только владельцу или администратору.",
@@ -187,6 +238,19 @@ class BookingViewSet(viewsets.ModelViewSet):
             logger.error(f"Error canceling booking: {e}")
             return Response({"error": f"Ошибка при отмене бронирования: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @swagger_auto_schema(
+        operation_description="Статус проверки адресов бронирования для опроса клиентом. При асинхронной проверке бронирование создаётся со статусом pending и затем переходит в confirmed (адреса нормализованы) или rejected (бронирование отменено, места освобождены).",
+        operation_summary="Статус проверки адресов бронирования",
+        responses={200: BookingAddressStatusSerializer},
+        tags=["Бронирования"]
+    )
+    @action(detail=True, methods=['get'], url_path='address-status')
+    def address_status(self, request, pk=None):
+        # Лёгкий запрос без вложенных данных поездки: эндпоинт опрашивается периодически
+        booking = get_object_or_404(BookingService.get_user_bookings(request.user), pk=pk)
+        self.check_object_permissions(request, booking)
+        return Response(BookingAddressStatusSerializer(booking).data)
+
 def get_trip_seats(request):
     """
     Возвращает список TripSeat (id и строковое представление) 
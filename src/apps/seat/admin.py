@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
+
 from apps.seat.models import Seat, TripSeat
+from apps.trip.services.TripService import TripService
 
 
 @admin.register(Seat)
@@ -69,4 +72,11 @@ class TripSeatAdmin(admin.ModelAdmin):
         """Информация о месте"""
         return f"{obj.seat.vehicle.license_plate} - Место {obj.seat.seat_number} ({obj.seat.get_price_zone_display()})"
 
-    seat_info.short_description = "Место"
\ No newline at end of file
+    seat_info.short_description = "Место"
+
+    def save_model(self, request, obj, form, change):
+        """Сохраняет место и синхронизирует счётчик свободных мест поездки"""
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if change and 'is_booked' in form.changed_data:
+                TripService().change_available_seats(obj.trip_id, -1 if obj.is_booked else 1)
\ No newline at end of file
@@ -1,3 +1,6 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.db import models
 from django.core.exceptions import ValidationError
 
@@ -11,6 +14,36 @@ PRICE_ZONES_CHOICES = [
     ("back", "Заднее"),
 ]
 
+# Флаг явно разрешённого удаления мест (см. allow_seat_deletion)
+_seat_deletion_allowed = ContextVar('seat_deletion_allowed', default=False)
+
+
+@contextmanager
+def allow_seat_deletion():
+    """
+    Контекст, внутри которого разрешено удаление мест.
+    Используется сервисом мест при изменении количества мест транспортного средства.
+    """
+    token = _seat_deletion_allowed.set(True)
+    try:
+        yield
+    finally:
+        _seat_deletion_allowed.reset(token)
+
+
+class SeatQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Массовое удаление мест разрешено только внутри allow_seat_deletion:
+        QuerySet.delete() не вызывает Seat.delete(). Каскадное удаление
+        транспортного средства сюда не попадает и по-прежнему удаляет его места.
+        """
+        if not _seat_deletion_allowed.get():
+            raise ValidationError(
+                "Удаление мест запрещено. Удалите транспортное средство или измените количество мест."
+            )
+        return super().delete()
+
 
 class Seat(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, verbose_name="Транспорт")
@@ -22,6 +55,8 @@ class Seat(models.Model):
         verbose_name="Ценовая зона"
     )
 
+    objects = SeatQuerySet.as_manager()
+
     class Meta:
         unique_together = ('vehicle', 'seat_number')
         ordering = ['vehicle', 'seat_number']
@@ -91,18 +126,11 @@ class Seat(models.Model):
         """
         Запрещает удаление отдельных мест через прямой вызов delete().
         Удаление возможно только через удаление транспортного средства
-        или через обновление количества мест в транспортном средстве.
+        или через обновление количества мест в транспортном средстве
+        (внутри контекста allow_seat_deletion).
         """
-        # Проверяем, вызывается ли delete из сигнала обработки обновления vehicle
-        import inspect
-        frame = inspect.currentframe()
-        try:
-            calling_frame = frame.f_back
-            if calling_frame and 'manage_seats' in calling_frame.f_code.co_name:
-                # Если вызов идет из функции manage_seats в signals.py, разрешаем удаление
-                return super().delete(*args, **kwargs)
-        finally:
-            del frame  # Освобождаем фрейм во избежание утечек памяти
+        if _seat_deletion_allowed.get():
+            return super().delete(*args, **kwargs)
 
         # Для всех остальных случаев - запрещаем удаление
         raise ValidationError(
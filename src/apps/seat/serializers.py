@@ -17,7 +17,13 @@ class SeatSerializer(serializers.ModelSerializer):
 class TripSeatSerializer(serializers.ModelSerializer):
     seat = SeatSerializer(read_only=True)
     trip = TripDetailSerializer(read_only=True)
+    is_held = serializers.SerializerMethodField()
 
     class Meta:
         model = TripSeat
-        fields = ('id', 'trip', 'seat', 'is_booked', 'cost')
\ No newline at end of file
+        fields = ('id', 'trip', 'seat', 'is_booked', 'is_held', 'cost')
+
+    def get_is_held(self, obj):
+        """Место удерживается другим пользователем (удержания передаются в контексте 'holds')"""
+        holder = self.context.get('holds', {}).get(obj.pk)
+        return holder is not None and holder != self.context.get('user_id')
@@ -0,0 +1,270 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from ..models import TripSeat
+from apps.trip.models import Trip
+from apps.trip.services.TripService import TripService
+
+# Удержание места хранится в трёх структурах Redis:
+# - seat_hold:{trip_seat_id} — id пользователя, живёт SEAT_HOLD_TIMEOUT секунд;
+# - seat_holds:trip:{trip_id} — места поездки с временем окончания удержания (для карты мест);
+# - seat_holds:expiry — все удержания «trip_id:trip_seat_id» по времени окончания (для очистки).
+# Член множества поездки — единица учёта в счётчике свободных мест: он добавляется
+# и удаляется ровно один раз, поэтому счётчик уменьшается и восстанавливается ровно один раз.
+# Время берётся из Redis (TIME), чтобы расхождение часов серверов не влияло на сроки.
+
+# Удерживает места, если ни одно из них не удерживает другой пользователь.
+# Повторное удержание своего места продлевает его. Возвращает {число новых удержаний,
+# время окончания в мс, места других пользователей}
+HOLD_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local expires = now + tonumber(ARGV[2])
+local conflicts = {}
+for i = 3, #KEYS do
+    local holder = redis.call('GET', KEYS[i])
+    if holder and holder ~= ARGV[1] then
+        table.insert(conflicts, ARGV[i + 1])
+    end
+end
+if #conflicts > 0 then
+    return {0, 0, conflicts}
+end
+local added = 0
+for i = 3, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[1], 'PX', ARGV[2])
+    added = added + redis.call('ZADD', KEYS[1], expires, ARGV[i + 1])
+    redis.call('ZADD', KEYS[2], expires, ARGV[3] .. ':' .. ARGV[i + 1])
+end
+return {added, expires, conflicts}
+"""
+
+# Снимает удержания пользователя с мест. Возвращает число снятых удержаний
+RELEASE_SCRIPT = """
+local released = 0
+for i = 3, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+        released = released + redis.call('ZREM', KEYS[1], ARGV[i])
+        redis.call('ZREM', KEYS[2], ARGV[2] .. ':' .. ARGV[i])
+    end
+end
+return released
+"""
+
+# Удаляет из множеств не больше ARGV[1] истёкших удержаний. Возвращает их «trip_id:trip_seat_id».
+# Если место уже удержано заново, его время окончания обновлено и оно не считается истёкшим
+SWEEP_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+local released = {}
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], member)
+    local separator = string.find(member, ':', 1, true)
+    local trip_key = ARGV[2] .. string.sub(member, 1, separator - 1)
+    local seat_id = string.sub(member, separator + 1)
+    local score = redis.call('ZSCORE', trip_key, seat_id)
+    if score and tonumber(score) <= now then
+        redis.call('ZREM', trip_key, seat_id)
+        table.insert(released, member)
+    end
+end
+return released
+"""
+
+
+class SeatHoldService:
+    """
+    Сервис краткосрочного удержания мест поездки на время оформления бронирования.
+
+    Удержанное место не может забронировать или удержать другой пользователь, а счётчик
+    свободных мест поездки уменьшается на время удержания. Удержание снимается при
+    бронировании места, явно или по истечении срока (задача release_expired_seat_holds).
+    """
+
+    SEAT_KEY = 'seat_hold:{}'
+    TRIP_KEY = 'seat_holds:trip:{}'
+    EXPIRY_KEY = 'seat_holds:expiry'
+    SWEEP_BATCH_SIZE = 1000
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.trip_service = TripService()
+        self.logger = logging.getLogger(__name__)
+        self._scripts = {}
+
+    def _redis(self):
+        return get_redis_connection(self.alias)
+
+    def _script(self, source):
+        if source not in self._scripts:
+            self._scripts[source] = self._redis().register_script(source)
+        return self._scripts[source]
+
+    def _keys(self, trip_id, trip_seat_ids):
+        return [self.TRIP_KEY.format(trip_id), self.EXPIRY_KEY] + [
+            self.SEAT_KEY.format(trip_seat_id) for trip_seat_id in trip_seat_ids
+        ]
+
+    def hold_seats(self, user, trip: Trip, seat_numbers: List[int]) -> dict:
+        """
+        Удерживает свободные места поездки для пользователя на SEAT_HOLD_TIMEOUT секунд.
+        Места, которые пользователь уже удерживает, продлеваются.
+        Если хотя бы одно место занято или удерживается другим пользователем, не удерживается ни одно.
+        """
+        if not trip.is_bookable:
+            raise ValidationError("Эта поездка недоступна для бронирования")
+        if not seat_numbers:
+            raise ValidationError("Необходимо выбрать хотя бы одно место")
+
+        trip_id = trip.pk
+        seat_numbers = sorted(set(seat_numbers))
+        trip_seats = dict(
+            TripSeat.objects.filter(trip_id=trip_id, seat__seat_number__in=seat_numbers, is_booked=False)
+            .values_list('seat__seat_number', 'pk')
+        )
+        unavailable = [number for number in seat_numbers if number not in trip_seats]
+        if unavailable:
+            raise ValidationError(
+                f"Места с номером {', '.join(map(str, unavailable))} недоступны для бронирования"
+            )
+
+        trip_seat_ids = [trip_seats[number] for number in seat_numbers]
+        timeout_ms = int(settings.SEAT_HOLD_TIMEOUT * 1000)
+        added, expires, conflicts = self._script(HOLD_SCRIPT)(
+            keys=self._keys(trip_id, trip_seat_ids),
+            args=[user.pk, timeout_ms, trip_id] + trip_seat_ids,
+        )
+        if conflicts:
+            held_ids = {int(trip_seat_id) for trip_seat_id in conflicts}
+            held_numbers = [number for number in seat_numbers if trip_seats[number] in held_ids]
+            raise ValidationError(
+                f"Места с номером {', '.join(map(str, held_numbers))} удерживаются другим пользователем"
+            )
+
+        # Место могли забронировать между проверкой и удержанием: такие удержания сразу снимаются
+        booked_ids = set(
+            TripSeat.objects.filter(pk__in=trip_seat_ids, is_booked=True).values_list('pk', flat=True)
+        )
+        self.trip_service.change_available_seats(trip_id, -added)
+        if booked_ids:
+            self.release_seats(user, trip_id, list(booked_ids))
+            booked_numbers = [number for number in seat_numbers if trip_seats[number] in booked_ids]
+            raise ValidationError(
+                f"Места с номером {', '.join(map(str, booked_numbers))} недоступны для бронирования"
+            )
+
+        self.logger.info(f"User {user.pk} holds seats {seat_numbers} of trip {trip_id}")
+        return {'trip_id': trip_id, 'seat_numbers': seat_numbers, 'expires_at': datetime.fromtimestamp(expires / 1000, tz=timezone.utc)}
+
+    def release_seats(self, user, trip_id: int, trip_seat_ids: List[int]) -> int:
+        """Снимает удержания пользователя с мест поездки и возвращает места в счётчик свободных"""
+        if not trip_seat_ids:
+            return 0
+        released = self._script(RELEASE_SCRIPT)(
+            keys=self._keys(trip_id, trip_seat_ids),
+            args=[user.pk, trip_id] + list(trip_seat_ids),
+        )
+        self.trip_service.change_available_seats(trip_id, released)
+        if released:
+            self.logger.info(f"Released {released} seat holds of user {user.pk} on trip {trip_id}")
+        return released
+
+    def consume_seats(self, user, trip_id: int, trip_seat_ids: List[int]) -> int:
+        """
+        Снимает удержания пользователя с забронированных мест, не возвращая их в счётчик свободных:
+        место переходит из удержанных в занятые. Вызывается в транзакции бронирования.
+        Возвращает число снятых удержаний: истёкшие к этому моменту удержания вернёт в счётчик очистка
+        """
+        if not trip_seat_ids:
+            return 0
+        return self._script(RELEASE_SCRIPT)(
+            keys=self._keys(trip_id, trip_seat_ids),
+            args=[user.pk, trip_id] + list(trip_seat_ids),
+        )
+
+    def release_user_holds(self, user, trip_id: int) -> int:
+        """Снимает все удержания пользователя на поездке"""
+        return self.release_seats(user, trip_id, list(self.get_user_holds(user, trip_id)))
+
+    def release_expired_holds(self) -> int:
+        """
+        Снимает истёкшие удержания всех поездок и возвращает их места в счётчики свободных мест.
+        Каждое удержание учитывается ровно один раз, даже при параллельном запуске.
+        """
+        sweep = self._script(SWEEP_SCRIPT)
+        total = 0
+        while True:
+            released = sweep(
+                keys=[self.EXPIRY_KEY],
+                args=[self.SWEEP_BATCH_SIZE, self.TRIP_KEY.format('')],
+            )
+            per_trip = Counter(int(member.split(b':')[0]) for member in released)
+            for trip_id, count in per_trip.items():
+                self.trip_service.change_available_seats(trip_id, count)
+            total += len(released)
+            if len(released) < self.SWEEP_BATCH_SIZE:
+                break
+        if total:
+            self.logger.info(f"Released {total} expired seat holds")
+        return total
+
+    def get_trip_holds(self, trip_id: int) -> Dict[int, int]:
+        """
+        Действующие удержания мест поездки: {trip_seat_id: id пользователя}.
+        Два обращения к Redis независимо от числа мест; при недоступности Redis — пустой словарь.
+        """
+        try:
+            redis = self._redis()
+            now_ms = int(time.time() * 1000)
+            trip_seat_ids = [
+                int(trip_seat_id)
+                for trip_seat_id in redis.zrangebyscore(self.TRIP_KEY.format(trip_id), f'({now_ms}', '+inf')
+            ]
+            if not trip_seat_ids:
+                return {}
+            holders = redis.mget([self.SEAT_KEY.format(trip_seat_id) for trip_seat_id in trip_seat_ids])
+        except RedisError as e:
+            self.logger.error(f"Seat holds of trip {trip_id} are unavailable: {e}")
+            return {}
+        return {
+            trip_seat_id: int(holder)
+            for trip_seat_id, holder in zip(trip_seat_ids, holders) if holder is not None
+        }
+
+    def get_holders(self, trip_seat_ids: List[int]) -> Dict[int, int]:
+        """Кто удерживает указанные места: {trip_seat_id: id пользователя} только для удержанных"""
+        if not trip_seat_ids:
+            return {}
+        try:
+            holders = self._redis().mget([self.SEAT_KEY.format(trip_seat_id) for trip_seat_id in trip_seat_ids])
+        except RedisError as e:
+            self.logger.error(f"Seat holds are unavailable: {e}")
+            return {}
+        return {
+            trip_seat_id: int(holder)
+            for trip_seat_id, holder in zip(trip_seat_ids, holders) if holder is not None
+        }
+
+    def get_user_holds(self, user, trip_id: int) -> List[int]:
+        """id мест поездки, которые удерживает пользователь"""
+        return [
+            trip_seat_id for trip_seat_id, holder in self.get_trip_holds(trip_id).items() if holder == user.pk
+        ]
+
+    def get_held_seat_counts(self) -> Dict[int, int]:
+        """Количество действующих удержаний по поездкам (для сверки счётчиков свободных мест)"""
+        now_ms = int(time.time() * 1000)
+        members = self._redis().zrangebyscore(self.EXPIRY_KEY, f'({now_ms}', '+inf')
+        return dict(Counter(int(member.split(b':')[0]) for member in members))
@@ -2,7 +2,9 @@ import logging
 from typing import List, Optional
 
 from django.core.exceptions import ValidationError
-from ..models import Seat
+from django.db.models import QuerySet
+
+from ..models import Seat, allow_seat_deletion
 from apps.vehicle.models import Vehicle
 
 class SeatService:
@@ -83,4 +85,19 @@ class SeatService:
             raise
         except Exception as e:
             self.logger.error(f"Error when trying to get seats by vehicle: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def delete_seats(self, seats: QuerySet) -> int:
+        """
+        Массово удалить места (вместе с местами поездок) одним набором запросов.
+        Единственный поддерживаемый способ удаления мест, кроме удаления транспортного средства.
+        """
+        self.logger.debug("Trying to delete seats in bulk")
+        try:
+            with allow_seat_deletion():
+                deleted, _ = seats.delete()
+            self.logger.info(f"Deleted objects while removing seats: {deleted}")
+            return deleted
+        except Exception as e:
+            self.logger.error(f"Error when trying to delete seats: {e}")
+            raise
@@ -11,19 +11,25 @@ class TripSeatService:
         """
         Creates TripSeat records for each seat of the vehicle associated with the trip.
         Sets the cost of the TripSeat based on the seat type and the prices defined in the Trip model.
+        All records are built in memory and written with a single bulk insert,
+        so the number of queries does not depend on the vehicle size.
         """
         try:
-            vehicle_seats = Seat.objects.filter(vehicle=trip.vehicle)
-            for seat in vehicle_seats:
-                cost = 0
-                if seat.price_zone == 'front':
-                    cost = trip.front_seat_price
-                elif seat.price_zone == 'middle':
-                    cost = trip.middle_seat_price
-                elif seat.price_zone == 'back':
-                    cost = trip.back_seat_price
-                
-                TripSeat.objects.create(trip=trip, seat=seat, cost=cost)
+            zone_prices = {
+                'front': trip.front_seat_price,
+                'middle': trip.middle_seat_price,
+                'back': trip.back_seat_price,
+            }
+            vehicle_seats = Seat.objects.filter(vehicle_id=trip.vehicle_id).only('pk', 'price_zone')
+            trip_seats = TripSeat.objects.bulk_create([
+                TripSeat(trip=trip, seat=seat, cost=zone_prices.get(seat.price_zone, 0))
+                for seat in vehicle_seats
+            ])
+            created_count = len(trip_seats)
+
+            # Все созданные места свободны
+            Trip.objects.filter(pk=trip.pk).update(available_seats=created_count)
+            trip.available_seats = created_count
             self.logger.info(f"TripSeat records successfully created for Trip id: {trip.id} with differentiated pricing.")
         except Exception as e:
             self.logger.exception(f"Error while creating TripSeat records for Trip id: {trip.id}. Exception: {e}")
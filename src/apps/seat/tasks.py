@@ -0,0 +1,16 @@
+from celery import shared_task
+from apps.seat.services.seat_hold_service import SeatHoldService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task()
+def release_expired_seat_holds() -> int:
+    """
+    Периодическая задача, которая снимает истёкшие удержания мест
+    и возвращает эти места в счётчики свободных мест поездок.
+    """
+    released = SeatHoldService().release_expired_holds()
+    logger.info(f"Released {released} expired seat holds")
+    return released
@@ -1,17 +1,26 @@
 from django.contrib.auth.models import Permission, Group
 from django.contrib.contenttypes.models import ContentType
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta
+import time
 from decimal import Decimal
+from unittest.mock import patch
 
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from apps.auth.models import User
-from apps.seat.models import Seat, TripSeat
+from apps.seat.models import Seat, TripSeat, allow_seat_deletion
+from apps.booking.services import BookingService
+from apps.seat.services.seat_hold_service import SeatHoldService
+from apps.seat.services.seat_service import SeatService
+from apps.seat.tasks import release_expired_seat_holds
 from apps.trip.models import Trip, City
 from apps.vehicle.models import Vehicle
 
@@ -84,6 +93,30 @@ class SeatModelTest(TestCase):
         with self.assertRaises(ValidationError):
             seat.delete()
 
+    def test_seat_deletion_allowed_in_context(self):
+        """Тест удаления мест в явно разрешённом контексте и через сервис"""
+        seat = self.seats.last()
+        with allow_seat_deletion():
+            seat.delete()
+        self.assertFalse(Seat.objects.filter(pk=seat.pk).exists())
+
+        # Вне контекста удаление снова запрещено
+        with self.assertRaises(ValidationError):
+            self.seats.first().delete()
+
+        SeatService().delete_seats(Seat.objects.filter(vehicle=self.vehicle, seat_number__gt=2))
+        self.assertEqual(Seat.objects.filter(vehicle=self.vehicle).count(), 2)
+
+    def test_seat_queryset_deletion_restriction(self):
+        """Массовое удаление мест вне контекста запрещено, удаление транспорта удаляет его места"""
+        with self.assertRaises(ValidationError):
+            Seat.objects.filter(vehicle=self.vehicle).delete()
+        self.assertEqual(Seat.objects.filter(vehicle=self.vehicle).count(), self.vehicle.total_seats)
+
+        vehicle_id = self.vehicle.pk
+        self.vehicle.delete()
+        self.assertFalse(Seat.objects.filter(vehicle_id=vehicle_id).exists())
+
     def test_vehicle_update_seats_count(self):
         """Тест обновления количества мест при изменении транспортного средства"""
         # Исходное количество мест
@@ -221,6 +254,62 @@ class TripSeatModelTest(TestCase):
         self.assertTrue(test_seat.is_booked_for_trip(trip2))
 
 
+class TripSeatBulkCreateTest(TestCase):
+    """Тесты массового создания мест поездки"""
+
+    VEHICLE_SIZES = (('car', 4), ('minibus', 20), ('bus', 50), ('bus', 199))
+
+    def setUp(self):
+        self.from_city = City.objects.create(name='Москва')
+        self.to_city = City.objects.create(name='Санкт-Петербург')
+        self.driver = User.objects.create_user('+79111111114', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+
+    def create_trip(self, vehicle, days=1):
+        return Trip.objects.create(
+            vehicle=vehicle,
+            driver=self.driver,
+            from_city=self.from_city,
+            to_city=self.to_city,
+            departure_time=timezone.now() + timedelta(days=days),
+            arrival_time=timezone.now() + timedelta(days=days, hours=5),
+            front_seat_price=Decimal('1500.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('800.00')
+        )
+
+    def test_trip_seats_cost_by_price_zone(self):
+        """Стоимость места поездки берётся из цены его ценовой зоны"""
+        vehicle = Vehicle.objects.create(vehicle_type='minibus', license_plate='В111ВВ', total_seats=4)
+        Seat.objects.filter(vehicle=vehicle, seat_number=2).update(price_zone='middle')
+        trip = self.create_trip(vehicle)
+
+        costs = dict(TripSeat.objects.filter(trip=trip).values_list('seat__seat_number', 'cost'))
+        self.assertEqual(costs, {
+            1: Decimal('1500.00'), 2: Decimal('1000.00'), 3: Decimal('800.00'), 4: Decimal('800.00')
+        })
+        self.assertEqual(trip.available_seats, 4)
+
+    def test_trip_creation_query_count_does_not_depend_on_vehicle_size(self):
+        """
+        Число запросов при создании поездки не зависит от количества мест.
+        Задержка создания замеряется командой benchmark_trip_creation.
+        """
+        query_counts = {}
+        for index, (vehicle_type, total_seats) in enumerate(self.VEHICLE_SIZES):
+            vehicle = Vehicle.objects.create(
+                vehicle_type=vehicle_type, license_plate=f'А{index:03d}АА', total_seats=total_seats
+            )
+            with CaptureQueriesContext(connection) as queries:
+                trip = self.create_trip(vehicle, days=index + 1)
+
+            self.assertEqual(TripSeat.objects.filter(trip=trip).count(), total_seats)
+            query_counts[total_seats] = len(queries)
+
+        self.assertEqual(len(set(query_counts.values())), 1, query_counts)
+
+
 class SeatAPITest(APITestCase):
     """Тесты для API мест"""
 
@@ -701,4 +790,124 @@ class SeatPermissionTest(APITestCase):
             "price_zone": "back"
         }
         response = self.client.patch(self.seat1_detail_url, data)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class SeatHoldTest(APITestCase):
+    """Тесты удержания мест на время оформления бронирования"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.user = User.objects.create_user('+79666666661', 'userpass')
+        self.other_user = User.objects.create_user('+79666666662', 'userpass')
+        driver = User.objects.create_user('+79666666663', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        driver.groups.add(driver_group)
+
+        vehicle = Vehicle.objects.create(vehicle_type='minibus', license_plate='Х111ХХ', total_seats=5)
+        self.trip = Trip.objects.create(
+            vehicle=vehicle,
+            driver=driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=timezone.now() + timedelta(days=1),
+            arrival_time=timezone.now() + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('1000.00'),
+            back_seat_price=Decimal('1000.00')
+        )
+        self.hold_url = reverse('trip-hold', args=[self.trip.id])
+        self.service = SeatHoldService()
+
+        patcher = patch('apps.booking.services.find_address_by_name', return_value='ул. Ленина, 1')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertAvailableSeats(self, expected):
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, expected)
+
+    def test_held_seats_are_unavailable_to_other_users(self):
+        """Удержанное место нельзя удержать или забронировать другому пользователю"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.hold_url, {'seat_numbers': [1, 2]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['seat_numbers'], [1, 2])
+        self.assertAvailableSeats(3)
+
+        # Повторное удержание своих мест только продлевает его
+        self.client.post(self.hold_url, {'seat_numbers': [1, 2]}, format='json')
+        self.assertAvailableSeats(3)
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.post(self.hold_url, {'seat_numbers': [2, 3]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        with self.assertRaisesMessage(ValidationError, 'Места с номером 2 недоступны для бронирования'):
+            BookingService.create_booking({'user': self.other_user}, {
+                'trip_id': self.trip.id,
+                'seat_numbers': [2, 3],
+                'pickup_location': 'ул. Ленина, 1',
+                'dropoff_location': 'ул. Ленина, 2',
+            })
+
+        response = self.client.get(reverse('trip-seats', args=[self.trip.id]))
+        held = {seat['seat']['seat_number'] for seat in response.data if seat['is_held']}
+        self.assertEqual(held, {1, 2})
+        self.assertAvailableSeats(3)
+
+    def test_booking_converts_hold(self):
+        """Бронирование без номеров мест забирает удержанные места и снимает удержание"""
+        self.service.hold_seats(self.user, self.trip, [4, 5])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = BookingService.create_booking({'user': self.user}, {
+                'trip_id': self.trip.id,
+                'pickup_location': 'ул. Ленина, 1',
+                'dropoff_location': 'ул. Ленина, 2',
+            })
+
+        self.assertEqual(sorted(ts.seat.seat_number for ts in booking.trip_seats.all()), [4, 5])
+        self.assertEqual(self.service.get_trip_holds(self.trip.id), {})
+        self.assertAvailableSeats(3)
+
+    def test_booking_all_held_seats(self):
+        """Бронирование всех мест поездки через удержание не уводит счётчик ниже нуля"""
+        self.service.hold_seats(self.user, self.trip, [1, 2, 3, 4, 5])
+        self.assertAvailableSeats(0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = BookingService.create_booking({'user': self.user}, {
+                'trip_id': self.trip.id,
+                'seat_numbers': [1, 2, 3, 4, 5],
+                'pickup_location': 'ул. Ленина, 1',
+                'dropoff_location': 'ул. Ленина, 2',
+            })
+
+        self.assertEqual(booking.trip_seats.count(), 5)
+        self.assertEqual(self.service.get_trip_holds(self.trip.id), {})
+        self.assertAvailableSeats(0)
+
+    def test_release_returns_seats(self):
+        """Снятие удержания возвращает места в счётчик свободных"""
+        self.service.hold_seats(self.user, self.trip, [1, 2, 3])
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.delete(self.hold_url)
+
+        self.assertEqual(response.data['released'], 3)
+        self.assertAvailableSeats(5)
+
+    @override_settings(SEAT_HOLD_TIMEOUT=0.05)
+    def test_expired_holds_are_swept(self):
+        """Истёкшие удержания снимаются задачей ровно один раз"""
+        self.service.hold_seats(self.user, self.trip, [1, 2])
+        self.assertAvailableSeats(3)
+        time.sleep(0.1)
+
+        self.assertEqual(release_expired_seat_holds(), 2)
+        self.assertEqual(release_expired_seat_holds(), 0)
+        self.assertAvailableSeats(5)
+        # Место свободно для другого пользователя
+        self.service.hold_seats(self.other_user, self.trip, [1])
+        self.assertAvailableSeats(4)
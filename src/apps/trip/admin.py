@@ -1,6 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
-from .models import Trip, City
+from django.utils import timezone
+from .models import Trip, City, TripSchedule
+from .services.TripService import TripService
+from .services.TripScheduleService import TripScheduleService
 from apps.auth.models import User
 
 @admin.register(City)
@@ -16,8 +19,10 @@ class TripAdminForm(forms.ModelForm):
 
 @admin.register(Trip)
 class TripAdmin(admin.ModelAdmin):
-    list_display = ('vehicle', 'from_city', 'to_city', 'departure_time', 'arrival_time', 'front_seat_price', 'middle_seat_price', 'back_seat_price', 'is_bookable', 'booking_cutoff_minutes', 'driver')
+    list_display = ('vehicle', 'from_city', 'to_city', 'departure_time', 'arrival_time', 'front_seat_price', 'middle_seat_price', 'back_seat_price', 'is_bookable', 'booking_cutoff_minutes', 'available_seats', 'driver')
     list_filter = ('vehicle', 'from_city', 'to_city', 'departure_time', 'is_bookable', 'driver')
+    readonly_fields = ('available_seats',)
+    actions = ('deactivate_trips',)
     search_fields = ('vehicle__license_plate', 'from_city__name', 'to_city__name', 'is_bookable')
     fieldsets = (
         (None, {
@@ -31,7 +36,7 @@ class TripAdmin(admin.ModelAdmin):
             'fields': ('front_seat_price', 'middle_seat_price', 'back_seat_price')
         }),
         ('Дополнительные данные', {
-            'fields': ('is_bookable', 'booking_cutoff_minutes'),
+            'fields': ('is_bookable', 'booking_cutoff_minutes', 'available_seats'),
             'description': 'Поля, связанные с возможностью бронирования: is_bookable определяет, можно ли сделать бронирование, а booking_cutoff_minutes – время до отправления, после которого бронирование закрывается.'
 
         })
@@ -45,9 +50,19 @@ class TripAdmin(admin.ModelAdmin):
         return obj.arrival_time.strftime('%Y-%m-%d %H:%M')
     formatted_arrival.short_description = 'Дата и время прибытия'
 
+    @admin.action(description='Деактивировать выбранные поездки и их бронирования')
+    def deactivate_trips(self, request, queryset):
+        trips_count, bookings_count, seats_count = TripService().deactivate_trips(
+            queryset.values_list('pk', flat=True)
+        )
+        self.message_user(
+            request,
+            f'Деактивировано поездок: {trips_count}, бронирований: {bookings_count}, освобождено мест: {seats_count}'
+        )
+
     def save_model(self, request, obj, form, change):
         try:
-            obj.full_clean() 
+            # save() валидирует поездку, а пересечения проверяет база с понятным сообщением
             super().save_model(request, obj, form, change)
         except forms.ValidationError as e:
             form.add_error(None, e)
@@ -55,4 +70,25 @@ class TripAdmin(admin.ModelAdmin):
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "driver":
             kwargs["queryset"] = User.objects.filter(groups__name='Водитель')
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
\ No newline at end of file
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(TripSchedule)
+class TripScheduleAdmin(admin.ModelAdmin):
+    list_display = ('from_city', 'to_city', 'departure_time', 'duration', 'recurrence', 'vehicle', 'driver', 'starts_on', 'ends_on', 'materialized_until', 'is_active')
+    list_filter = ('is_active', 'from_city', 'to_city', 'vehicle', 'driver')
+    readonly_fields = ('materialized_until',)
+    actions = ('materialize_schedules',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "driver":
+            kwargs["queryset"] = User.objects.filter(groups__name='Водитель')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    @admin.action(description='Создать поездки по выбранным расписаниям')
+    def materialize_schedules(self, request, queryset):
+        trips, skipped = TripScheduleService().materialize(queryset.filter(is_active=True))
+        self.message_user(request, f'Создано поездок: {len(trips)}, пропущено отправлений: {len(skipped)}')
+        for item in skipped[:20]:
+            errors = '; '.join(item['errors'].values())
+            self.message_user(request, f"{timezone.localtime(item['departure_time']):%Y-%m-%d %H:%M}: {errors}", level=messages.WARNING)
@@ -1,4 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_btree_gist_extension(using, **kwargs):
+    """
+    Ограничения пересечения поездок сравнивают vehicle и driver оператором = в GiST-индексе,
+    для этого нужно расширение btree_gist. Создаётся до миграций, в том числе для тестовой базы
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
 
 
 class TripConfig(AppConfig):
@@ -9,3 +23,4 @@ class TripConfig(AppConfig):
 
     def ready(self):
         import apps.trip.signals
+        pre_migrate.connect(create_btree_gist_extension, sender=self)
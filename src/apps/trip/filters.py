@@ -1,3 +1,5 @@
+from datetime import datetime, time, timedelta
+
 import django_filters
 from django.utils import timezone
 
@@ -7,10 +9,22 @@ from apps.trip.models import Trip
 class TripFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name="middle_seat_price", lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name="middle_seat_price", lookup_expr='lte') 
-    date = django_filters.DateFilter(field_name="departure_time", lookup_expr='date')
+    date = django_filters.DateFilter(method='filter_date', label='Дата поездки')
     departure_after = django_filters.DateTimeFilter(field_name="departure_time", lookup_expr='gte')
     departure_before = django_filters.DateTimeFilter(field_name="departure_time", lookup_expr='lte')
     is_bookable = django_filters.BooleanFilter(field_name='is_bookable', label='Доступна для бронирования')
+    min_available_seats = django_filters.NumberFilter(field_name='available_seats', lookup_expr='gte',
+                                                      label='Минимальное количество свободных мест')
+
+    def filter_date(self, queryset, name, value):
+        """
+        Фильтрация по дате отправления в текущем часовом поясе.
+        Реализована как диапазон [начало дня, начало следующего дня), а не через
+        departure_time__date, чтобы запрос мог использовать индексы по departure_time.
+        """
+        day_start = timezone.make_aware(datetime.combine(value, time.min))
+        next_day_start = timezone.make_aware(datetime.combine(value + timedelta(days=1), time.min))
+        return queryset.filter(departure_time__gte=day_start, departure_time__lt=next_day_start)
 
     def filter_current(self, queryset, name, value):
         """
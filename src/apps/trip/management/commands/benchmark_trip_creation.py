@@ -0,0 +1,87 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.auth.models import User
+from apps.trip.models import City, Trip
+from apps.vehicle.models import Vehicle
+
+
+class BenchmarkFinished(Exception):
+    """Используется для отката сгенерированных данных после замера"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку создания поездки (p50/p99) и число запросов к базе в зависимости '
+        'от количества мест транспорта. Все сгенерированные данные откатываются по завершении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='4,20,50,199', help='Количество мест транспорта через запятую')
+        parser.add_argument('--trips', type=int, default=50, help='Количество создаваемых поездок на размер')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes: ожидается список чисел через запятую')
+        if options['trips'] < 1 or not sizes or min(sizes) < 1:
+            raise CommandError('Значения параметров должны быть положительными')
+
+        try:
+            with transaction.atomic():
+                self.run(sizes, options['trips'])
+                raise BenchmarkFinished
+        except BenchmarkFinished:
+            self.stdout.write(self.style.SUCCESS('Сгенерированные данные удалены'))
+
+    def run(self, sizes, trips):
+        suffix = int(time.time())
+        from_city = City.objects.create(name=f'Бенчмарк {suffix}-0')
+        to_city = City.objects.create(name=f'Бенчмарк {suffix}-1')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+
+        for index, total_seats in enumerate(sizes):
+            vehicle = Vehicle.objects.create(
+                vehicle_type='bus', license_plate=f'В{index % 1000:03d}ВВ{100 + index // 1000}', total_seats=total_seats
+            )
+            driver = User.objects.create_user(f'+7900{suffix % 10_000:04d}{index:03d}', 'benchmark')
+            driver.groups.add(driver_group)
+
+            # Поездки одного транспорта и водителя не могут пересекаться: каждая следующая — после прибытия
+            now = timezone.now()
+            timings = []
+            query_counts = set()
+            for number in range(trips):
+                departure_time = now + timedelta(hours=1 + number * 6)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    Trip.objects.create(
+                        vehicle=vehicle,
+                        driver=driver,
+                        from_city=from_city,
+                        to_city=to_city,
+                        departure_time=departure_time,
+                        arrival_time=departure_time + timedelta(hours=5),
+                        front_seat_price=Decimal('1000.00'),
+                        middle_seat_price=Decimal('800.00'),
+                        back_seat_price=Decimal('600.00'),
+                    )
+                timings.append((time.perf_counter() - started) * 1000)
+                query_counts.add(len(queries))
+
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            queries_label = ', '.join(str(count) for count in sorted(query_counts))
+            self.stdout.write(
+                f'Поездка на {total_seats} мест: p50={statistics.median(timings):.2f} мс, '
+                f'p99={p99:.2f} мс, запросов: {queries_label}'
+            )
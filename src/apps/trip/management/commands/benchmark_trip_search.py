@@ -0,0 +1,144 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.trip.filters import TripFilter
+from apps.trip.models import City, Trip
+from apps.vehicle.models import Vehicle
+
+
+class BenchmarkFinished(Exception):
+    """Используется для отката сгенерированных данных после замера"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку поиска поездок (p50/p99) на сгенерированных данных: '
+        'фильтр по дате через __date и OFFSET-пагинация против диапазона дат и курсорной пагинации. '
+        'Все сгенерированные данные откатываются по завершении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=2_000_000, help='Количество генерируемых поездок')
+        parser.add_argument('--cities', type=int, default=10, help='Количество генерируемых городов')
+        parser.add_argument('--days', type=int, default=365, help='На сколько дней вперёд распределить поездки')
+        parser.add_argument('--queries', type=int, default=200, help='Количество замеров на сценарий')
+        parser.add_argument('--page-size', type=int, default=20, help='Размер страницы')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Размер пакета при вставке')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise BenchmarkFinished
+        except BenchmarkFinished:
+            self.stdout.write(self.style.SUCCESS('Сгенерированные данные удалены'))
+
+    def run(self, options):
+        cities = self.create_cities(options['cities'])
+        self.generate_trips(options, cities)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Trip._meta.db_table}')
+
+        now = timezone.now()
+        page_size = options['page_size']
+        queryset = Trip.objects.all()
+
+        def random_search():
+            from_city, to_city = random.sample(cities, 2)
+            day = (now + timedelta(days=random.randint(1, options['days']))).date()
+            return from_city, to_city, day
+
+        def legacy_date_filter():
+            from_city, to_city, day = random_search()
+            return list(queryset.filter(
+                from_city=from_city, to_city=to_city, departure_time__date=day
+            ).order_by('departure_time')[:page_size])
+
+        def range_date_filter():
+            from_city, to_city, day = random_search()
+            routed = queryset.filter(from_city=from_city, to_city=to_city)
+            return list(TripFilter().filter_date(routed, 'date', day).order_by('departure_time', 'id')[:page_size])
+
+        def deep_offset_page():
+            from_city, to_city, _ = random_search()
+            routed = queryset.filter(from_city=from_city, to_city=to_city).order_by('departure_time')
+            routed.count()
+            offset = random.randint(0, 50) * page_size
+            return list(routed[offset:offset + page_size])
+
+        def keyset_page():
+            from_city, to_city, _ = random_search()
+            routed = queryset.filter(from_city=from_city, to_city=to_city).order_by('departure_time', 'id')
+            after = now + timedelta(days=random.randint(1, options['days']))
+            return list(routed.filter(departure_time__gt=after)[:page_size])
+
+        scenarios = [
+            ('Фильтр date через departure_time__date (до)', legacy_date_filter),
+            ('Фильтр date через диапазон (после)', range_date_filter),
+            ('Глубокая страница: COUNT(*) + OFFSET (до)', deep_offset_page),
+            ('Курсорная страница по (departure_time, id) (после)', keyset_page),
+        ]
+        for title, scenario in scenarios:
+            p50, p99 = self.measure(scenario, options['queries'])
+            self.stdout.write(f'{title}: p50={p50:.2f} мс, p99={p99:.2f} мс')
+
+    def create_cities(self, count):
+        suffix = int(time.time())
+        return [City.objects.create(name=f'Бенчмарк {suffix}-{i}') for i in range(count)]
+
+    def generate_trips(self, options, cities):
+        now = timezone.now()
+        total = options['trips']
+        batch_size = options['batch_size']
+        minutes_range = options['days'] * 24 * 60
+        duration = timedelta(hours=5)
+
+        # Поездки одного транспорта не могут пересекаться (trip_vehicle_no_overlap): отправления
+        # распределены равномерно, а транспорт назначается по кругу из пула, достаточного,
+        # чтобы следующая поездка транспорта начиналась после прибытия предыдущей
+        step = (minutes_range - 60) / total
+        pool_size = int(duration.total_seconds() / 60 / step) + 1
+        vehicles = Vehicle.objects.bulk_create([
+            Vehicle(vehicle_type='car', license_plate=f'Б{i % 1000:03d}ББ{100 + i // 1000}', total_seats=4)
+            for i in range(pool_size)
+        ])
+
+        started = time.monotonic()
+        for batch_start in range(0, total, batch_size):
+            batch = []
+            for index in range(batch_start, min(batch_start + batch_size, total)):
+                from_city, to_city = random.sample(cities, 2)
+                departure_time = now + timedelta(minutes=60 + index * step)
+                batch.append(Trip(
+                    vehicle=vehicles[index % pool_size],
+                    from_city=from_city,
+                    to_city=to_city,
+                    departure_time=departure_time,
+                    arrival_time=departure_time + duration,
+                    booking_closes_at=departure_time - timedelta(minutes=30),
+                    front_seat_price=Decimal('1000.00'),
+                    middle_seat_price=Decimal('800.00'),
+                    back_seat_price=Decimal('600.00'),
+                    is_bookable=random.random() > 0.1,
+                    available_seats=4,
+                ))
+            # bulk_create не вызывает save() и сигналы: места поездок для замера поиска не нужны
+            Trip.objects.bulk_create(batch)
+        self.stdout.write(f'Сгенерировано поездок: {total} за {time.monotonic() - started:.1f} с')
+
+    def measure(self, scenario, count):
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            scenario()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99_index = min(len(timings) - 1, int(len(timings) * 0.99))
+        return statistics.median(timings), timings[p99_index]
@@ -0,0 +1,34 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.trip.services.TripImportService import TripImportService
+
+
+class Command(BaseCommand):
+    help = 'Импортирует поездки из файла CSV или NDJSON и выводит ошибки по строкам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .ndjson')
+        parser.add_argument('--format', choices=TripImportService.FORMATS, help='Формат файла (по умолчанию — по расширению)')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить строки, не создавая поездки')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in TripImportService.FORMATS:
+            raise CommandError('Поддерживаются форматы csv и ndjson, укажите --format')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                report = TripImportService().import_file(file, file_format, dry_run=options['dry_run'])
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл: {e}')
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+
+        for item in report['errors']:
+            errors = '; '.join(f'{field}: {message}' for field, message in item['errors'].items())
+            self.stdout.write(self.style.WARNING(f"Строка {item['row']}: {errors}"))
+        created_label = 'проверено' if options['dry_run'] else 'создано'
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {report['rows']}, {created_label} поездок: {report['created']}, с ошибками: {len(report['errors'])}"
+        ))
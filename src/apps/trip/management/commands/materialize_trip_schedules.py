@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.trip.models import TripSchedule
+from apps.trip.services.TripScheduleService import TripScheduleService
+
+
+class Command(BaseCommand):
+    help = 'Создаёт поездки по активным расписаниям на заданное количество недель вперёд'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=None, help='На сколько недель вперёд создать поездки')
+        parser.add_argument('--schedule', type=int, action='append', help='id расписания (можно указать несколько раз)')
+
+    def handle(self, *args, **options):
+        schedules = TripSchedule.objects.filter(is_active=True)
+        if options['schedule']:
+            schedules = schedules.filter(pk__in=options['schedule'])
+        trips, skipped = TripScheduleService().materialize(schedules, weeks=options['weeks'])
+
+        for item in skipped:
+            errors = '; '.join(item['errors'].values())
+            self.stdout.write(self.style.WARNING(
+                f"Расписание {item['schedule']}, отправление {item['departure_time']}: {errors}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Создано поездок: {len(trips)}, пропущено: {len(skipped)}'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.seat.services.seat_hold_service import SeatHoldService
+from apps.trip.services.TripService import TripService
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчик свободных мест поездок с фактическим состоянием мест и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения, не исправляя их')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # Удержанные места не свободны, хотя ещё не забронированы
+        held_seats = SeatHoldService().get_held_seat_counts()
+        drifted = TripService().reconcile_available_seats(dry_run=dry_run, held_seats=held_seats)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Расхождений счётчика свободных мест не найдено'))
+            return
+
+        for trip_id, stored, actual in drifted:
+            self.stdout.write(self.style.WARNING(
+                f'Поездка {trip_id}: в счётчике {stored}, фактически свободно {actual}'
+            ))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Найдено расхождений: {len(drifted)} (без исправления)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено расхождений: {len(drifted)}'))
@@ -1,9 +1,20 @@
-from django.db import models
+from datetime import timedelta
+from dateutil.rrule import rrulestr
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import IntegrityError, models, transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 from django.utils import timezone
 from apps.vehicle.models import Vehicle
 from apps.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import F, Func, Q
+
+
+class TsTzRange(Func):
+    """tstzrange(начало, конец) — полуинтервал [начало, конец)"""
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
 
 
 
@@ -20,6 +31,98 @@ class City(models.Model):
         return self.name
 
 
+class TripSchedule(models.Model):
+    """
+    Шаблон регулярного рейса: маршрут, транспорт, водитель, время, цены и правило повторения.
+    Поездки по шаблону создаются пачкой (TripScheduleService.materialize), а не по одной через API.
+    """
+    from_city = models.ForeignKey(
+        City,
+        on_delete=models.CASCADE,
+        related_name='schedule_departures',
+        verbose_name="Город отправления"
+    )
+    to_city = models.ForeignKey(
+        City,
+        on_delete=models.CASCADE,
+        related_name='schedule_arrivals',
+        verbose_name="Город назначения"
+    )
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, verbose_name="Транспорт")
+    driver = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='trip_schedules',
+        verbose_name="Водитель"
+    )
+    departure_time = models.TimeField(verbose_name="Время отправления (местное)")
+    duration = models.DurationField(verbose_name="Длительность поездки")
+    front_seat_price = models.DecimalField(
+        max_digits=10, decimal_places=2,
+        default=0, verbose_name="Цена переднего места"
+    )
+    middle_seat_price = models.DecimalField(
+        max_digits=10, decimal_places=2,
+        default=0, verbose_name="Цена среднего места"
+    )
+    back_seat_price = models.DecimalField(
+        max_digits=10, decimal_places=2,
+        default=0, verbose_name="Цена заднего места"
+    )
+    booking_cutoff_minutes = models.PositiveIntegerField(
+        default=30,
+        verbose_name="Время до начала поездки за которое нельзя бронировать поездку (в минутах)",
+    )
+    recurrence = models.CharField(
+        max_length=255,
+        verbose_name="Правило повторения (RRULE)",
+        help_text="Например: FREQ=DAILY или FREQ=WEEKLY;BYDAY=MO,WE,FR",
+    )
+    starts_on = models.DateField(verbose_name="Действует с")
+    ends_on = models.DateField(null=True, blank=True, verbose_name="Действует по")
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    # До какой даты включительно поездки уже созданы: повторный запуск продолжает с следующего дня
+    materialized_until = models.DateField(
+        null=True, blank=True, editable=False, verbose_name="Поездки созданы по"
+    )
+
+    class Meta:
+        verbose_name = "Расписание"
+        verbose_name_plural = "Расписания"
+        ordering = ['from_city', 'to_city', 'departure_time']
+        app_label = 'transfer_trip'
+
+    def __str__(self):
+        return f"{self.from_city} - {self.to_city} {self.departure_time.strftime('%H:%M')} ({self.recurrence})"
+
+    def get_rule(self, dtstart):
+        """Правило повторения, начинающееся с dtstart (наивное местное время)"""
+        return rrulestr(self.recurrence, dtstart=dtstart)
+
+    def clean(self):
+        if self.from_city_id and self.from_city_id == self.to_city_id:
+            raise ValidationError({
+                'to_city': 'Город назначения должен отличаться от города отправления'
+            })
+        if self.duration is not None and self.duration <= timedelta(0):
+            raise ValidationError({'duration': 'Длительность поездки должна быть положительной'})
+        if self.ends_on and self.starts_on and self.ends_on < self.starts_on:
+            raise ValidationError({'ends_on': 'Дата окончания не может быть раньше даты начала'})
+        if self.driver_id and not self.driver.groups.filter(name='Водитель').exists():
+            raise ValidationError({
+                'driver': 'Выбранный пользователь не является водителем'
+            })
+        for field in ('front_seat_price', 'middle_seat_price', 'back_seat_price'):
+            if getattr(self, field) < 0:
+                raise ValidationError({field: 'Цена не может быть отрицательной'})
+        try:
+            self.get_rule(timezone.now().replace(tzinfo=None))
+        except (ValueError, TypeError) as e:
+            raise ValidationError({'recurrence': f'Неверное правило повторения: {e}'})
+
+
 class Trip(models.Model):
     vehicle = models.ForeignKey(
         Vehicle, 
@@ -73,12 +176,72 @@ class Trip(models.Model):
         default=30,
         verbose_name="Время до начала поездки за которое нельзя бронировать поездку (в минутах)",
     )
+    schedule = models.ForeignKey(
+        TripSchedule,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='trips',
+        verbose_name="Расписание"
+    )
+    # Момент закрытия бронирования (departure_time - booking_cutoff_minutes), вычисляется в save().
+    # Хранится в поездке, чтобы задача update_trip_statuses находила такие поездки по индексу
+    booking_closes_at = models.DateTimeField(
+        editable=False,
+        verbose_name="Время закрытия бронирования",
+    )
+    # Интервал поездки [departure_time, arrival_time), вычисляется базой данных.
+    # По нему ограничения trip_vehicle_no_overlap и trip_driver_no_overlap запрещают пересечение
+    # поездок одного транспорта и одного водителя
+    time_range = models.GeneratedField(
+        expression=TsTzRange(F('departure_time'), F('arrival_time')),
+        output_field=DateTimeRangeField(),
+        db_persist=True,
+        verbose_name="Интервал поездки",
+    )
+    # Денормализованный счётчик свободных мест (TripSeat с is_booked=False).
+    # Изменяется только атомарными UPDATE через TripService.change_available_seats
+    available_seats = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество свободных мест",
+    )
 
     class Meta:
         verbose_name = "Поездка"
         verbose_name_plural = "Поездки"
         ordering = ['departure_time', 'arrival_time']
         app_label = 'transfer_trip'
+        indexes = [
+            models.Index(fields=['available_seats'], name='trip_available_seats_idx'),
+            # Поиск по маршруту и дате (TripFilter: from_city, to_city, date/departure_after/departure_before)
+            models.Index(fields=['from_city', 'to_city', 'departure_time'], name='trip_route_departure_idx'),
+            # Тот же поиск среди поездок, доступных для бронирования (is_bookable=true)
+            models.Index(
+                fields=['from_city', 'to_city', 'departure_time'],
+                condition=Q(is_bookable=True, is_active=True),
+                name='trip_route_bookable_idx',
+            ),
+            # Сортировка по умолчанию и курсорная пагинация по (departure_time, id)
+            models.Index(fields=['departure_time', 'id'], name='trip_departure_id_idx'),
+            # Поиск поездок, у которых пора закрыть бронирование или которые завершились (update_trip_statuses)
+            models.Index(fields=['booking_closes_at'], condition=Q(is_bookable=True), name='trip_booking_closes_idx'),
+            models.Index(fields=['arrival_time'], condition=Q(is_active=True), name='trip_active_arrival_idx'),
+        ]
+        # Проверка пересечений выполняется базой атомарно и по GiST-индексу ограничения
+        # (для равенства по vehicle/driver нужно расширение btree_gist, см. TripConfig)
+        constraints = [
+            ExclusionConstraint(
+                name='trip_vehicle_no_overlap',
+                expressions=[('vehicle', RangeOperators.EQUAL), ('time_range', RangeOperators.OVERLAPS)],
+                violation_error_message='Транспорт занят в это время',
+            ),
+            ExclusionConstraint(
+                name='trip_driver_no_overlap',
+                expressions=[('driver', RangeOperators.EQUAL), ('time_range', RangeOperators.OVERLAPS)],
+                violation_error_message='Водитель занят в это время',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.departure_time.strftime('%Y-%m-%d %H:%M')}: {self.from_city} - {self.to_city}"
@@ -91,17 +254,6 @@ class Trip(models.Model):
                 'driver': 'Выбранный пользователь не является водителем'
             })
             
-        driver_conflicts = Trip.objects.filter(
-            Q(driver=self.driver),
-            Q(departure_time__lt=self.arrival_time),
-            Q(arrival_time__gt=self.departure_time)
-        ).exclude(pk=self.pk if self.pk else None)
-        
-        if driver_conflicts.exists():
-            raise ValidationError({
-                'driver': f'Водитель занят с {driver_conflicts[0].departure_time} до {driver_conflicts[0].arrival_time}'
-            })
-
         if self.departure_time < timezone.now() and (self.is_active == True or self.is_bookable == True):
             raise ValidationError({
                 'departure_time': 'Прошедшие поездки не могут быть активными или доступными для бронирования'
@@ -119,18 +271,6 @@ class Trip(models.Model):
                 'to_city': 'Город назначения должен отличаться от города отправления'
             })
 
-        # Проверка пересечения временных интервалов
-        conflicts = Trip.objects.filter(
-            Q(vehicle=self.vehicle),
-            Q(departure_time__lt=self.arrival_time),
-            Q(arrival_time__gt=self.departure_time)
-        ).exclude(pk=self.pk if self.pk else None)
-
-        if conflicts.exists():
-            raise ValidationError({
-                'vehicle': f'Транспорт занят с {conflicts[0].departure_time} до {conflicts[0].arrival_time}'
-            })
-
         # Проверка цен
         if self.front_seat_price < 0:
             raise ValidationError({
@@ -154,7 +294,54 @@ class Trip(models.Model):
                 'booking_cutoff_minutes': 'Время не может быть больше оставшегося времени до отправления'
             })        
 
+    def get_booking_closes_at(self):
+        """Момент, после которого поездку нельзя бронировать"""
+        return self.departure_time - timedelta(minutes=self.booking_cutoff_minutes)
+
+    # Сообщения об ошибках при нарушении ограничений пересечения: (поле, текст, фильтр конфликтующих поездок)
+    OVERLAP_CONSTRAINTS = {
+        'trip_vehicle_no_overlap': ('vehicle', 'Транспорт занят', 'vehicle_id'),
+        'trip_driver_no_overlap': ('driver', 'Водитель занят', 'driver_id'),
+    }
+
+    def get_overlap_error(self, error):
+        """
+        ValidationError для нарушения ограничения пересечения поездок (или None для других ошибок).
+        Конфликтующая поездка читается только для сообщения, одним запросом
+        """
+        constraint_name = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+        if constraint_name not in self.OVERLAP_CONSTRAINTS:
+            return None
+        field, message, attname = self.OVERLAP_CONSTRAINTS[constraint_name]
+        conflict = Trip.objects.filter(
+            **{attname: getattr(self, attname)},
+            time_range__overlap=DateTimeTZRange(self.departure_time, self.arrival_time),
+        ).exclude(pk=self.pk).only('departure_time', 'arrival_time').first()
+        if conflict is None:
+            return ValidationError({field: f'{message} в это время'})
+        return ValidationError({field: f'{message} с {conflict.departure_time} до {conflict.arrival_time}'})
+
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        self.booking_closes_at = self.get_booking_closes_at()
+        # Пересечения с другими поездками проверяет база (ограничения trip_*_no_overlap)
+        self.full_clean(validate_constraints=False)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'departure_time', 'booking_cutoff_minutes'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'booking_closes_at'}
+        # Не перезаписываем счётчик свободных мест устаревшим значением из памяти:
+        # при обновлении поездки сохраняем все поля, кроме available_seats
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'available_seats'
+            ]
+        # Места поездки создаются обработчиком post_save в той же транзакции, что и сама поездка
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            overlap_error = self.get_overlap_error(e)
+            if overlap_error is None:
+                raise
+            raise overlap_error from e
 
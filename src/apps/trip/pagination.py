@@ -0,0 +1,93 @@
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TripPagination(PageNumberPagination):
+    """
+    Пагинация списка поездок.
+
+    По умолчанию работает как обычная постраничная пагинация (page, count).
+    С параметром pagination=cursor включается курсорная (keyset) пагинация по
+    (departure_time, id) для бесконечной прокрутки: без COUNT(*) и OFFSET,
+    следующая страница запрашивается по ссылке next с параметром cursor.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_query_param = 'cursor'
+    keyset_ordering = ('departure_time', 'id')
+
+    def is_cursor_mode(self, request):
+        return request.query_params.get(self.mode_query_param) == self.cursor_mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_cursor_mode(request):
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        # Порядок фиксирован, параметр ordering в этом режиме не учитывается
+        queryset = queryset.order_by(*self.keyset_ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            departure_time, trip_id = position
+            queryset = queryset.filter(
+                Q(departure_time__gt=departure_time) | Q(departure_time=departure_time, id__gt=trip_id)
+            )
+
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def encode_cursor(self, trip):
+        raw = f"{trip.departure_time.isoformat()}|{trip.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            departure_time, trip_id = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            departure_time = parse_datetime(departure_time)
+            trip_id = int(trip_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            departure_time = None
+        if departure_time is None:
+            raise NotFound("Некорректный курсор")
+        return departure_time, trip_id
+
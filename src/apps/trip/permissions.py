@@ -5,6 +5,8 @@ class HasTripPermission(permissions.BasePermission):
     """
     Разрешения для поездок:
     - Просмотр списка поездок и деталей поездки и мест поездки доступен всем пользователям
+    - Удержание мест поездки доступно аутентифицированным пользователям
+    - Массовый импорт поездок доступен только администраторам
     - Создание, изменение и удаление поездок доступно пользователям со специальными правами:
       - can_create_trip - право на создание поездок
       - can_update_trip - право на изменение поездок
@@ -21,6 +23,14 @@ class HasTripPermission(permissions.BasePermission):
         if view.action in ['list', 'retrieve', 'cities', 'seats']:
             return True
 
+        # Удерживать места может любой аутентифицированный пользователь
+        if view.action == 'hold':
+            return request.user.is_authenticated
+
+        # Массовый импорт поездок доступен только администраторам
+        if view.action == 'import_trips':
+            return request.user.is_staff
+
         # Для создания, требуется право can_create_trip или статус администратора
         if view.action == 'create' and request.user.has_perm('trip.can_create_trip'):
             return True
@@ -38,7 +48,7 @@ class HasTripPermission(permissions.BasePermission):
             return True
 
         # Просмотр доступен всем пользователям
-        if view.action in ['list', 'retrieve', 'seats']:
+        if view.action in ['list', 'retrieve', 'seats', 'hold']:
             return True
 
         # Обновление требует наличия права can_update_trip
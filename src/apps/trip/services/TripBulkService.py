@@ -0,0 +1,121 @@
+import bisect
+import logging
+from collections import defaultdict
+
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Q
+
+from ..models import Trip
+from apps.seat.models import Seat, TripSeat
+from .TripService import TripService
+
+
+class TripOverlapChecker:
+    """
+    Проверка пересечений новых поездок в памяти.
+
+    Занятые интервалы транспорта и водителей загружаются одним запросом по окну времени,
+    затем каждая новая поездка проверяется бинарным поиском и добавляется к занятым.
+    Интервалы одного транспорта (водителя) не пересекаются, поэтому достаточно проверить
+    ближайший интервал, начинающийся раньше прибытия новой поездки.
+    Окончательную проверку выполняют ограничения trip_vehicle_no_overlap и trip_driver_no_overlap.
+    """
+
+    MESSAGES = {'vehicle': 'Транспорт занят', 'driver': 'Водитель занят'}
+
+    def __init__(self):
+        # (поле, id) -> отсортированные начала и соответствующие интервалы
+        self._starts = defaultdict(list)
+        self._intervals = defaultdict(list)
+
+    @classmethod
+    def load(cls, vehicle_ids, driver_ids, window_start, window_end):
+        """Загружает поездки транспорта и водителей, пересекающие окно [window_start, window_end)"""
+        checker = cls()
+        vehicle_ids = set(filter(None, vehicle_ids))
+        driver_ids = set(filter(None, driver_ids))
+        if not vehicle_ids and not driver_ids:
+            return checker
+        existing = Trip.objects.filter(
+            Q(vehicle_id__in=vehicle_ids) | Q(driver_id__in=driver_ids),
+            time_range__overlap=DateTimeTZRange(window_start, window_end),
+        ).values_list('vehicle_id', 'driver_id', 'departure_time', 'arrival_time')
+        for vehicle_id, driver_id, departure_time, arrival_time in existing:
+            checker.add(vehicle_id, driver_id, departure_time, arrival_time)
+        return checker
+
+    def _keys(self, vehicle_id, driver_id):
+        keys = [('vehicle', vehicle_id)]
+        if driver_id:
+            keys.append(('driver', driver_id))
+        return keys
+
+    def find_conflict(self, vehicle_id, driver_id, departure_time, arrival_time):
+        """Ошибка пересечения {поле: сообщение} или None, если транспорт и водитель свободны"""
+        for key in self._keys(vehicle_id, driver_id):
+            position = bisect.bisect_left(self._starts[key], arrival_time)
+            if position:
+                busy_from, busy_to = self._intervals[key][position - 1]
+                if busy_to > departure_time:
+                    field = key[0]
+                    return {field: f'{self.MESSAGES[field]} с {busy_from} до {busy_to}'}
+        return None
+
+    def add(self, vehicle_id, driver_id, departure_time, arrival_time):
+        """Отмечает транспорт и водителя занятыми на интервал поездки"""
+        for key in self._keys(vehicle_id, driver_id):
+            position = bisect.bisect_left(self._starts[key], departure_time)
+            self._starts[key].insert(position, departure_time)
+            self._intervals[key].insert(position, (departure_time, arrival_time))
+
+
+class TripBulkService:
+    """
+    Массовое создание поездок (расписания, импорт).
+
+    Поездки и их места создаются двумя bulk_create без save(), full_clean и сигналов post_save:
+    вызывающий код заранее проверяет данные и пересечения (TripOverlapChecker).
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.trip_service = TripService()
+        self.logger = logging.getLogger(__name__)
+
+    def bulk_create_trips(self, trips):
+        """
+        Сохраняет несохранённые поездки и создаёт их TripSeat по местам транспорта.
+        Число запросов не зависит от количества поездок (кроме деления на пачки).
+        Вызывается внутри транзакции. Возвращает созданные поездки.
+        """
+        if not trips:
+            return []
+        seats = defaultdict(list)
+        for vehicle_id, seat_id, price_zone in Seat.objects.filter(
+            vehicle_id__in={trip.vehicle_id for trip in trips}
+        ).values_list('vehicle_id', 'pk', 'price_zone'):
+            seats[vehicle_id].append((seat_id, price_zone))
+
+        for trip in trips:
+            trip.booking_closes_at = trip.get_booking_closes_at()
+            trip.available_seats = len(seats[trip.vehicle_id])
+        Trip.objects.bulk_create(trips, batch_size=self.BATCH_SIZE)
+
+        TripSeat.objects.bulk_create([
+            TripSeat(
+                trip_id=trip.pk,
+                seat_id=seat_id,
+                cost={
+                    'front': trip.front_seat_price,
+                    'middle': trip.middle_seat_price,
+                    'back': trip.back_seat_price,
+                }.get(price_zone, 0),
+            )
+            for trip in trips
+            for seat_id, price_zone in seats[trip.vehicle_id]
+        ], batch_size=self.BATCH_SIZE * 10)
+
+        self.trip_service.invalidate_cache()
+        self.logger.info(f"Bulk created {len(trips)} trips")
+        return trips
@@ -0,0 +1,232 @@
+import csv
+import io
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import City, Trip
+from .TripBulkService import TripBulkService, TripOverlapChecker
+from apps.auth.models import User
+from apps.vehicle.models import Vehicle
+
+# Поля строки импорта: обязательные и необязательные (со значением по умолчанию)
+REQUIRED_FIELDS = ('from_city_name', 'to_city_name', 'vehicle', 'driver', 'departure_time', 'arrival_time')
+PRICE_FIELDS = ('front_seat_price', 'middle_seat_price', 'back_seat_price')
+
+
+class TripImportService:
+    """
+    Массовый импорт поездок из CSV или NDJSON (одна поездка — одна строка).
+
+    Строки читаются потоком и обрабатываются пачками по CHUNK_SIZE: города, водители и транспорт
+    пачки загружаются одним запросом каждый, пересечения проверяются в памяти после одного
+    запроса существующих поездок (TripOverlapChecker), корректные поездки создаются массово
+    вместе с местами (TripBulkService). Для остальных строк возвращаются ошибки по полям.
+    """
+
+    CHUNK_SIZE = 5000
+    FORMATS = ('csv', 'ndjson')
+
+    def __init__(self):
+        self.bulk_service = TripBulkService()
+        self.logger = logging.getLogger(__name__)
+
+    def read_rows(self, stream, file_format):
+        """
+        Читает строки файла (текстовый поток). Возвращает пары (номер строки, словарь полей)
+        или (номер строки, None) для строк NDJSON, которые не удалось разобрать
+        """
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+        elif file_format == 'ndjson':
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+        else:
+            raise ValueError(f"Неподдерживаемый формат файла: {file_format}")
+
+    def import_file(self, file, file_format, dry_run=False, now=None):
+        """
+        Импортирует поездки из бинарного файла (например, загруженного через API) в кодировке UTF-8.
+
+        Пачки фиксируются по мере обработки, поэтому файл сначала целиком проверяется на кодировку
+        и разметку CSV: битый файл отклоняется с ValidationError, а не импортируется частично.
+        """
+        stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            self.check_file(stream, file_format)
+            stream.seek(0)
+            return self.import_rows(self.read_rows(stream, file_format), dry_run=dry_run, now=now)
+        finally:
+            stream.detach()
+
+    def check_file(self, stream, file_format):
+        """Читает файл целиком без обращений к базе. Ошибки кодировки и разметки CSV — ValidationError"""
+        try:
+            for _ in self.read_rows(stream, file_format):
+                pass
+        except UnicodeDecodeError:
+            raise ValidationError("Файл не в кодировке UTF-8")
+        except csv.Error as e:
+            raise ValidationError(f"Ошибка разметки CSV: {e}")
+
+    def import_rows(self, rows, dry_run=False, now=None):
+        """
+        Импортирует строки (номер строки, словарь полей). При dry_run поездки только проверяются,
+        а created — количество поездок, которые были бы созданы.
+        Возвращает {'rows': всего строк, 'created': создано поездок, 'errors': [{'row', 'errors'}]}.
+        """
+        now = now or timezone.now()
+        report = {'rows': 0, 'created': 0, 'errors': []}
+        chunk = []
+        for line_number, row in rows:
+            chunk.append((line_number, row))
+            if len(chunk) >= self.CHUNK_SIZE:
+                self._import_chunk(chunk, report, dry_run, now)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, report, dry_run, now)
+        report['errors'].sort(key=lambda item: item['row'])
+        self.logger.info(
+            f"Trip import: {report['rows']} rows, {report['created']} created, {len(report['errors'])} rejected"
+        )
+        return report
+
+    def _parse_row(self, row, now):
+        """Разбирает и проверяет поля строки без обращений к базе. Возвращает (значения, ошибки)"""
+        if row is None:
+            return None, {'row': 'Строка не является JSON-объектом'}
+        errors = {}
+        values = {}
+        for field in REQUIRED_FIELDS:
+            value = row.get(field)
+            if value in (None, ''):
+                errors[field] = 'Обязательное поле'
+            else:
+                values[field] = str(value).strip()
+
+        for field in ('departure_time', 'arrival_time'):
+            if field in values:
+                try:
+                    parsed = parse_datetime(values[field])
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    errors[field] = 'Неверный формат даты и времени (ожидается ISO 8601)'
+                else:
+                    values[field] = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        for field in ('vehicle', 'driver'):
+            if field in values:
+                try:
+                    values[field] = int(values[field])
+                except ValueError:
+                    errors[field] = 'Ожидается id'
+        for field in PRICE_FIELDS:
+            # Те же ограничения, что у поля модели: конечное число, max_digits и decimal_places
+            model_field = Trip._meta.get_field(field)
+            try:
+                values[field] = model_field.to_python(row.get(field) or 0)
+                model_field.run_validators(values[field])
+            except ValidationError as e:
+                errors[field] = e.messages[0]
+                continue
+            if values[field] < 0:
+                errors[field] = 'Цена не может быть отрицательной'
+        cutoff = row.get('booking_cutoff_minutes')
+        try:
+            # Дробные числа, bool и вложенные значения NDJSON не приводятся к целому молча
+            if isinstance(cutoff, (bool, float)) or not isinstance(cutoff, (int, str, type(None))):
+                raise TypeError
+            values['booking_cutoff_minutes'] = int(cutoff) if cutoff not in (None, '') else 30
+            if values['booking_cutoff_minutes'] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['booking_cutoff_minutes'] = 'Ожидается неотрицательное целое число'
+        if errors:
+            return values, errors
+
+        # Те же правила, что в Trip.clean, без запросов к базе
+        if values['from_city_name'] == values['to_city_name']:
+            errors['to_city'] = 'Город назначения должен отличаться от города отправления'
+        if values['arrival_time'] <= values['departure_time']:
+            errors['arrival_time'] = 'Время прибытия должно быть позже отправления'
+        if values['departure_time'] < now:
+            errors['departure_time'] = 'Прошедшие поездки не могут быть активными или доступными для бронирования'
+        elif values['booking_cutoff_minutes'] > (values['departure_time'] - now).total_seconds() / 60:
+            errors['booking_cutoff_minutes'] = 'Время не может быть больше оставшегося времени до отправления'
+        return values, errors
+
+    def _import_chunk(self, chunk, report, dry_run, now):
+        report['rows'] += len(chunk)
+        parsed = []
+        for line_number, row in chunk:
+            values, errors = self._parse_row(row, now)
+            if errors:
+                report['errors'].append({'row': line_number, 'errors': errors})
+            else:
+                parsed.append((line_number, values))
+        if not parsed:
+            return
+
+        # Города, водители и транспорт пачки — по одному запросу
+        cities = dict(City.objects.filter(
+            name__in={name for _, values in parsed for name in (values['from_city_name'], values['to_city_name'])}
+        ).values_list('name', 'pk'))
+        drivers = set(User.objects.filter(
+            pk__in={values['driver'] for _, values in parsed}, groups__name='Водитель'
+        ).values_list('pk', flat=True))
+        vehicles = set(Vehicle.objects.filter(
+            pk__in={values['vehicle'] for _, values in parsed}
+        ).values_list('pk', flat=True))
+
+        with transaction.atomic():
+            parsed.sort(key=lambda item: item[1]['departure_time'])
+            checker = TripOverlapChecker.load(
+                vehicles, drivers,
+                parsed[0][1]['departure_time'],
+                max(values['arrival_time'] for _, values in parsed),
+            )
+            trips = []
+            for line_number, values in parsed:
+                errors = {}
+                for field, name in (('from_city', 'from_city_name'), ('to_city', 'to_city_name')):
+                    if values[name] not in cities:
+                        errors[field] = f"Город «{values[name]}» не найден"
+                if values['vehicle'] not in vehicles:
+                    errors['vehicle'] = 'Транспорт не найден'
+                if values['driver'] not in drivers:
+                    errors['driver'] = 'Выбранный пользователь не является водителем'
+                if not errors:
+                    errors = checker.find_conflict(
+                        values['vehicle'], values['driver'], values['departure_time'], values['arrival_time']
+                    )
+                if errors:
+                    report['errors'].append({'row': line_number, 'errors': errors})
+                    continue
+                checker.add(values['vehicle'], values['driver'], values['departure_time'], values['arrival_time'])
+                trips.append(Trip(
+                    vehicle_id=values['vehicle'],
+                    driver_id=values['driver'],
+                    from_city_id=cities[values['from_city_name']],
+                    to_city_id=cities[values['to_city_name']],
+                    departure_time=values['departure_time'],
+                    arrival_time=values['arrival_time'],
+                    front_seat_price=values['front_seat_price'],
+                    middle_seat_price=values['middle_seat_price'],
+                    back_seat_price=values['back_seat_price'],
+                    booking_cutoff_minutes=values['booking_cutoff_minutes'],
+                ))
+            if not dry_run:
+                self.bulk_service.bulk_create_trips(trips)
+        report['created'] += len(trips)
@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Trip, TripSchedule
+from .TripBulkService import TripBulkService, TripOverlapChecker
+
+
+class TripScheduleService:
+    """Сервис создания поездок по шаблонам регулярных рейсов (TripSchedule)"""
+
+    def __init__(self):
+        self.bulk_service = TripBulkService()
+        self.logger = logging.getLogger(__name__)
+
+    def get_departures(self, schedule, first_day, last_day):
+        """Моменты отправления по правилу повторения в днях [first_day, last_day] (местное время)"""
+        tz = timezone.get_current_timezone()
+        rule = schedule.get_rule(datetime.combine(schedule.starts_on, schedule.departure_time))
+        return [
+            timezone.make_aware(departure, tz)
+            for departure in rule.between(
+                datetime.combine(first_day, time.min), datetime.combine(last_day, time.max), inc=True
+            )
+        ]
+
+    def materialize(self, schedules=None, weeks=None, now=None):
+        """
+        Создаёт поездки активных расписаний на weeks недель вперёд одной транзакцией.
+
+        Расписания продолжаются с дня после materialized_until, поэтому повторный запуск
+        не создаёт дубликатов. Пересечения с существующими и между новыми поездками
+        проверяются в памяти после одного запроса существующих поездок; поездки и их места
+        создаются массово. Пропущенные отправления (пересечение, бронирование уже закрыто)
+        возвращаются с причиной.
+        Возвращает (созданные поездки, [{'schedule', 'departure_time', 'errors'}]).
+        """
+        now = now or timezone.now()
+        weeks = weeks or settings.TRIP_SCHEDULE_WEEKS_AHEAD
+        today = timezone.localdate(now)
+        horizon = today + timedelta(weeks=weeks)
+        if schedules is None:
+            schedules = TripSchedule.objects.filter(is_active=True)
+
+        with transaction.atomic():
+            # Блокировка расписаний исключает повторное создание поездок параллельным запуском
+            schedules = list(schedules.select_for_update())
+            candidates = []
+            for schedule in schedules:
+                first_day = max(schedule.starts_on, today)
+                if schedule.materialized_until:
+                    first_day = max(first_day, schedule.materialized_until + timedelta(days=1))
+                last_day = min(horizon, schedule.ends_on) if schedule.ends_on else horizon
+                if first_day > last_day:
+                    continue
+                candidates.extend(
+                    (schedule, departure) for departure in self.get_departures(schedule, first_day, last_day)
+                )
+                schedule.materialized_until = last_day
+
+            trips, skipped = [], []
+            if candidates:
+                candidates.sort(key=lambda candidate: candidate[1])
+                checker = TripOverlapChecker.load(
+                    {schedule.vehicle_id for schedule in schedules},
+                    {schedule.driver_id for schedule in schedules},
+                    candidates[0][1],
+                    max(departure + schedule.duration for schedule, departure in candidates),
+                )
+                for schedule, departure in candidates:
+                    arrival = departure + schedule.duration
+                    if departure - timedelta(minutes=schedule.booking_cutoff_minutes) <= now:
+                        errors = {'departure_time': 'Бронирование на это отправление уже закрыто'}
+                    else:
+                        errors = checker.find_conflict(schedule.vehicle_id, schedule.driver_id, departure, arrival)
+                    if errors:
+                        skipped.append({'schedule': schedule.pk, 'departure_time': departure, 'errors': errors})
+                        continue
+                    checker.add(schedule.vehicle_id, schedule.driver_id, departure, arrival)
+                    trips.append(Trip(
+                        schedule=schedule,
+                        vehicle_id=schedule.vehicle_id,
+                        driver_id=schedule.driver_id,
+                        from_city_id=schedule.from_city_id,
+                        to_city_id=schedule.to_city_id,
+                        departure_time=departure,
+                        arrival_time=arrival,
+                        front_seat_price=schedule.front_seat_price,
+                        middle_seat_price=schedule.middle_seat_price,
+                        back_seat_price=schedule.back_seat_price,
+                        booking_cutoff_minutes=schedule.booking_cutoff_minutes,
+                    ))
+                self.bulk_service.bulk_create_trips(trips)
+            TripSchedule.objects.bulk_update(schedules, ['materialized_until'])
+
+        self.logger.info(f"Materialized {len(trips)} trips from {len(schedules)} schedules, skipped {len(skipped)}")
+        return trips, skipped
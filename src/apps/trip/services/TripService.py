@@ -1,5 +1,10 @@
 import logging
+import time
 from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from ..models import Trip, City
 from apps.seat.models import TripSeat
 
@@ -7,6 +12,14 @@ logger = logging.getLogger(__name__)
 
 class TripService:
     """Сервисный слой для работы с поездками"""
+
+    # Ключи версий кэша ответов: общая версия списков и версия каждой поездки.
+    # Ключи ответов включают текущую версию, поэтому инвалидация — это один INCR без поиска ключей
+    LIST_VERSION_KEY = 'trip_list_version'
+    TRIP_VERSION_KEY = 'trip_version_{}'
+    RESPONSE_CACHE_TIMEOUT = 60 * 5
+    # Сколько поездок обновляет один UPDATE задачи update_trip_statuses
+    STATUS_SWEEP_BATCH_SIZE = 1000
     
     def __init__(self, cache_backend=None):
         """Инициализация сервиса с возможностью внедрения зависимостей"""
@@ -14,8 +27,152 @@ class TripService:
         self.logger = logging.getLogger(__name__)
 
     def get_available_seats(self, trip):
-        """Получение количества свободных мест для поездки"""
-        return TripSeat.objects.filter(trip=trip, is_booked=False).count()
+        """Получение количества свободных мест для поездки (денормализованный счётчик)"""
+        return trip.available_seats
+
+    def change_available_seats(self, trip_id, delta):
+        """
+        Атомарное изменение счётчика свободных мест поездки на delta.
+        Вызывается в той же транзакции, в которой меняется is_booked у TripSeat.
+        """
+        if not delta:
+            return
+        Trip.objects.filter(pk=trip_id).update(available_seats=F('available_seats') + delta)
+        self.invalidate_trips([trip_id])
+        self.logger.debug(f"Available seats of trip {trip_id} changed by {delta}")
+
+    def change_available_seats_many(self, deltas):
+        """
+        Атомарное изменение счётчиков свободных мест нескольких поездок одним UPDATE.
+        deltas — {trip_id: delta}; вызывается в той же транзакции, что и изменение TripSeat.
+        """
+        deltas = {trip_id: delta for trip_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        if len(deltas) == 1:
+            (trip_id, delta), = deltas.items()
+            return self.change_available_seats(trip_id, delta)
+        delta = Case(
+            *[When(pk=trip_id, then=Value(delta)) for trip_id, delta in deltas.items()],
+            output_field=IntegerField(),
+        )
+        Trip.objects.filter(pk__in=deltas).update(available_seats=F('available_seats') + delta)
+        self.invalidate_trips(list(deltas))
+        self.logger.debug(f"Available seats of trips changed by {deltas}")
+
+    def actual_available_seats_subquery(self):
+        """Подзапрос, считающий свободные TripSeat для поездки (OuterRef('pk'))"""
+        free_seats = TripSeat.objects.filter(
+            trip=OuterRef('pk'), is_booked=False
+        ).order_by().values('trip').annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(free_seats), 0)
+
+    def reconcile_available_seats(self, dry_run=False, held_seats=None):
+        """
+        Сверка счётчиков свободных мест с фактическим состоянием TripSeat.
+        held_seats — {trip_id: количество удерживаемых мест}: удержанные места не считаются свободными.
+        Возвращает список расхождений (trip_id, значение счётчика, фактическое значение).
+        Если dry_run=False, расхождения исправляются одним UPDATE.
+        """
+        expected = self.actual_available_seats_subquery()
+        if held_seats:
+            held = Case(
+                *[When(pk=trip_id, then=Value(count)) for trip_id, count in held_seats.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            expected = Greatest(expected - held, Value(0))
+        drifted = list(
+            Trip.objects.annotate(actual_available_seats=expected)
+            .exclude(available_seats=F('actual_available_seats'))
+            .order_by('pk')
+            .values_list('pk', 'available_seats', 'actual_available_seats')
+        )
+        if drifted and not dry_run:
+            drifted_ids = [trip_id for trip_id, _, _ in drifted]
+            Trip.objects.filter(pk__in=drifted_ids).update(available_seats=expected)
+            self.invalidate_trips(drifted_ids)
+            self.logger.info(f"Available seats counters reconciled for {len(drifted)} trips")
+        return drifted
+
+    def _sweep_trips(self, queryset, apply):
+        """
+        Обрабатывает поездки из queryset пачками по STATUS_SWEEP_BATCH_SIZE: пачка выбирается
+        SELECT ... FOR UPDATE SKIP LOCKED и передаётся в apply(trip_ids) в той же транзакции.
+        Поездки, заблокированные другой транзакцией, обрабатываются при следующем запуске.
+        Возвращает количество обработанных поездок.
+        """
+        total = 0
+        while True:
+            with transaction.atomic():
+                trip_ids = list(
+                    queryset.order_by().select_for_update(skip_locked=True)
+                    .values_list('pk', flat=True)[:self.STATUS_SWEEP_BATCH_SIZE]
+                )
+                if not trip_ids:
+                    break
+                apply(trip_ids)
+            total += len(trip_ids)
+            if len(trip_ids) < self.STATUS_SWEEP_BATCH_SIZE:
+                break
+        return total
+
+    def close_booking(self, trip_ids):
+        """Закрывает бронирование поездок одним UPDATE. Возвращает количество закрытых поездок"""
+        closed_count = Trip.objects.filter(pk__in=trip_ids, is_bookable=True).update(is_bookable=False)
+        self.invalidate_trips(trip_ids)
+        return closed_count
+
+    def deactivate_trips(self, trip_ids):
+        """
+        Деактивирует поездки вместе с их бронированиями, без загрузки и валидации каждой поездки.
+
+        Поездки блокируются и деактивируются одним UPDATE, бронирования деактивируются,
+        а их места освобождаются через BookingService.deactivate_bookings — число запросов
+        не зависит от количества поездок и бронирований.
+        Возвращает (количество поездок, количество бронирований, количество освобождённых мест).
+        """
+        from apps.booking.models import Booking
+        from apps.booking.services import BookingService
+
+        trip_ids = list(trip_ids)
+        if not trip_ids:
+            return 0, 0, 0
+        with transaction.atomic():
+            active_ids = list(
+                Trip.objects.filter(pk__in=trip_ids, is_active=True)
+                .select_for_update().values_list('pk', flat=True)
+            )
+            if active_ids:
+                Trip.objects.filter(pk__in=active_ids).update(is_active=False, is_bookable=False)
+                self.invalidate_trips(active_ids)
+            bookings_count, seats_count = BookingService.deactivate_bookings(
+                Booking.objects.filter(trip_id__in=trip_ids)
+            )
+        self.logger.info(
+            f"Deactivated {len(active_ids)} trips, {bookings_count} bookings, released {seats_count} seats"
+        )
+        return len(active_ids), bookings_count, seats_count
+
+    def update_trip_statuses(self, now=None):
+        """
+        Закрывает бронирование поездок, у которых наступил booking_closes_at, и деактивирует
+        завершившиеся поездки (arrival_time в прошлом) вместе с их бронированиями.
+        Поездки находятся по частичным индексам trip_booking_closes_idx и trip_active_arrival_idx.
+        Возвращает (количество закрытых для бронирования, количество деактивированных поездок).
+        """
+        now = now or timezone.now()
+        closed_count = self._sweep_trips(
+            Trip.objects.filter(is_bookable=True, booking_closes_at__lte=now),
+            self.close_booking,
+        )
+        deactivated_count = self._sweep_trips(
+            Trip.objects.filter(is_active=True, arrival_time__lte=now),
+            self.deactivate_trips,
+        )
+        if closed_count or deactivated_count:
+            self.logger.info(f"Closed booking for {closed_count} trips, deactivated {deactivated_count} trips")
+        return closed_count, deactivated_count
 
     def get_duration(self, trip):
         """Расчет длительности поездки в формате часы:минуты"""
@@ -25,9 +182,13 @@ class TripService:
         return f"{hours}:{minutes:02d}"
 
     def get_trip_queryset(self):
-        """Получение базового queryset для поездок с оптимизацией"""
+        """
+        Получение базового queryset для поездок с оптимизацией.
+        Количество свободных мест хранится в самой поездке (available_seats),
+        поэтому агрегаты по TripSeat не нужны.
+        """
         return Trip.objects.select_related(
-            'from_city', 'to_city', 'vehicle'
+            'from_city', 'to_city', 'vehicle', 'driver'
         )
 
     def get_cities(self):
@@ -42,9 +203,48 @@ class TripService:
             
         return cities
 
+    def _get_version(self, key):
+        """Текущая версия кэша; при отсутствии ключа создаётся новая уникальная версия"""
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def _bump_version(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Ключ версии вытеснен из кэша: начинаем с новой уникальной версии
+            self.cache.set(key, time.time_ns(), timeout=None)
+
+    def _bump_versions(self, keys):
+        """
+        Увеличивает версии сразу и повторно после коммита транзакции: ответ, закэшированный
+        конкурентным запросом по данным до коммита, не будет отдан после него
+        """
+        for key in keys:
+            self._bump_version(key)
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: [self._bump_version(key) for key in keys])
+
+    def get_list_cache_version(self):
+        """Версия кэша ответов со списками поездок (и городов)"""
+        return self._get_version(self.LIST_VERSION_KEY)
+
+    def get_trip_cache_version(self, trip_id):
+        """Версия кэша ответов с детальной информацией о поездке"""
+        return self._get_version(self.TRIP_VERSION_KEY.format(trip_id))
+
+    def invalidate_trips(self, trip_ids):
+        """Инвалидация кэша ответов для поездок и всех списков поездок"""
+        keys = [self.TRIP_VERSION_KEY.format(trip_id) for trip_id in trip_ids]
+        self._bump_versions(keys + [self.LIST_VERSION_KEY])
+        self.logger.debug(f"Trip cache invalidated for trips {list(trip_ids)}")
+
     def invalidate_cache(self):
-        """Инвалидация кэша поездок"""
-        self.cache.delete_pattern('trip_*')
+        """Инвалидация кэша списков поездок и списка городов"""
+        self._bump_versions([self.LIST_VERSION_KEY])
         self.cache.delete('cities_list')
         self.logger.debug("Trip cache invalidated")
 
@@ -1,12 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from datetime import timedelta
 import logging
 
-from apps.trip.models import Trip
+from apps.trip.models import Trip, City
+from apps.trip.services.TripService import TripService
 from apps.seat.services.trip_seat_service import TripSeatService
-from apps.trip.tasks import disable_booking_for_trip, deactivate_trip
 
 logger = logging.getLogger(__name__)
 
@@ -20,31 +18,14 @@ def create_trip_seats(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=Trip)
-def schedule_trip_status_updates(sender, instance: Trip, created: bool, **kwargs):
-    """
-    При создании поездки планируются две задачи:
-    1. По истечении (departure_time - booking_cutoff_minutes) устанавливается is_bookable = False.
-    2. По наступлении arrival_time устанавливается is_active = False.
-    """
-    logger.info("Creating schedule...")
-    if created:
-        # Вычисляем время отключения бронирования
-        cutoff_time = instance.departure_time - timedelta(minutes=instance.booking_cutoff_minutes)
-        delay_cutoff = (cutoff_time - timezone.now()).total_seconds()
-        if delay_cutoff > 0:
-            logger.info("Timeout started")
-            disable_booking_for_trip.apply_async(args=[instance.id], countdown=delay_cutoff)
-        else:
-            logger.info("Instance starting")
-            disable_booking_for_trip.delay(instance.id)
-
-        # Планирование задачи деактивации поездки по arrival_time
-        delay_arrival = (instance.arrival_time - timezone.now()).total_seconds()
-        if delay_arrival > 0:
-            logger.info("Timeout started")
-            deactivate_trip.apply_async(args=[instance.id], countdown=delay_arrival)
-        else:
-            logger.info("Instance starting")
-            deactivate_trip.delay(instance.id)
-    else:
-        logger.info("Tasks did not created...")
\ No newline at end of file
+@receiver(post_delete, sender=Trip)
+def invalidate_trip_cache(sender, instance, **kwargs):
+    """Инвалидирует кэш ответов поездки и списков поездок при её изменении или удалении"""
+    TripService().invalidate_trips([instance.pk])
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_cache(sender, instance, **kwargs):
+    """Города входят в ответы со списками поездок"""
+    TripService().invalidate_cache()
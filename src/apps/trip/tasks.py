@@ -1,37 +1,56 @@
 from celery import shared_task
-from django.utils import timezone
-from apps.trip.models import Trip
-from apps.booking.models import Booking 
+from apps.trip.services.TripService import TripService
+from apps.trip.services.TripScheduleService import TripScheduleService
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@shared_task()
+def update_trip_statuses() -> None:
+    """
+    Периодическая задача (celery-beat, раз в минуту), которая закрывает бронирование поездок
+    после booking_closes_at и деактивирует поездки и их бронирования после arrival_time.
+    """
+    TripService().update_trip_statuses()
+
+
 @shared_task()
 def disable_booking_for_trip(trip_id: int) -> None:
     """
     Задача, которая отключает возможность бронирования поездки, устанавливая is_bookable = False.
+    Больше не планируется при создании поездки (см. update_trip_statuses), оставлена для
+    сообщений, уже находящихся в очереди.
     """
-    try:
-        Trip.objects.filter(id=trip_id).update(is_bookable=False)
-        logger.info(f"Disabled bookable status for trip {trip_id}.")
-    except Exception as e:
-        logger.error(f"Error with changing bookable status: {e}")
+    TripService().close_booking([trip_id])
+    logger.info(f"Disabled bookable status for trip {trip_id}.")
+
 
 @shared_task()
 def deactivate_trip(trip_id: int) -> None:
     """
-    Задача, которая помечает поездку как неактивную (is_active = False) по наступлении arrival_time.
-    """
-    try:
-        # Обновляем статус поездки
-        trip = Trip.objects.get(id=trip_id)
-        trip.is_active = False
-        trip.save()
-        
-        # Обновляем связанные бронирования
-        updated_status_booking = Booking.objects.filter(trip=trip).update(is_active=False)
-        
-        logger.info(f"Deactivated trip {trip_id} and {updated_status_booking} related bookings.")
-    except Exception as e:
-        logger.error(f"Error with changing active status: {e}")
+    Задача, которая помечает поездку и её бронирования неактивными и освобождает места.
+    Поездка не валидируется (full_clean), поэтому прошедшие поездки деактивируются без ошибок.
+    """
+    TripService().deactivate_trips([trip_id])
+
+
+@shared_task()
+def deactivate_trips(trip_ids: list) -> tuple:
+    """
+    Задача, которая деактивирует пачку поездок с их бронированиями фиксированным числом запросов.
+    Возвращает (количество поездок, количество бронирований, количество освобождённых мест).
+    """
+    return TripService().deactivate_trips(trip_ids)
+
+
+@shared_task()
+def materialize_trip_schedules() -> int:
+    """
+    Периодическая задача (celery-beat, раз в сутки), которая создаёт поездки активных расписаний
+    на TRIP_SCHEDULE_WEEKS_AHEAD недель вперёд. Возвращает количество созданных поездок.
+    """
+    trips, skipped = TripScheduleService().materialize()
+    for item in skipped:
+        logger.warning(f"Schedule {item['schedule']} skipped departure {item['departure_time']}: {item['errors']}")
+    return len(trips)
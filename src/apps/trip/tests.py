@@ -1,15 +1,33 @@
 from django.test import TestCase
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
+from rest_framework.request import Request
 from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import Permission, Group
 from django.contrib.contenttypes.models import ContentType
-from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+import csv
+import json
+import os
+import tempfile
+from django.core.exceptions import ValidationError
+from io import StringIO
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
 from apps.auth.models import User
-from apps.trip.models import Trip, City
+from apps.booking.models import Booking
+from apps.trip.services.TripService import TripService
+from apps.trip.tasks import deactivate_trip
+from utils.response_cache import build_cache_key, get_cache_stats, VARY_PUBLIC, VARY_USER
+from apps.trip.models import Trip, City, TripSchedule
+from apps.trip.services.TripScheduleService import TripScheduleService
 from apps.vehicle.models import Vehicle
 from apps.seat.models import Seat, TripSeat
 
@@ -76,6 +94,56 @@ class TripModelTest(TestCase):
         trip_seats = TripSeat.objects.filter(trip=self.trip)
         self.assertEqual(trip_seats.count(), self.vehicle.total_seats)
 
+    def create_overlapping_trip(self, **kwargs):
+        values = {
+            'vehicle': self.vehicle,
+            'driver': self.driver,
+            'from_city': self.to_city,
+            'to_city': self.from_city,
+            'departure_time': self.trip.departure_time + timedelta(hours=4),
+            'arrival_time': self.trip.arrival_time + timedelta(hours=4),
+        }
+        values.update(kwargs)
+        return Trip.objects.create(**values)
+
+    def test_vehicle_overlap_is_rejected_by_database(self):
+        """Пересечение поездок транспорта отклоняет ограничение базы с понятным сообщением"""
+        other_driver = User.objects.create_user('+79111111118', 'driverpass')
+        other_driver.groups.add(Group.objects.get(name='Водитель'))
+
+        with self.assertRaises(ValidationError) as context:
+            self.create_overlapping_trip(driver=other_driver)
+
+        self.assertIn('vehicle', context.exception.message_dict)
+        self.assertTrue(context.exception.message_dict['vehicle'][0].startswith('Транспорт занят с'))
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_driver_overlap_is_rejected_by_database(self):
+        """Пересечение поездок водителя отклоняет ограничение базы с понятным сообщением"""
+        other_vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='В123ВВ', total_seats=40)
+
+        with self.assertRaises(ValidationError) as context:
+            self.create_overlapping_trip(vehicle=other_vehicle)
+
+        self.assertTrue(context.exception.message_dict['driver'][0].startswith('Водитель занят с'))
+
+    def test_adjacent_trips_do_not_overlap(self):
+        """Поездка может начаться в момент прибытия предыдущей"""
+        trip = self.create_overlapping_trip(
+            departure_time=self.trip.arrival_time,
+            arrival_time=self.trip.arrival_time + timedelta(hours=5),
+        )
+        self.assertIsNotNone(trip.pk)
+
+    def test_overlap_is_checked_without_extra_queries(self):
+        """Пересечения проверяет база: сохранение не выполняет запросов поиска конфликтов"""
+        self.trip.front_seat_price = Decimal('1100.00')
+        with CaptureQueriesContext(connection) as context:
+            self.trip.save()
+
+        trip_queries = [query['sql'] for query in context.captured_queries if 'SELECT' in query['sql'] and '"transfer_trip_trip"' in query['sql']]
+        self.assertEqual(trip_queries, [])
+
 
 class TripViewSetTest(APITestCase):
     """Тесты для ViewSet поездок"""
@@ -342,6 +410,52 @@ class TripPaginationTest(APITestCase):
             if response.data['count'] <= actual_page_size * 2:
                 self.assertIsNone(response_page_2.data['next'])
 
+    def test_cursor_pagination(self):
+        """Тест курсорной пагинации: все поездки по порядку отправления, без повторов и без count"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        response = self.client.get(self.trip_list_url, {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+
+        ids = [trip['id'] for trip in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(trip['id'] for trip in response.data['results'])
+            next_url = response.data['next']
+
+        expected = list(Trip.objects.order_by('departure_time', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pagination_invalid_cursor(self):
+        """Тест некорректного курсора"""
+        response = self.client.get(self.trip_list_url, {'pagination': 'cursor', 'cursor': 'не-курсор'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_by_date(self):
+        """Тест фильтра по дате отправления в локальном часовом поясе"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        trip = Trip.objects.order_by('departure_time')[3]
+        local_date = timezone.localtime(trip.departure_time).date()
+
+        response = self.client.get(self.trip_list_url, {'date': local_date.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [trip.id])
+
+    def test_benchmark_trip_search_command(self):
+        """Тест команды замера поиска поездок на небольшом объёме: данные откатываются"""
+        trips_before = Trip.objects.count()
+        out = StringIO()
+        call_command('benchmark_trip_search', '--trips', '500', '--queries', '3', stdout=out)
+
+        self.assertIn('p50=', out.getvalue())
+        self.assertEqual(Trip.objects.count(), trips_before)
+
 
 class TripPermissionsTest(APITestCase):
     """Тесты для проверки разрешений на поездки"""
@@ -625,4 +739,771 @@ class TripPermissionsTest(APITestCase):
         data["departure_time"] = (timezone.now() + timedelta(days=6)).strftime("%Y-%m-%dT%H:%M:%S")
         data["arrival_time"] = (timezone.now() + timedelta(days=6, hours=5)).strftime("%Y-%m-%dT%H:%M:%S")
         response = self.client.post(self.trip_list_url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TripListQueryCountTest(APITestCase):
+    """Тесты количества запросов к базе при получении списка поездок"""
+
+    def setUp(self):
+        # Ответы списка поездок кэшируются, поэтому очищаем кэш перед каждым тестом
+        cache.clear()
+
+        self.user = User.objects.create_user('+79111111112', 'userpass')
+        self.driver = User.objects.create_user('+79111111113', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+
+        self.from_city = City.objects.create(name='Москва')
+        self.to_city = City.objects.create(name='Санкт-Петербург')
+        self.vehicle = Vehicle.objects.create(
+            vehicle_type='minibus',
+            license_plate='А123АА',
+            total_seats=10
+        )
+        self.now = timezone.now()
+        self.trips_created = 0
+
+        self.trip_list_url = reverse('trip-list')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        # Не оставляем закэшированные ответы другим тестам
+        cache.clear()
+
+    def create_trips(self, count):
+        for _ in range(count):
+            self.trips_created += 1
+            Trip.objects.create(
+                vehicle=self.vehicle,
+                driver=self.driver,
+                from_city=self.from_city,
+                to_city=self.to_city,
+                departure_time=self.now + timedelta(days=self.trips_created),
+                arrival_time=self.now + timedelta(days=self.trips_created, hours=5),
+                front_seat_price=Decimal('1000.00'),
+                middle_seat_price=Decimal('1000.00'),
+                back_seat_price=Decimal('1000.00')
+            )
+
+    def count_list_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.trip_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        """Количество запросов не зависит от количества поездок на странице"""
+        self.create_trips(2)
+        queries_small, _ = self.count_list_queries()
+
+        self.create_trips(18)
+        queries_full, response = self.count_list_queries()
+
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(queries_small, queries_full)
+
+    def test_list_query_count_is_fixed(self):
+        """Список поездок получается за два запроса: COUNT для пагинации и сама страница"""
+        self.create_trips(20)
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.trip_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_available_seats_in_list(self):
+        """Количество свободных мест в списке учитывает бронирования"""
+        self.create_trips(1)
+        trip = Trip.objects.get()
+        booking = Booking.objects.create(
+            user=self.user,
+            trip=trip,
+            pickup_location='ул. Тестовая, 1',
+            dropoff_location='ул. Тестовая, 2',
+        )
+        booking.trip_seats.add(*TripSeat.objects.filter(trip=trip, seat__seat_number__in=[1, 2]))
+
+        _, response = self.count_list_queries()
+        self.assertEqual(response.data['results'][0]['available_seats'], self.vehicle.total_seats - 2)
+
+
+class TripAvailableSeatsCounterTest(TestCase):
+    """Тесты денормализованного счётчика свободных мест поездки"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('+79111111114', 'userpass')
+        self.driver = User.objects.create_user('+79111111115', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.from_city = City.objects.create(name='Москва')
+        self.to_city = City.objects.create(name='Санкт-Петербург')
+        self.vehicle = Vehicle.objects.create(
+            vehicle_type='minibus',
+            license_plate='А123АА',
+            total_seats=10
+        )
+        now = timezone.now()
+        self.trip = Trip.objects.create(
+            vehicle=self.vehicle,
+            driver=self.driver,
+            from_city=self.from_city,
+            to_city=self.to_city,
+            departure_time=now + timedelta(days=1),
+            arrival_time=now + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('800.00'),
+            back_seat_price=Decimal('600.00')
+        )
+
+    def create_booking(self, seat_numbers):
+        booking = Booking.objects.create(
+            user=self.user,
+            trip=self.trip,
+            pickup_location='ул. Тестовая, 1',
+            dropoff_location='ул. Тестовая, 2',
+        )
+        booking.trip_seats.add(*TripSeat.objects.filter(trip=self.trip, seat__seat_number__in=seat_numbers))
+        return booking
+
+    def assertCounter(self, expected):
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, expected)
+        self.assertEqual(TripSeat.objects.filter(trip=self.trip, is_booked=False).count(), expected)
+
+    def test_counter_initialized_on_trip_creation(self):
+        """При создании поездки счётчик равен количеству мест транспорта"""
+        self.assertCounter(self.vehicle.total_seats)
+
+    def test_counter_follows_booking_lifecycle(self):
+        """Счётчик уменьшается при бронировании и восстанавливается при отмене и удалении"""
+        booking = self.create_booking([1, 2, 3])
+        self.assertCounter(7)
+
+        booking.trip_seats.remove(TripSeat.objects.get(trip=self.trip, seat__seat_number=3))
+        self.assertCounter(8)
+
+        booking.is_active = False
+        booking.save()
+        self.assertCounter(10)
+
+        other_booking = self.create_booking([4])
+        self.assertCounter(9)
+        other_booking.delete()
+        self.assertCounter(10)
+
+    def test_trip_save_does_not_overwrite_counter(self):
+        """Сохранение устаревшего экземпляра поездки не затирает счётчик"""
+        stale_trip = Trip.objects.get(pk=self.trip.pk)
+        self.create_booking([1, 2])
+        stale_trip.is_bookable = False
+        stale_trip.save()
+        self.assertCounter(8)
+
+    def test_counter_follows_vehicle_resize(self):
+        """Изменение количества мест транспорта отражается в счётчике"""
+        self.create_booking([1])
+        self.vehicle.total_seats = 12
+        self.vehicle.save()
+        self.assertCounter(11)
+
+        self.vehicle.total_seats = 5
+        self.vehicle.save()
+        self.assertCounter(4)
+
+    def test_filter_and_ordering_by_available_seats(self):
+        """Фильтрация и сортировка списка по количеству свободных мест"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.create_booking([1, 2, 3, 4, 5, 6, 7, 8])
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(reverse('trip-list'), {'min_available_seats': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+        response = client.get(reverse('trip-list'), {'min_available_seats': 2, 'ordering': '-available_seats'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['available_seats'], 2)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Команда сверки находит и исправляет расхождения счётчика"""
+        TripSeat.objects.filter(trip=self.trip, seat__seat_number__in=[1, 2]).update(is_booked=True)
+
+        out = StringIO()
+        call_command('reconcile_available_seats', '--dry-run', stdout=out)
+        self.assertIn(f'Поездка {self.trip.pk}: в счётчике 10, фактически свободно 8', out.getvalue())
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, 10)
+
+        out = StringIO()
+        call_command('reconcile_available_seats', stdout=out)
+        self.assertIn('Исправлено расхождений: 1', out.getvalue())
+        self.assertCounter(8)
+
+
+class TripResponseCacheTest(APITestCase):
+    """Тесты версионированного кэша ответов поездок"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('+79111111116', 'userpass')
+        self.driver = User.objects.create_user('+79111111117', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.vehicle = Vehicle.objects.create(vehicle_type='minibus', license_plate='К123КК', total_seats=10)
+        now = timezone.now()
+        self.trip = Trip.objects.create(
+            vehicle=self.vehicle,
+            driver=self.driver,
+            from_city=City.objects.create(name='Москва'),
+            to_city=City.objects.create(name='Санкт-Петербург'),
+            departure_time=now + timedelta(days=1),
+            arrival_time=now + timedelta(days=1, hours=5),
+            front_seat_price=Decimal('1000.00'),
+            middle_seat_price=Decimal('800.00'),
+            back_seat_price=Decimal('600.00')
+        )
+        self.list_url = reverse('trip-list')
+        self.detail_url = reverse('trip-detail', args=[self.trip.id])
+        self.client.force_authenticate(user=self.user)
+
+    def test_repeated_requests_are_served_from_cache(self):
+        """Повторный запрос без изменений данных не обращается к базе"""
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+
+        with self.assertNumQueries(0):
+            list_response = self.client.get(self.list_url)
+            detail_response = self.client.get(self.detail_url)
+        self.assertEqual(list_response.data['results'][0]['id'], self.trip.id)
+        self.assertEqual(detail_response.data['id'], self.trip.id)
+
+    def test_booking_invalidates_cached_responses(self):
+        """После бронирования список и детали поездки сразу показывают новое количество мест"""
+        self.assertEqual(self.client.get(self.list_url).data['results'][0]['available_seats'], 10)
+        self.assertEqual(self.client.get(self.detail_url).data['available_seats'], 10)
+
+        booking = Booking.objects.create(
+            user=self.user,
+            trip=self.trip,
+            pickup_location='ул. Тестовая, 1',
+            dropoff_location='ул. Тестовая, 2',
+        )
+        booking.trip_seats.add(*TripSeat.objects.filter(trip=self.trip, seat__seat_number__in=[1, 2, 3]))
+
+        self.assertEqual(self.client.get(self.list_url).data['results'][0]['available_seats'], 7)
+        self.assertEqual(self.client.get(self.detail_url).data['available_seats'], 7)
+
+    def test_trip_and_vehicle_changes_invalidate_cached_responses(self):
+        """Изменение поездки или транспорта инвалидирует закэшированные ответы"""
+        self.client.get(self.detail_url)
+        self.trip.middle_seat_price = Decimal('900.00')
+        self.trip.save()
+        self.assertEqual(self.client.get(self.detail_url).data['middle_seat_price'], '900.00')
+
+        self.client.get(self.list_url)
+        self.vehicle.total_seats = 12
+        self.vehicle.save()
+        self.assertEqual(self.client.get(self.list_url).data['results'][0]['available_seats'], 12)
+
+    def test_commit_bumps_version_again(self):
+        """Версия увеличивается повторно после коммита транзакции"""
+        service = TripService()
+        before = service.get_list_cache_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            service.invalidate_trips([self.trip.id])
+            in_transaction = service.get_list_cache_version()
+        after_commit = service.get_list_cache_version()
+
+        self.assertEqual(len({before, in_transaction, after_commit}), 3)
+
+    def test_etag_returns_not_modified(self):
+        """Повторный запрос с If-None-Match получает 304 без тела, пока данные не изменились"""
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+
+        self.trip.is_bookable = False
+        self.trip.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cache_key_varies_explicitly(self):
+        """Ключ не зависит от порядка параметров, а для VARY_USER различается по пользователю"""
+        factory = APIRequestFactory()
+        other_user = User.objects.create_user('+79111111118', 'userpass')
+
+        def make_request(query, user):
+            request = Request(factory.get(self.list_url + query))
+            request.user = user
+            return request
+
+        self.assertEqual(
+            build_cache_key('trip_list', 'v1', make_request('?a=1&b=2', self.user), VARY_PUBLIC),
+            build_cache_key('trip_list', 'v1', make_request('?b=2&a=1', other_user), VARY_PUBLIC),
+        )
+        self.assertNotEqual(
+            build_cache_key('bookings', 'v1', make_request('', self.user), VARY_USER),
+            build_cache_key('bookings', 'v1', make_request('', other_user), VARY_USER),
+        )
+
+    def test_hit_miss_counters(self):
+        """Счётчики попаданий и промахов доступны администратору"""
+        stats_before = get_cache_stats(['trip_detail'])['trip_detail']
+        self.client.get(self.detail_url)
+        self.client.get(self.detail_url)
+        stats_after = get_cache_stats(['trip_detail'])['trip_detail']
+        self.assertEqual(stats_after['misses'] - stats_before['misses'], 1)
+        self.assertEqual(stats_after['hits'] - stats_before['hits'], 1)
+
+        stats_url = reverse('response_cache_stats')
+        self.assertEqual(self.client.get(stats_url).status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_user('+79111111119', 'adminpass', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('trip_list', response.data)
+
+
+class TripStatusSweepTest(TestCase):
+    """Тесты периодического обновления статусов поездок (update_trip_statuses)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('+79111111116', 'userpass')
+        self.driver = User.objects.create_user('+79111111117', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.from_city = City.objects.create(name='Москва')
+        self.to_city = City.objects.create(name='Санкт-Петербург')
+        self.vehicle = Vehicle.objects.create(
+            vehicle_type='minibus',
+            license_plate='А124АА',
+            total_seats=4
+        )
+        now = timezone.now()
+        self.trip = Trip.objects.create(
+            vehicle=self.vehicle,
+            driver=self.driver,
+            from_city=self.from_city,
+            to_city=self.to_city,
+            departure_time=now + timedelta(days=1),
+            arrival_time=now + timedelta(days=1, hours=5),
+            booking_cutoff_minutes=60,
+        )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            trip=self.trip,
+            pickup_location='ул. Тестовая, 1',
+            dropoff_location='ул. Тестовая, 2',
+        )
+
+    def test_booking_closes_at_follows_trip_times(self):
+        """Время закрытия бронирования пересчитывается при изменении отправления"""
+        self.assertEqual(self.trip.booking_closes_at, self.trip.departure_time - timedelta(minutes=60))
+
+        self.trip.departure_time += timedelta(hours=1)
+        self.trip.save(update_fields=['departure_time'])
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.booking_closes_at, self.trip.departure_time - timedelta(minutes=60))
+
+    def test_statuses_follow_time(self):
+        """Бронирование закрывается после booking_closes_at, поездка и бронирования деактивируются после прибытия"""
+        service = TripService()
+
+        self.assertEqual(service.update_trip_statuses(now=self.trip.booking_closes_at - timedelta(minutes=1)), (0, 0))
+
+        self.assertEqual(service.update_trip_statuses(now=self.trip.booking_closes_at), (1, 0))
+        self.trip.refresh_from_db()
+        self.assertFalse(self.trip.is_bookable)
+        self.assertTrue(self.trip.is_active)
+
+        self.assertEqual(service.update_trip_statuses(now=self.trip.arrival_time), (0, 1))
+        self.trip.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertFalse(self.trip.is_active)
+        self.assertFalse(self.booking.is_active)
+
+        # Повторный запуск ничего не меняет
+        self.assertEqual(service.update_trip_statuses(now=self.trip.arrival_time), (0, 0))
+
+    def test_sweep_query_count_does_not_depend_on_trips(self):
+        """Количество запросов не зависит от количества поездок в пачке"""
+        now = timezone.now()
+        for day in range(2, 5):
+            Trip.objects.create(
+                vehicle=self.vehicle,
+                driver=self.driver,
+                from_city=self.from_city,
+                to_city=self.to_city,
+                departure_time=now + timedelta(days=day),
+                arrival_time=now + timedelta(days=day, hours=5),
+            )
+
+        with CaptureQueriesContext(connection) as context:
+            closed_count, deactivated_count = TripService().update_trip_statuses(now=now + timedelta(days=10))
+
+        self.assertEqual((closed_count, deactivated_count), (4, 4))
+        # По одному UPDATE поездок на каждый проход и один UPDATE бронирований
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+
+    def test_deactivate_past_trip(self):
+        """Прошедшая активная поездка деактивируется без валидации, места её бронирований освобождаются"""
+        self.booking.trip_seats.add(*TripSeat.objects.filter(trip=self.trip, seat__seat_number__in=[1, 2]))
+        past = timezone.now() - timedelta(days=1)
+        Trip.objects.filter(pk=self.trip.pk).update(departure_time=past - timedelta(hours=5), arrival_time=past)
+
+        deactivate_trip(self.trip.pk)
+
+        self.trip.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertFalse(self.trip.is_active)
+        self.assertFalse(self.trip.is_bookable)
+        self.assertFalse(self.booking.is_active)
+        self.assertEqual(self.trip.available_seats, 4)
+        self.assertFalse(TripSeat.objects.filter(trip=self.trip, is_booked=True).exists())
+
+    def test_deactivate_trips_query_count(self):
+        """Количество запросов не зависит от количества поездок и бронирований"""
+        now = timezone.now()
+        trips = [self.trip] + [
+            Trip.objects.create(
+                vehicle=self.vehicle,
+                driver=self.driver,
+                from_city=self.from_city,
+                to_city=self.to_city,
+                departure_time=now + timedelta(days=day),
+                arrival_time=now + timedelta(days=day, hours=5),
+            )
+            for day in range(2, 5)
+        ]
+        for trip in trips:
+            booking = Booking.objects.create(
+                user=self.user, trip=trip, pickup_location='ул. Тестовая, 1', dropoff_location='ул. Тестовая, 2',
+            )
+            booking.trip_seats.add(TripSeat.objects.get(trip=trip, seat__seat_number=1))
+
+        with CaptureQueriesContext(connection) as single:
+            TripService().deactivate_trips([trips[0].pk])
+        with CaptureQueriesContext(connection) as batch:
+            counts = TripService().deactivate_trips([trip.pk for trip in trips[1:]])
+
+        self.assertEqual(counts, (3, 3, 3))
+        self.assertEqual(len(batch.captured_queries), len(single.captured_queries))
+
+
+class TripScheduleTest(TestCase):
+    """Тесты создания поездок по расписаниям"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.driver = User.objects.create_user('+79111111119', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.from_city = City.objects.create(name='Москва')
+        self.to_city = City.objects.create(name='Санкт-Петербург')
+        self.vehicle = Vehicle.objects.create(vehicle_type='minibus', license_plate='А125АА', total_seats=4)
+        self.now = timezone.now()
+        self.starts_on = timezone.localdate(self.now) + timedelta(days=1)
+        self.schedule = self.create_schedule()
+
+    def create_schedule(self, **kwargs):
+        values = {
+            'from_city': self.from_city,
+            'to_city': self.to_city,
+            'vehicle': self.vehicle,
+            'driver': self.driver,
+            'departure_time': time(9, 0),
+            'duration': timedelta(hours=5),
+            'front_seat_price': Decimal('1000.00'),
+            'middle_seat_price': Decimal('800.00'),
+            'back_seat_price': Decimal('600.00'),
+            'recurrence': 'FREQ=DAILY',
+            'starts_on': self.starts_on,
+            'ends_on': self.starts_on + timedelta(days=6),
+        }
+        values.update(kwargs)
+        return TripSchedule.objects.create(**values)
+
+    def materialize(self, **kwargs):
+        return TripScheduleService().materialize(TripSchedule.objects.all(), weeks=2, now=self.now, **kwargs)
+
+    def test_trips_and_seats_are_created(self):
+        """Поездки создаются по правилу повторения в местное время вместе с местами"""
+        trips, skipped = self.materialize()
+
+        self.assertEqual(len(trips), 7)
+        self.assertEqual(skipped, [])
+        trip = Trip.objects.filter(schedule=self.schedule).order_by('departure_time').first()
+        self.assertEqual(timezone.localtime(trip.departure_time).time(), time(9, 0))
+        self.assertEqual(timezone.localdate(trip.departure_time), self.starts_on)
+        self.assertEqual(trip.arrival_time - trip.departure_time, timedelta(hours=5))
+        self.assertEqual(trip.booking_closes_at, trip.departure_time - timedelta(minutes=30))
+        self.assertEqual(trip.available_seats, 4)
+        self.assertEqual(TripSeat.objects.filter(trip__schedule=self.schedule).count(), 7 * 4)
+        self.assertEqual(
+            TripSeat.objects.get(trip=trip, seat__seat_number=1).cost, Decimal('1000.00')
+        )
+
+    def test_weekly_rule(self):
+        """Правило с днями недели создаёт поездки только в эти дни"""
+        self.schedule.recurrence = 'FREQ=WEEKLY;BYDAY=MO,WE,FR'
+        self.schedule.save()
+
+        trips, _ = self.materialize()
+
+        self.assertEqual(len(trips), 3)
+        self.assertEqual(
+            sorted({timezone.localtime(trip.departure_time).weekday() for trip in trips}), [0, 2, 4]
+        )
+
+    def test_repeated_run_does_not_duplicate(self):
+        """Повторный запуск продолжает расписание, а не создаёт поездки заново"""
+        self.materialize()
+        trips, skipped = self.materialize()
+
+        self.assertEqual(trips, [])
+        self.assertEqual(skipped, [])
+        self.assertEqual(Trip.objects.count(), 7)
+
+    def test_overlaps_are_skipped(self):
+        """Отправления, пересекающиеся с существующими или новыми поездками, пропускаются с причиной"""
+        existing_departure = timezone.make_aware(
+            datetime.combine(self.starts_on, time(10, 0)), timezone.get_current_timezone()
+        )
+        Trip.objects.create(
+            vehicle=self.vehicle,
+            driver=self.driver,
+            from_city=self.to_city,
+            to_city=self.from_city,
+            departure_time=existing_departure,
+            arrival_time=existing_departure + timedelta(hours=2),
+        )
+        # Тот же транспорт на час позже — пересекается с поездками первого расписания
+        self.create_schedule(departure_time=time(10, 0), driver=None)
+
+        trips, skipped = self.materialize()
+
+        self.assertEqual(len(trips), 6)
+        self.assertEqual(len(skipped), 8)
+        self.assertTrue(all('vehicle' in item['errors'] or 'driver' in item['errors'] for item in skipped))
+        self.assertEqual(Trip.objects.count(), 7)
+
+    def test_query_count_does_not_depend_on_trip_count(self):
+        """Количество запросов не зависит от количества создаваемых поездок"""
+        with CaptureQueriesContext(connection) as week:
+            self.materialize()
+
+        self.create_schedule(
+            vehicle=Vehicle.objects.create(vehicle_type='minibus', license_plate='В125ВВ', total_seats=4),
+            driver=None,
+            starts_on=self.starts_on,
+            ends_on=self.starts_on + timedelta(days=13),
+        )
+        with CaptureQueriesContext(connection) as fortnight:
+            trips, _ = TripScheduleService().materialize(
+                TripSchedule.objects.filter(materialized_until__isnull=True), weeks=2, now=self.now
+            )
+
+        self.assertEqual(len(trips), 14)
+        self.assertEqual(len(fortnight.captured_queries), len(week.captured_queries))
+
+
+class TripImportTest(APITestCase):
+    """Тесты массового импорта поездок"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin_user = User.objects.create_user('+79111111120', 'adminpass', is_staff=True)
+        self.regular_user = User.objects.create_user('+79111111121', 'userpass')
+        self.driver = User.objects.create_user('+79111111122', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        City.objects.create(name='Москва')
+        City.objects.create(name='Санкт-Петербург')
+        self.vehicle = Vehicle.objects.create(vehicle_type='minibus', license_plate='А126АА', total_seats=4)
+        self.departure = (timezone.now() + timedelta(days=2)).replace(microsecond=0)
+        self.url = reverse('trip-import-trips')
+
+    def row(self, hours=0, **kwargs):
+        departure = self.departure + timedelta(hours=hours)
+        row = {
+            'from_city_name': 'Москва',
+            'to_city_name': 'Санкт-Петербург',
+            'vehicle': self.vehicle.pk,
+            'driver': self.driver.pk,
+            'departure_time': departure.isoformat(),
+            'arrival_time': (departure + timedelta(hours=5)).isoformat(),
+            'front_seat_price': '1000.00',
+            'middle_seat_price': '800.00',
+            'back_seat_price': '600.00',
+        }
+        row.update(kwargs)
+        return row
+
+    def csv_file(self, rows, name='trips.csv'):
+        header = list(self.row().keys())
+        lines = [','.join(header)] + [','.join(str(row.get(field, '')) for field in header) for row in rows]
+        return SimpleUploadedFile(name, '\n'.join(lines).encode(), content_type='text/csv')
+
+    def test_csv_import_creates_valid_rows_and_reports_errors(self):
+        """Корректные строки создаются вместе с местами, для остальных возвращаются ошибки по номеру строки"""
+        self.client.force_authenticate(user=self.admin_user)
+        rows = [
+            self.row(),
+            self.row(hours=24, to_city_name='Казань'),
+            self.row(hours=2),  # пересекается с первой строкой
+            self.row(hours=48, front_seat_price='-1'),
+            self.row(hours=72),
+        ]
+
+        response = self.client.post(self.url, {'file': self.csv_file(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rows'], 5)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([item['row'] for item in response.data['errors']], [3, 4, 5])
+        self.assertIn('to_city', response.data['errors'][0]['errors'])
+        self.assertIn('vehicle', response.data['errors'][1]['errors'])
+        self.assertIn('front_seat_price', response.data['errors'][2]['errors'])
+        self.assertEqual(Trip.objects.count(), 2)
+        self.assertEqual(TripSeat.objects.count(), 2 * 4)
+        self.assertTrue(all(trip.available_seats == 4 for trip in Trip.objects.all()))
+
+    def test_ndjson_import_and_dry_run(self):
+        """NDJSON: неразобранная строка попадает в ошибки; dry_run не создаёт поездки"""
+        self.client.force_authenticate(user=self.admin_user)
+        content = '\n'.join([json.dumps(self.row()), '{not json', json.dumps(self.row(hours=24))])
+        upload = SimpleUploadedFile('trips.ndjson', content.encode(), content_type='application/x-ndjson')
+
+        response = self.client.post(self.url, {'file': upload, 'dry_run': 'true'}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([item['row'] for item in response.data['errors']], [2])
+        self.assertFalse(Trip.objects.exists())
+
+    def test_invalid_values_are_reported_per_row(self):
+        """Невозможная дата и нечисловые или не помещающиеся в поле цены — ошибки строки, а не 500"""
+        self.client.force_authenticate(user=self.admin_user)
+        rows = [
+            self.row(departure_time='2030-13-45T10:00:00+03:00'),
+            self.row(hours=24, front_seat_price='Infinity'),
+            self.row(hours=48, middle_seat_price='NaN'),
+            self.row(hours=72, back_seat_price='123456789.00'),
+            self.row(hours=96, back_seat_price='10.005'),
+        ]
+
+        response = self.client.post(self.url, {'file': self.csv_file(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(
+            [list(item['errors']) for item in response.data['errors']],
+            [['departure_time'], ['front_seat_price'], ['middle_seat_price'], ['back_seat_price'], ['back_seat_price']]
+        )
+
+    def test_invalid_booking_cutoff_is_reported_per_row(self):
+        """Нецелое booking_cutoff_minutes в NDJSON — ошибка строки, а не 500 и не молчаливое округление"""
+        self.client.force_authenticate(user=self.admin_user)
+        cutoffs = [[5], {}, 12.7, True, '-5', 45]
+        content = '\n'.join(
+            json.dumps(self.row(hours=24 * position, booking_cutoff_minutes=cutoff))
+            for position, cutoff in enumerate(cutoffs)
+        )
+        upload = SimpleUploadedFile('trips.ndjson', content.encode(), content_type='application/x-ndjson')
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([item['row'] for item in response.data['errors']], [1, 2, 3, 4, 5])
+        self.assertTrue(all(list(item['errors']) == ['booking_cutoff_minutes'] for item in response.data['errors']))
+        self.assertEqual(Trip.objects.get().booking_cutoff_minutes, 45)
+
+    def test_malformed_file_is_rejected_without_partial_import(self):
+        """Файл не в UTF-8 или с битой разметкой CSV отклоняется целиком"""
+        self.client.force_authenticate(user=self.admin_user)
+        valid = self.csv_file([self.row()]).read()
+        broken_encoding = SimpleUploadedFile('trips.csv', valid + '\nМосква'.encode('cp1251'))
+        broken_csv = SimpleUploadedFile('trips.csv', valid + b'\n' + b'x' * (csv.field_size_limit() + 1))
+
+        for upload in (broken_encoding, broken_csv):
+            with self.subTest(upload=upload):
+                response = self.client.post(self.url, {'file': upload}, format='multipart')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('file', response.data)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_import_conflicts_with_existing_trips(self):
+        """Строки, пересекающиеся с существующими поездками, отклоняются"""
+        Trip.objects.create(
+            vehicle=self.vehicle,
+            driver=self.driver,
+            from_city=City.objects.get(name='Москва'),
+            to_city=City.objects.get(name='Санкт-Петербург'),
+            departure_time=self.departure,
+            arrival_time=self.departure + timedelta(hours=5),
+        )
+        self.client.force_authenticate(user=self.admin_user)
+
+        response = self.client.post(self.url, {'file': self.csv_file([self.row(hours=1)])}, format='multipart')
+
+        self.assertEqual(response.data['created'], 0)
+        self.assertTrue(response.data['errors'][0]['errors']['vehicle'].startswith('Транспорт занят с'))
+
+    def test_import_requires_admin(self):
+        """Импорт доступен только администраторам"""
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.post(self.url, {'file': self.csv_file([self.row()])}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        """Количество запросов не зависит от количества строк"""
+        self.client.force_authenticate(user=self.admin_user)
+        with CaptureQueriesContext(connection) as single:
+            self.client.post(self.url, {'file': self.csv_file([self.row()])}, format='multipart')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post(
+                self.url, {'file': self.csv_file([self.row(hours=24 * day) for day in range(1, 21)])},
+                format='multipart'
+            )
+
+        self.assertEqual(response.data['created'], 20)
+        self.assertEqual(len(many.captured_queries), len(single.captured_queries))
+
+    def test_management_command(self):
+        """Команда import_trips импортирует файл и выводит отчёт"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'trips.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(json.dumps(row) for row in [self.row(), self.row(hours=1)]))
+
+        out = StringIO()
+        call_command('import_trips', path, stdout=out)
+
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertIn('Строка 2', out.getvalue())
+
+    def test_management_command_rejects_malformed_file(self):
+        """Команда сообщает об ошибке кодировки через CommandError"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'trips.ndjson')
+        with open(path, 'wb') as file:
+            file.write(json.dumps(self.row(), ensure_ascii=False).encode('cp1251'))
+
+        with self.assertRaises(CommandError):
+            call_command('import_trips', path, stdout=StringIO())
+        self.assertFalse(Trip.objects.exists())
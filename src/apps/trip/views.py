@@ -2,23 +2,40 @@ from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters import rest_framework as django_filters
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
 from rest_framework import status
+from django.core.exceptions import ValidationError
+from redis.exceptions import RedisError
 
 from .filters import TripFilter
+from .pagination import TripPagination
 from .models import Trip
 from .permissions import HasTripPermission
 from .serializers import TripDetailSerializer, TripCreateUpdateSerializer
 from .services.CityService import CityService
 from .services.TripService import TripService
+from .services.TripImportService import TripImportService
 from apps.seat.models import TripSeat
 from apps.seat.serializers import TripSeatSerializer
+from apps.seat.services.seat_hold_service import SeatHoldService
+from utils.response_cache import cache_response, VARY_PUBLIC
 
 trip_service = TripService()
+seat_hold_service = SeatHoldService()
+
+
+def trip_list_cache_prefix(view, request, *args, **kwargs):
+    """Префикс кэша списков: общая версия, меняется при любом изменении поездок, мест и городов"""
+    return f"v{trip_service.get_list_cache_version()}"
+
+
+def trip_detail_cache_prefix(view, request, *args, **kwargs):
+    """Префикс кэша деталей поездки: версия конкретной поездки"""
+    trip_id = kwargs[view.lookup_field]
+    return f"{trip_id}:v{trip_service.get_trip_cache_version(trip_id)}"
 
 
 class TripViewSet(viewsets.ModelViewSet):
@@ -38,9 +55,11 @@ class TripViewSet(viewsets.ModelViewSet):
         filters.OrderingFilter
     ]
     filterset_class = TripFilter
+    pagination_class = TripPagination
     search_fields = ['from_city__name', 'to_city__name']
     permission_classes = [IsAuthenticated, HasTripPermission]
-    ordering_fields = ['departure_time', 'arrival_time', 'front_seat_price', 'middle_seat_price', 'back_seat_price']
+    ordering_fields = ['departure_time', 'arrival_time', 'front_seat_price', 'middle_seat_price', 'back_seat_price',
+                       'available_seats']
     ordering = ['departure_time']
 
     @swagger_auto_schema(
@@ -68,15 +87,26 @@ class TripViewSet(viewsets.ModelViewSet):
             openapi.Parameter('search', openapi.IN_QUERY, description="Поиск по названию города",
                               type=openapi.TYPE_STRING),
             openapi.Parameter('ordering', openapi.IN_QUERY,
-                              description="Поле для сортировки (departure_time, -departure_time, default_ticket_price, -default_ticket_price, arrival_time, -arrival_time)",
+                              description="Поле для сортировки (departure_time, -departure_time, default_ticket_price, -default_ticket_price, arrival_time, -arrival_time, available_seats, -available_seats)",
                               type=openapi.TYPE_STRING),
             openapi.Parameter('is_bookable', openapi.IN_QUERY, 
                               description="Фильтр по возможности бронирования (true/false)", 
                               type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('min_available_seats', openapi.IN_QUERY,
+                              description="Минимальное количество свободных мест", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('pagination', openapi.IN_QUERY,
+                              description="Режим пагинации: cursor — курсорная пагинация по времени отправления "
+                                          "(без count, сортировка ordering не применяется)",
+                              type=openapi.TYPE_STRING, enum=['cursor']),
+            openapi.Parameter('cursor', openapi.IN_QUERY,
+                              description="Курсор следующей страницы (из ссылки next) в режиме pagination=cursor",
+                              type=openapi.TYPE_STRING),
         ],
         tags=["Поездки"]
     )
-    @method_decorator(cache_page(60 * 5))  # кэш на 5 минут
+    # Список поездок одинаков для всех пользователей, прошедших проверку прав
+    @cache_response('trip_list', trip_list_cache_prefix, timeout=trip_service.RESPONSE_CACHE_TIMEOUT,
+                    vary=VARY_PUBLIC)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -85,7 +115,8 @@ class TripViewSet(viewsets.ModelViewSet):
         operation_summary="Детали поездки",
         tags=["Поездки"]
     )
-    @method_decorator(cache_page(60 * 5))
+    @cache_response('trip_detail', trip_detail_cache_prefix, timeout=trip_service.RESPONSE_CACHE_TIMEOUT,
+                    vary=VARY_PUBLIC)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
@@ -190,7 +221,8 @@ class TripViewSet(viewsets.ModelViewSet):
         tags=["Поездки"]
     )
     @action(detail=False, methods=['get'])
-    @method_decorator(cache_page(60 * 60))  # кэш на 1 час, так как список городов меняется редко
+    # кэш на 1 час, так как список городов меняется редко
+    @cache_response('trip_cities', trip_list_cache_prefix, timeout=60 * 60, vary=VARY_PUBLIC)
     def cities(self, request):
         """Получение списка городов для фильтрации"""
         cities = trip_service.get_cities()
@@ -200,7 +232,8 @@ class TripViewSet(viewsets.ModelViewSet):
         })
 
     @swagger_auto_schema(
-        operation_description="Получение списка мест в поездке",
+        operation_description="Получение списка мест в поездке. is_held — место удерживается другим пользователем, "
+                              "который оформляет бронирование",
         operation_summary="Список мест",
         tags=["Поездки"]
     )
@@ -208,6 +241,86 @@ class TripViewSet(viewsets.ModelViewSet):
     def seats(self, request, pk=None):
         """Получение списка мест в поездке"""
         trip = self.get_object()
-        seats = TripSeat.objects.filter(trip=trip).select_related('seat')
-        serializer = TripSeatSerializer(seats, many=True)
+        seats = list(TripSeat.objects.filter(trip=trip).select_related('seat__vehicle'))
+        # Поездка уже загружена со связанными объектами, повторно для каждого места её не запрашиваем
+        for trip_seat in seats:
+            trip_seat.trip = trip
+        context = {'holds': seat_hold_service.get_trip_holds(trip.pk), 'user_id': request.user.pk}
+        serializer = TripSeatSerializer(seats, many=True, context=context)
         return Response(serializer.data)
+
+    @swagger_auto_schema(
+        methods=['post'],
+        operation_description="Удержание мест поездки на время оформления бронирования. Удержанные места не может "
+                              "забронировать или удержать другой пользователь; повторный запрос продлевает удержание. "
+                              "Чтобы забронировать удержанные места, создайте бронирование без seat_numbers.",
+        operation_summary="Удержание мест",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['seat_numbers'],
+            properties={
+                'seat_numbers': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER),
+                                               description='Номера мест для удержания'),
+            }
+        ),
+        tags=["Поездки"]
+    )
+    @swagger_auto_schema(
+        methods=['delete'],
+        operation_description="Снятие всех удержаний мест поездки текущим пользователем",
+        operation_summary="Снятие удержания мест",
+        tags=["Поездки"]
+    )
+    @action(detail=True, methods=['post', 'delete'])
+    def hold(self, request, pk=None):
+        """Удержание мест поездки текущим пользователем"""
+        trip = self.get_object()
+        try:
+            if request.method == 'DELETE':
+                released = seat_hold_service.release_user_holds(request.user, trip.pk)
+                return Response({'released': released})
+
+            seat_numbers = request.data.get('seat_numbers')
+            if not isinstance(seat_numbers, list) or not all(isinstance(number, int) for number in seat_numbers):
+                return Response({"seat_numbers": "Ожидается список номеров мест"}, status=status.HTTP_400_BAD_REQUEST)
+            hold = seat_hold_service.hold_seats(request.user, trip, seat_numbers)
+        except ValidationError as e:
+            return Response({"detail": e.messages}, status=status.HTTP_409_CONFLICT)
+        except RedisError:
+            return Response({"detail": "Удержание мест временно недоступно"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(hold, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_description="Массовый импорт поездок из файла CSV или NDJSON (одна поездка — одна строка). "
+                              "Поля: from_city_name, to_city_name, vehicle, driver, departure_time, arrival_time "
+                              "(ISO 8601), front_seat_price, middle_seat_price, back_seat_price, "
+                              "booking_cutoff_minutes. Корректные строки создаются, для остальных "
+                              "возвращаются ошибки по номеру строки. Доступно только администраторам.",
+        operation_summary="Импорт поездок",
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                              description="Файл .csv или .ndjson в кодировке UTF-8"),
+            openapi.Parameter('format', openapi.IN_FORM, type=openapi.TYPE_STRING, enum=[*TripImportService.FORMATS],
+                              description="Формат файла (по умолчанию — по расширению)"),
+            openapi.Parameter('dry_run', openapi.IN_FORM, type=openapi.TYPE_BOOLEAN,
+                              description="Только проверить строки, не создавая поездки"),
+        ],
+        tags=["Поездки"]
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_trips(self, request):
+        """Массовый импорт поездок из файла"""
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
+            return Response({"file": "Необходимо загрузить файл"}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or uploaded.name.rsplit('.', 1)[-1].lower()
+        if file_format not in TripImportService.FORMATS:
+            return Response({"format": "Поддерживаются форматы csv и ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+        try:
+            report = TripImportService().import_file(uploaded.file, file_format, dry_run=dry_run)
+        except ValidationError as e:
+            return Response({"file": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
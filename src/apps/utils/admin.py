@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Address
+
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ('city', 'query', 'formatted', 'source', 'updated_at')
+    list_filter = ('city', 'source')
+    search_fields = ('query', 'formatted')
+    ordering = ('city', 'query')
@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_pg_trgm_extension(using, **kwargs):
+    """
+    Нечёткий поиск по справочнику адресов использует триграммный GIN-индекс,
+    для него нужно расширение pg_trgm. Создаётся до миграций, в том числе для тестовой базы
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+class UtilsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.utils'
+    label = 'transfer_utils'
+    verbose_name = "Служебные данные"
+
+    def ready(self):
+        pre_migrate.connect(create_pg_trgm_extension, sender=self)
@@ -0,0 +1,45 @@
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.address.local_index import build_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит локальный индекс адресов для офлайн-геокодера из CSV-файла с колонками '
+        'city, street, house_number (например, выгрузки домов из OSM-экстракта)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='CSV-файл с колонками city, street, house_number (первая строка — заголовок)')
+        parser.add_argument(
+            '--output',
+            help='Путь к файлу индекса (по умолчанию ADDRESS_LOCAL_INDEX_PATH)'
+        )
+
+    def handle(self, *args, **options):
+        output = str(options['output'] or settings.ADDRESS_LOCAL_INDEX_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        # Индекс пишется во временный файл и подменяется атомарно:
+        # работающие процессы продолжают читать прежний файл через mmap
+        temporary = f'{output}.tmp'
+        try:
+            count = build_index(temporary, self.read_rows(options['source']))
+            os.replace(temporary, output)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        self.stdout.write(self.style.SUCCESS(f'Адресов в индексе: {count} ({output})'))
+
+    def read_rows(self, path):
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                for row in csv.DictReader(file):
+                    yield (row.get('city') or ''), (row.get('street') or ''), (row.get('house_number') or '')
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл {path}: {e}')
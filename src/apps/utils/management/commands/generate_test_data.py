@@ -9,7 +9,7 @@ from django.contrib.auth.models import Group
 from apps.auth.models import User
 from apps.trip.models import City, Trip
 from apps.vehicle.models import Vehicle
-from apps.seat.models import Seat, TripSeat
+from apps.seat.models import Seat, TripSeat, allow_seat_deletion
 from apps.booking.models import Booking
 from apps.payment.models import Payment
 
@@ -74,7 +74,8 @@ class Command(BaseCommand):
         Payment.objects.all().delete()
         TripSeat.objects.all().delete()
         Trip.objects.all().delete()
-        Seat.objects.all().delete()
+        with allow_seat_deletion():
+            Seat.objects.all().delete()
         Vehicle.objects.all().delete()
         City.objects.all().delete()
         User.objects.all().filter(is_superuser=False).delete()
@@ -309,11 +310,8 @@ class Command(BaseCommand):
                     num_seats = random.randint(1, min(3, available_trip_seats.count()))
                     seats_to_book = random.sample(list(available_trip_seats), num_seats)
                     
-                    # Бронируем места
-                    for trip_seat in seats_to_book:
-                        trip_seat.is_booked = True
-                        trip_seat.save()
-                        booking.trip_seats.add(trip_seat)
+                    # Бронируем места (сигнал m2m_changed помечает их занятыми и обновляет счётчик поездки)
+                    booking.trip_seats.add(*seats_to_book)
                 
                     booking.save()
                     
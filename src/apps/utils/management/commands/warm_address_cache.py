@@ -0,0 +1,65 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.booking.models import Booking
+from apps.utils.models import Address
+from utils.address.cache_utils import warm_shared_cache
+from utils.address.storage import bulk_save_addresses
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет справочник адресов: адресами из прошлых бронирований '
+        'и (опционально) офлайн-списком улиц из CSV-файла, затем записывает '
+        'справочник в общий кэш (Redis)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--streets',
+            help='CSV-файл с колонками city, street, house_number (первая строка — заголовок)'
+        )
+        parser.add_argument('--skip-bookings', action='store_true', help='Не загружать адреса из бронирований')
+        parser.add_argument('--skip-cache', action='store_true', help='Не записывать справочник в общий кэш')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пакета при вставке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if not options['skip_bookings']:
+            count = bulk_save_addresses(self.booking_addresses(), source='booking', batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Адресов из бронирований: {count}'))
+
+        if options['streets']:
+            count = bulk_save_addresses(
+                self.street_list_addresses(options['streets']), source='street_list', batch_size=batch_size
+            )
+            self.stdout.write(self.style.SUCCESS(f'Адресов из списка улиц: {count}'))
+
+        if not options['skip_cache']:
+            rows = Address.objects.values_list('city', 'query', 'formatted').iterator(chunk_size=batch_size)
+            count = warm_shared_cache(rows, batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Адресов в общем кэше: {count}'))
+
+    def booking_addresses(self):
+        """Адреса бронирований уже прошли проверку и сохранены в формате «улица, д. N»"""
+        rows = Booking.objects.values_list(
+            'pickup_location', 'trip__from_city__name', 'dropoff_location', 'trip__to_city__name'
+        ).iterator()
+        for pickup, from_city, dropoff, to_city in rows:
+            for address, city in ((pickup, from_city), (dropoff, to_city)):
+                if address and ', д. ' in address:
+                    yield city, address, address
+
+    def street_list_addresses(self, path):
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                for row in csv.DictReader(file):
+                    city = (row.get('city') or '').strip()
+                    street = (row.get('street') or '').strip()
+                    house_number = (row.get('house_number') or '').strip()
+                    if city and street and house_number:
+                        yield city, f"{street} {house_number}", f"{street}, д. {house_number}"
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл {path}: {e}')
@@ -0,0 +1,48 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
+
+class Address(models.Model):
+    """
+    Постоянный справочник проверенных адресов.
+    Ключ — нормализованные город и запрос (улица с номером дома), значение — адрес
+    в формате «улица, д. N», который возвращает find_address_by_name.
+    """
+    SOURCE_CHOICES = [
+        ("geocoder", "Геокодер"),
+        ("booking", "Прошлые бронирования"),
+        ("street_list", "Список улиц"),
+    ]
+
+    city = models.CharField(max_length=100, verbose_name="Город (нормализованный)")
+    query = models.CharField(max_length=255, verbose_name="Запрос (нормализованный)")
+    formatted = models.CharField(max_length=255, verbose_name="Адрес")
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        default="geocoder",
+        verbose_name="Источник"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Адрес"
+        verbose_name_plural = "Адреса"
+        ordering = ['city', 'query']
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'query'], name='address_city_query_unique'),
+        ]
+        indexes = [
+            # Префиксный поиск (LIKE 'запрос%') по нормализованному запросу внутри города
+            models.Index(
+                fields=['city', 'query'],
+                name='address_city_query_prefix_idx',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            # Нечёткий поиск (оператор % из pg_trgm) для запросов с опечатками
+            GinIndex(fields=['query'], name='address_query_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.city}: {self.query} → {self.formatted}"
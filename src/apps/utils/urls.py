@@ -1,6 +1,8 @@
-from django.urls import path
-from apps.utils.views import health_check
+from django.urls import path, re_path
+from apps.utils.views import address_suggest, health_check, response_cache_stats
 
 urlpatterns = [
     path('health/', health_check, name='health_check'),
+    path('cache-stats/', response_cache_stats, name='response_cache_stats'),
+    re_path(r'^address/suggest/?$', address_suggest, name='address_suggest'),
 ] 
\ No newline at end of file
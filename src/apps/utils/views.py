@@ -1,6 +1,18 @@
 from django.http import JsonResponse
 from django.db import connection
 from django_redis import get_redis_connection
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from utils.address.suggest import suggest_addresses
+from utils.response_cache import REGISTERED_CACHES, get_cache_stats
+
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 20
 
 def health_check(request):
     """
@@ -34,4 +46,46 @@ def health_check(request):
     
     status_code = 200 if health_status['status'] == 'ok' else 503
     
-    return JsonResponse(health_status, status=status_code) 
\ No newline at end of file
+    return JsonResponse(health_status, status=status_code)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Счётчики попаданий и промахов кэша ответов API. Доступно только администраторам.",
+    operation_summary="Статистика кэша ответов",
+    tags=["Служебные"]
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """Возвращает счётчики hits/misses для каждого кэша ответов"""
+    return Response(get_cache_stats(REGISTERED_CACHES))
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Подсказки адресов в формате «улица, д. N» по началу или части введённой строки. Подсказки строятся по справочнику ранее проверенных адресов города, поэтому выбранный адрес гарантированно пройдёт проверку при бронировании.",
+    operation_summary="Подсказки адресов",
+    manual_parameters=[
+        openapi.Parameter('city', openapi.IN_QUERY, description="Название города", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('q', openapi.IN_QUERY, description="Введённая часть адреса", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('limit', openapi.IN_QUERY, description=f"Количество подсказок (не больше {SUGGEST_MAX_LIMIT})", type=openapi.TYPE_INTEGER),
+    ],
+    tags=["Служебные"]
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def address_suggest(request):
+    """Возвращает подсказки адресов для автодополнения"""
+    city = request.query_params.get('city', '').strip()
+    query = request.query_params.get('q', '').strip()
+    if not city or not query:
+        return Response({"error": "Необходимо указать параметры city и q"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({"error": "Параметр limit должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    return Response({'city': city, 'query': query, 'results': suggest_addresses(city, query, limit)})
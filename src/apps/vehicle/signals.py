@@ -1,43 +1,65 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from apps.seat.models import Seat, TripSeat
+from apps.seat.services.seat_service import SeatService
 from apps.trip.models import Trip
+from apps.trip.services.TripService import TripService
 from apps.vehicle.models import Vehicle
 
 
+def add_seats(vehicle, first_seat_number):
+    """
+    Массово создаёт места с номерами от first_seat_number до vehicle.total_seats
+    и соответствующие TripSeat для всех существующих поездок транспортного средства
+    """
+    new_seats = Seat.objects.bulk_create([
+        Seat(vehicle=vehicle, seat_number=number, price_zone="front" if number == 1 else "back")
+        for number in range(first_seat_number, vehicle.total_seats + 1)
+    ])
+    if not new_seats:
+        return
+
+    trips = Trip.objects.filter(vehicle=vehicle)
+    zone_prices = {
+        trip_id: {'front': front, 'middle': middle, 'back': back}
+        for trip_id, front, middle, back in trips.values_list(
+            'pk', 'front_seat_price', 'middle_seat_price', 'back_seat_price'
+        )
+    }
+    if not zone_prices:
+        return
+
+    TripSeat.objects.bulk_create([
+        TripSeat(trip_id=trip_id, seat=seat, cost=prices[seat.price_zone])
+        for trip_id, prices in zone_prices.items()
+        for seat in new_seats
+    ])
+    # Новые места свободны во всех поездках этого транспортного средства
+    trips.update(available_seats=F('available_seats') + len(new_seats))
+
+
 @receiver(post_save, sender=Vehicle)
 def manage_seats(sender, instance, created, **kwargs):
     """
     Функция автоматически создаёт или обновляет места при создании или изменении транспортного средства
     """
-    # Получаем текущие места для этого транспортного средства
-    current_seats = Seat.objects.filter(vehicle=instance).order_by('seat_number')
-    current_seat_count = current_seats.count()
+    with transaction.atomic():
+        # Если создано новое транспортное средство, создаем места с нуля
+        if created:
+            add_seats(instance, 1)
+            return
 
-    # Если создано новое транспортное средство
-    if created:
-        # Создаем места с нуля
-        Seat.objects.create(vehicle=instance, seat_number=1, price_zone="front")
-        for i in range(instance.total_seats - 1):
-            Seat.objects.create(vehicle=instance, seat_number=i + 2, price_zone="back")
-
-        # Также нужно создать TripSeat для каждой поездки с этим транспортным средством
-        trips = Trip.objects.filter(vehicle=instance)
-        for trip in trips:
-            for seat in Seat.objects.filter(vehicle=instance):
-                TripSeat.objects.create(trip=trip, seat=seat)
-    else:
         # Проверяем изменение количества мест
+        current_seats = Seat.objects.filter(vehicle=instance)
+        current_seat_count = current_seats.count()
+
         if current_seat_count < instance.total_seats:
             # Нужно добавить места
-            for i in range(current_seat_count + 1, instance.total_seats + 1):
-                seat = Seat.objects.create(vehicle=instance, seat_number=i, price_zone="back")
-
-                # Создать TripSeat для существующих поездок
-                trips = Trip.objects.filter(vehicle=instance)
-                for trip in trips:
-                    TripSeat.objects.create(trip=trip, seat=seat)
+            add_seats(instance, current_seat_count + 1)
 
         elif current_seat_count > instance.total_seats:
             # Нужно удалить лишние места
@@ -56,5 +78,26 @@ def manage_seats(sender, instance, created, **kwargs):
                 instance.save(update_fields=['total_seats'])
                 return
 
+            # Уменьшаем счётчик свободных мест на число удаляемых мест каждой поездки
+            removed_per_trip = TripSeat.objects.filter(
+                trip=OuterRef('pk'), seat__in=seats_to_remove
+            ).order_by().values('trip').annotate(count=Count('pk')).values('count')
+            Trip.objects.filter(vehicle=instance).update(
+                available_seats=F('available_seats') - Coalesce(Subquery(removed_per_trip), 0)
+            )
+
             # Удаляем места, начиная с конца
-            seats_to_remove.delete()
\ No newline at end of file
+            SeatService().delete_seats(seats_to_remove)
+
+
+@receiver(post_save, sender=Vehicle)
+def invalidate_vehicle_trips_cache(sender, instance, created, **kwargs):
+    """
+    Транспорт и количество его свободных мест входят в ответы поездок,
+    поэтому при изменении транспорта инвалидируем кэш его поездок
+    """
+    if created:
+        return
+    trip_ids = list(Trip.objects.filter(vehicle=instance).values_list('pk', flat=True))
+    if trip_ids:
+        TripService().invalidate_trips(trip_ids)
@@ -4,6 +4,8 @@ from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta
 from decimal import Decimal
 import re
@@ -284,6 +286,71 @@ class VehicleModelTest(TestCase):
             self.assertFalse(trip_seat.is_booked)
 
 
+class VehicleSeatResizeTest(TestCase):
+    """Тесты массового изменения количества мест транспортного средства с поездками"""
+
+    def setUp(self):
+        self.driver = User.objects.create_user('+79111111119', 'driverpass')
+        driver_group, _ = Group.objects.get_or_create(name='Водитель')
+        self.driver.groups.add(driver_group)
+        self.vehicle = Vehicle.objects.create(vehicle_type='bus', license_plate='Е777ЕЕ', total_seats=10)
+
+        from_city = City.objects.create(name='Москва')
+        to_city = City.objects.create(name='Санкт-Петербург')
+        now = timezone.now()
+        self.trips = [
+            Trip.objects.create(
+                vehicle=self.vehicle,
+                driver=self.driver,
+                from_city=from_city,
+                to_city=to_city,
+                departure_time=now + timedelta(days=day),
+                arrival_time=now + timedelta(days=day, hours=5),
+                front_seat_price=Decimal('1500.00'),
+                middle_seat_price=Decimal('1000.00'),
+                back_seat_price=Decimal('800.00')
+            ) for day in range(1, 6)
+        ]
+
+    def resize(self, total_seats):
+        self.vehicle.total_seats = total_seats
+        with CaptureQueriesContext(connection) as queries:
+            self.vehicle.save()
+        return len(queries)
+
+    def test_resize_query_count_does_not_depend_on_seats_and_trips(self):
+        """Изменение количества мест выполняется фиксированным числом запросов, а не по запросу на место"""
+        grow_small = self.resize(12)
+        grow_large = self.resize(60)
+        self.assertEqual(grow_small, grow_large)
+
+        for trip in self.trips:
+            self.assertEqual(TripSeat.objects.filter(trip=trip).count(), 60)
+            trip.refresh_from_db()
+            self.assertEqual(trip.available_seats, 60)
+        # Новые места относятся к задней зоне и получают её цену
+        self.assertEqual(
+            set(TripSeat.objects.filter(seat__seat_number__gt=10).values_list('cost', flat=True)),
+            {Decimal('800.00')}
+        )
+
+        # Удаление выполняется пакетно: ORM удаляет связанные TripSeat порциями по 100 записей
+        self.assertLess(self.resize(5), 20)
+        self.assertEqual(Seat.objects.filter(vehicle=self.vehicle).count(), 5)
+        self.assertEqual(TripSeat.objects.filter(trip=self.trips[0]).count(), 5)
+
+    def test_resize_keeps_booked_seats(self):
+        """Уменьшение количества мест откатывается, если среди удаляемых есть забронированные"""
+        TripSeat.objects.filter(trip=self.trips[2], seat__seat_number=9).update(is_booked=True)
+
+        self.resize(5)
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.total_seats, 10)
+        self.assertEqual(Seat.objects.filter(vehicle=self.vehicle).count(), 10)
+        self.assertEqual(TripSeat.objects.filter(trip=self.trips[0]).count(), 10)
+
+
 class VehicleAPITest(APITestCase):
     """Тесты для API транспортных средств"""
 
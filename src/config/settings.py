@@ -31,6 +31,15 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'web', '150.241.82.170']
 
 TELEGRAM_BOT_TOKEN='7553600402:AAFvb8DvJQXpCsrmoABNtw0qw-q8R6izMNw'
 
+# Адрес Bot API (в тестах — локальный фейковый сервер, см. utils/tests/fake_telegram.py)
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+# Общий для всех воркеров лимит отправки сообщений в секунду (лимит Telegram — около 30)
+TELEGRAM_RATE_LIMIT = 25
+
+# Сколько раз повторяется доставка сообщений при временной недоступности Telegram
+TELEGRAM_MAX_RETRIES = 8
+
 
 # Application definition
 
@@ -41,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Сервисы
     'apps.auth.apps.AuthConfig',
@@ -49,7 +59,7 @@ INSTALLED_APPS = [
     'apps.vehicle.apps.VehicleConfig',
     'apps.seat.apps.SeatConfig',
     'apps.payment.apps.PaymentConfig',
-    'apps.utils',
+    'apps.utils.apps.UtilsConfig',
 
     # Библиотеки
     'rest_framework',
@@ -84,6 +94,21 @@ CACHES = {
     }
 }
 
+# Размер кэша найденных адресов в памяти каждого процесса (utils.address)
+ADDRESS_LRU_CACHE_SIZE = 1024
+
+# Геокодеры адресов в порядке опроса: локальный индекс, затем API Nominatim
+ADDRESS_GEOCODERS = [
+    'utils.address.geocoders.LocalGeocoder',
+    'utils.address.geocoders.NominatimGeocoder',
+]
+
+# Файл локального индекса адресов (manage.py build_address_index)
+ADDRESS_LOCAL_INDEX_PATH = BASE_DIR / 'data' / 'address_index.bin'
+
+# Общий для всех воркеров лимит запросов к Nominatim в секунду (политика сервиса — не чаще 1)
+NOMINATIM_RATE_LIMIT = 1.0
+
 # Настройка кэширования сессий (опционально)
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
@@ -228,6 +253,41 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_BROKER_CONNECTION_RETRY = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# Уведомления идут отдельной очередью, чтобы медленный Telegram не задерживал остальные задачи
+CELERY_TASK_ROUTES = {
+    'apps.booking.tasks.send_booking_notification': {'queue': 'notifications'},
+    'apps.booking.tasks.send_telegram_messages': {'queue': 'notifications'},
+}
+
+# Проверка адресов посадки и высадки в задаче Celery вместо потока запроса:
+# бронирование сразу создаётся со статусом адресов 'pending', места удерживаются
+BOOKING_ASYNC_ADDRESS_VALIDATION = False
+
+# Сколько секунд место удерживается за пользователем на время оформления бронирования
+SEAT_HOLD_TIMEOUT = 10 * 60
+
+# На сколько недель вперёд создаются поездки по расписаниям (TripSchedule)
+TRIP_SCHEDULE_WEEKS_AHEAD = 13
+
+# Периодические задачи (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    # Истёкшие удержания мест возвращаются в счётчики свободных мест
+    'release-expired-seat-holds': {
+        'task': 'apps.seat.tasks.release_expired_seat_holds',
+        'schedule': 30.0,
+    },
+    # Закрытие бронирования и деактивация завершившихся поездок
+    'update-trip-statuses': {
+        'task': 'apps.trip.tasks.update_trip_statuses',
+        'schedule': 60.0,
+    },
+    # Продление расписаний рейсов на TRIP_SCHEDULE_WEEKS_AHEAD недель вперёд
+    'materialize-trip-schedules': {
+        'task': 'apps.trip.tasks.materialize_trip_schedules',
+        'schedule': 24 * 60 * 60.0,
+    },
+}
+
 APPEND_SLASH = False
 
 # Настройки CORS для Flutter
@@ -1,4 +1,5 @@
 from .find_address_by_name import find_address_by_name
 from .cache_utils import cached_address_lookup
+from .geocoders import GeocoderUnavailable
 
-__all__ = ['find_address_by_name', 'cached_address_lookup']
\ No newline at end of file
+__all__ = ['find_address_by_name', 'cached_address_lookup', 'GeocoderUnavailable']
\ No newline at end of file
@@ -2,22 +2,128 @@ import hashlib
 import functools
 import logging
 import threading
+from collections import OrderedDict
+
+from django.conf import settings
 from django.core.cache import cache
+from redis.exceptions import LockError, RedisError
+
+from .geocoders import GeocoderUnavailable
+from .normalize import normalize_address, normalize_city
+from .storage import lookup_address, save_address
 
 logger = logging.getLogger(__name__)
 
-# Используем threading.local() для хранения временных результатов 
-# в рамках текущего потока, чтобы избежать повторных вызовов
-_local_cache = threading.local()
+_MISSING = object()
+
+
+class LRUCache:
+    """Потокобезопасный кэш ограниченного размера с вытеснением давно не использованных записей"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Кэш найденных адресов в памяти процесса. В отличие от прежнего threading.local,
+# размер ограничен, поэтому память воркера не растёт бесконечно
+_local_cache = LRUCache(getattr(settings, 'ADDRESS_LRU_CACHE_SIZE', 1024))
+
+
+def address_cache_key(street, city):
+    """Ключ адреса в общем кэше по нормализованным городу и запросу"""
+    request_key = f"street:{normalize_city(city)}:{normalize_address(street)}"
+    return f"street_lookup:{hashlib.md5(request_key.encode()).hexdigest()}"
+
+
+def warm_shared_cache(rows, timeout=86400, batch_size=1000):
+    """
+    Записывает адреса справочника в общий кэш (ключи street_lookup), чтобы первые запросы
+    после прогрева или сброса Redis не обращались к базе. rows — итерируемое из кортежей
+    (город, запрос, отформатированный адрес). Возвращает количество записанных ключей
+    """
+    count = 0
+    batch = {}
+    for city, address, formatted in rows:
+        batch[address_cache_key(address, city)] = formatted
+        if len(batch) >= batch_size:
+            cache.set_many(batch, timeout=timeout)
+            count += len(batch)
+            batch = {}
+    if batch:
+        cache.set_many(batch, timeout=timeout)
+        count += len(batch)
+    return count
+
+
+# Блокировка «один запрос на адрес» живёт не дольше, чем может идти запрос к геокодеру
+# с ожиданием ограничителя частоты; остальные воркеры ждут её не дольше LOOKUP_WAIT_TIMEOUT
+LOOKUP_LOCK_TIMEOUT = 30
+LOOKUP_WAIT_TIMEOUT = 20
+
+
+def _cached_value(cache_key, street, city, source):
+    """Ответ из общего кэша с заполнением кэша процесса или _MISSING"""
+    cached_result = cache.get(cache_key, _MISSING)
+    if cached_result is not _MISSING:
+        if cached_result is not None:
+            _local_cache.set(cache_key, cached_result)
+        logger.info(f"Found address in {source}: '{street}' in '{city}'")
+    return cached_result
+
+
+def _remember(cache_key, street, city, result, timeout):
+    """Кэширует ответ геокодера"""
+    if result is not None:
+        # Положительный результат кэшируем на полное время и сохраняем в справочник.
+        # Отрицательные результаты в память процесса не попадают: у них есть срок жизни
+        _local_cache.set(cache_key, result)
+        cache.set(cache_key, result, timeout=timeout)
+        save_address(street, city, result)
+        logger.info(f"Address successfully cached: {result}")
+    else:
+        # Отрицательный результат кэшируем на меньшее время
+        negative_cache_timeout = timeout // 4  # например, 6 часов вместо 24
+        cache.set(cache_key, result, timeout=negative_cache_timeout)
+        logger.info(f"Non existable address successfully cached: '{street}' in '{city}'")
+
 
 def cached_address_lookup(timeout=86400):
     """
     Декоратор для кэширования результатов поиска адреса.
-    Предотвращает повторные вызовы функции с одними и теми же параметрами
-    в рамках выполнения одного запроса.
+    Уровни: LRU в памяти процесса → общий кэш (Redis) → постоянный справочник адресов
+    в базе → исходная функция (геокодер). Найденный геокодером адрес сохраняется в справочник.
+
+    Промахи по одному адресу объединяются (single-flight): геокодер вызывает только
+    воркер, получивший блокировку в Redis на ключ адреса, остальные ждут её
+    и берут готовый ответ из общего кэша. Если функция выбрасывает
+    GeocoderUnavailable, ответ не кэшируется, а исключение передаётся вызывающему:
+    в отличие от None («адрес не найден»), запрос имеет смысл повторить.
     
     Args:
-        timeout: Время жизни кэша в секундах (по умолчанию 24 часа)
+        timeout: Время жизни записи в общем кэше в секундах (по умолчанию 24 часа)
     
     Returns:
         Декорированная функция с кэшированием
@@ -25,44 +131,57 @@ def cached_address_lookup(timeout=86400):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(street, city=None, *args, **kwargs):
-            # Инициализируем локальный кэш для текущего потока, если его нет
-            if not hasattr(_local_cache, 'results'):
-                _local_cache.results = {}
-                
-            # Формируем ключ для кэша на основе параметров запроса
-            request_key = f"street:{city}:{street}".lower()
-            
-            # Сначала проверяем локальный кэш текущего потока (запроса)
-            if request_key in _local_cache.results:
-                logger.debug(f"Using request-local result for: '{street}' in '{city}'")
-                return _local_cache.results[request_key]
-                
-            # Затем проверяем глобальный кэш
-            cache_key = f"street_lookup:{hashlib.md5(request_key.encode()).hexdigest()}"
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                # Сохраняем результат в локальный кэш текущего потока
-                _local_cache.results[request_key] = cached_result
-                logger.info(f"Found address in cache: '{street}' in '{city}'")
+            cache_key = address_cache_key(street, city)
+
+            # Сначала проверяем кэш в памяти процесса
+            result = _local_cache.get(cache_key, _MISSING)
+            if result is not _MISSING:
+                logger.debug(f"Using in-process result for: '{street}' in '{city}'")
+                return result
+
+            # Затем проверяем общий кэш (в нём хранятся и отрицательные результаты)
+            cached_result = _cached_value(cache_key, street, city, 'cache')
+            if cached_result is not _MISSING:
                 return cached_result
-            
-            # Вызываем оригинальную функцию
-            result = func(street, city, *args, **kwargs)
-            
-            # Сохраняем результат в локальный кэш текущего потока
-            _local_cache.results[request_key] = result
-            
-            # Кэшируем результат
-            if result is not None:
-                # Положительный результат кэшируем на полное время
-                cache.set(cache_key, result, timeout=timeout)
-                logger.info(f"Address successfully cached: {result}")
-            else:
-                # Отрицательный результат кэшируем на меньшее время
-                negative_cache_timeout = timeout // 4  # например, 6 часов вместо 24
-                cache.set(cache_key, result, timeout=negative_cache_timeout)
-                logger.info(f"Non existable address successfully cached: '{street}' in '{city}'")
-                
-            return result
+
+            # Затем постоянный справочник адресов
+            stored_result = lookup_address(street, city)
+            if stored_result is not None:
+                _local_cache.set(cache_key, stored_result)
+                cache.set(cache_key, stored_result, timeout=timeout)
+                logger.info(f"Found address in storage: '{street}' in '{city}'")
+                return stored_result
+
+            lock = cache.lock(f"{cache_key}:lock", timeout=LOOKUP_LOCK_TIMEOUT, blocking_timeout=LOOKUP_WAIT_TIMEOUT)
+            try:
+                acquired = lock.acquire()
+            except RedisError as e:
+                logger.error(f"Address lookup lock is unavailable: {e}")
+                acquired = False
+            if not acquired:
+                logger.warning(f"Address lookup lock wait timed out: '{street}' in '{city}'")
+
+            try:
+                if acquired:
+                    # Пока ждали блокировку, адрес мог найти другой воркер
+                    cached_result = _cached_value(cache_key, street, city, 'cache after waiting')
+                    if cached_result is not _MISSING:
+                        return cached_result
+
+                # Вызываем оригинальную функцию
+                try:
+                    result = func(street, city, *args, **kwargs)
+                except GeocoderUnavailable as e:
+                    logger.warning(f"Geocoder unavailable, result not cached: '{street}' in '{city}': {e}")
+                    raise
+
+                _remember(cache_key, street, city, result, timeout)
+                return result
+            finally:
+                if acquired:
+                    try:
+                        lock.release()
+                    except (LockError, RedisError) as e:
+                        logger.warning(f"Address lookup lock was not released: {e}")
         return wrapper
     return decorator
@@ -0,0 +1,199 @@
+import logging
+import os
+import threading
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limit import TokenBucket
+from .local_index import LocalAddressIndex, format_address
+
+logger = logging.getLogger(__name__)
+
+
+class GeocoderUnavailable(Exception):
+    """
+    Геокодер временно не может ответить (сеть, 429/5xx, исчерпан лимит запросов).
+    В отличие от «адрес не найден», такой результат не кэшируется.
+    """
+
+
+class Geocoder:
+    """
+    Интерфейс геокодера: приводит введённый пользователем адрес к формату «улица, д. N».
+    geocode возвращает None, если адрес не найден, и выбрасывает GeocoderUnavailable,
+    если геокодер не смог ответить.
+    """
+
+    def geocode(self, address: str, city: str = None) -> str | None:
+        raise NotImplementedError
+
+
+class LocalGeocoder(Geocoder):
+    """
+    Офлайн-геокодер по локальному индексу адресов (manage.py build_address_index).
+    Индекс отображается в память и открывается заново, когда файл индекса заменён.
+    Если файла индекса нет, геокодер ничего не находит и запрос уходит следующему.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path or settings.ADDRESS_LOCAL_INDEX_PATH
+        # (inode, время изменения, размер) файла и открытый по нему индекс
+        self._current = None
+        self._lock = threading.Lock()
+
+    def get_index(self):
+        """
+        Индекс по текущему файлу. При каждом обращении файл сверяется по inode, времени
+        изменения и размеру: build_address_index заменяет файл целиком, и после пересборки
+        индекс открывается заново без перезапуска воркеров. Прежний индекс явно не закрывается —
+        его ещё могут читать другие потоки; отображение освобождается вместе с объектом
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        current = self._current
+        if current is None or current[0] != signature:
+            with self._lock:
+                current = self._current
+                if current is None or current[0] != signature:
+                    current = (signature, LocalAddressIndex(self.index_path))
+                    self._current = current
+                    logger.info(f"Loaded local address index {self.index_path}: {len(current[1])} addresses")
+        return current[1]
+
+    def geocode(self, address, city=None):
+        index = self.get_index()
+        if index is None:
+            return None
+        result = index.get(address, city)
+        if result is not None:
+            logger.debug(f"Address found in local index: {result}")
+        return result
+
+
+class NominatimGeocoder(Geocoder):
+    """
+    Геокодер на основе API Nominatim (OpenStreetMap).
+
+    Запросы идут через общий для процесса requests.Session с пулом keep-alive соединений.
+    Перед каждым запросом берётся токен из общего для кластера ограничителя
+    (NOMINATIM_RATE_LIMIT запросов в секунду, политика Nominatim — не чаще 1 в секунду).
+    """
+
+    url = 'https://nominatim.openstreetmap.org/search'
+    timeout = (3, 10)  # подключение, чтение
+    # Сколько секунд запрос готов ждать своей очереди у ограничителя
+    max_rate_limit_wait = 5
+    pool_size = 10
+    headers = {
+        'User-Agent': 'Armada (contact@example.com)'
+    }
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.rate_limiter = TokenBucket('nominatim', rate=getattr(settings, 'NOMINATIM_RATE_LIMIT', 1.0))
+
+    def geocode(self, address, city=None):
+        logger.debug(f"Trying to find address using API: '{address}' in '{city}'")
+
+        if not self.rate_limiter.acquire(self.max_rate_limit_wait):
+            raise GeocoderUnavailable("Nominatim rate limit exceeded")
+
+        params = {
+            'format': 'json',
+            'city': city,
+            'street': address,
+            'addressdetails': 1,
+            'countrycodes': 'ru',
+            'limit': 5,
+            'accept-language': 'ru'
+        }
+
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            # Проверяем успешность запроса
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise GeocoderUnavailable(f"Nominatim request failed: {e}") from e
+
+        # Получаем данные из ответа
+        data = response.json()
+
+        # Проверяем, что в ответе есть данные
+        if not data:
+            logger.error(f"No results found for '{address}' in '{city}'")
+            return None
+
+        logger.debug(f"API response: {data}")
+
+        # Получаем адрес из первого результата
+        found = data[0].get('address')
+        if not found:
+            return None
+
+        road = found.get('road')
+        house_number = found.get('house_number')
+
+        if road is None or house_number is None:
+            return None
+
+        return format_address(road, house_number)
+
+
+class GeocoderChain(Geocoder):
+    """
+    Опрашивает геокодеры по порядку и возвращает первый найденный адрес.
+    Если адрес никто не нашёл, а хотя бы один геокодер был недоступен,
+    выбрасывается GeocoderUnavailable: ответ «не найден» был бы недостоверным.
+    """
+
+    def __init__(self, geocoders):
+        self.geocoders = list(geocoders)
+
+    def geocode(self, address, city=None):
+        unavailable = None
+        for geocoder in self.geocoders:
+            try:
+                result = geocoder.geocode(address, city)
+            except Exception as e:
+                logger.error(f"Geocoder {type(geocoder).__name__} failed: {e}")
+                unavailable = e
+                continue
+            if result:
+                return result
+        if unavailable is not None:
+            raise GeocoderUnavailable(str(unavailable)) from unavailable
+        return None
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Цепочка геокодеров из настройки ADDRESS_GEOCODERS (создаётся один раз на процесс)"""
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = GeocoderChain(import_string(path)() for path in settings.ADDRESS_GEOCODERS)
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    """Пересоздаёт цепочку геокодеров при изменении настроек (override_settings в тестах)"""
+    global _geocoder
+    if setting in ('ADDRESS_GEOCODERS', 'ADDRESS_LOCAL_INDEX_PATH', 'NOMINATIM_RATE_LIMIT'):
+        _geocoder = None
@@ -0,0 +1,101 @@
+import mmap
+import struct
+
+from .normalize import normalize_address, normalize_city
+
+# Формат файла индекса:
+#   заголовок: сигнатура (8 байт) и количество записей (uint32, little-endian);
+#   таблица смещений: по uint32 на запись, смещение записи от начала области данных;
+#   область данных: записи «ключ\0адрес\0» в UTF-8, отсортированные по байтам ключа.
+# Ключ записи — «город\tзапрос» из нормализованных города и адреса (см. normalize.py),
+# поэтому «ул. Светланская, 10» и «Светланская улица, д. 10» попадают в одну запись.
+MAGIC = b'TADDRIX1'
+HEADER = struct.Struct('<8sI')
+OFFSET = struct.Struct('<I')
+KEY_SEPARATOR = '\t'
+
+
+def index_key(city, address):
+    """Ключ записи индекса по городу и адресу в любом из поддерживаемых написаний"""
+    return f"{normalize_city(city)}{KEY_SEPARATOR}{normalize_address(address)}".encode()
+
+
+def format_address(road, house_number):
+    """Адрес в формате, в котором он хранится в бронированиях"""
+    return f"{road}, д. {house_number}"
+
+
+def build_index(path, rows):
+    """
+    Записывает индекс адресов в файл.
+    rows — итерируемое из кортежей (город, улица, номер дома). Повторяющиеся адреса
+    сохраняются один раз (остаётся первое написание). Возвращает количество записей.
+    """
+    records = {}
+    for city, street, house_number in rows:
+        street, house_number = street.strip(), str(house_number).strip()
+        if normalize_city(city) and normalize_address(street) and house_number:
+            key = index_key(city, f"{street} {house_number}")
+            records.setdefault(key, format_address(street, house_number).encode())
+
+    offsets = []
+    data = bytearray()
+    for key in sorted(records):
+        offsets.append(len(data))
+        data += key + b'\0' + records[key] + b'\0'
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(offsets)))
+        for offset in offsets:
+            file.write(OFFSET.pack(offset))
+        file.write(data)
+    return len(offsets)
+
+
+class LocalAddressIndex:
+    """
+    Индекс адресов, отображённый в память (mmap).
+
+    Файл не читается целиком: поиск — двоичный поиск по таблице смещений,
+    страницы файла подгружает операционная система, и они разделяются между
+    процессами-воркерами. Поиск занимает единицы микросекунд.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"Address index {path} is truncated")
+        magic, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"File {path} is not an address index")
+        self._data_start = HEADER.size + OFFSET.size * self.count
+
+    def __len__(self):
+        return self.count
+
+    def _record_start(self, position):
+        return self._data_start + OFFSET.unpack_from(self._mmap, HEADER.size + OFFSET.size * position)[0]
+
+    def _key_at(self, position):
+        start = self._record_start(position)
+        return self._mmap[start:self._mmap.find(b'\0', start)]
+
+    def get(self, address, city):
+        """Возвращает адрес в формате «улица, д. N» или None"""
+        key = index_key(city, address)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._key_at(low) != key:
+            return None
+        value_start = self._record_start(low) + len(key) + 1
+        return self._mmap[value_start:self._mmap.find(b'\0', value_start)].decode()
+
+    def close(self):
+        self._mmap.close()
@@ -0,0 +1,29 @@
+import re
+
+# Слова, обозначающие тип улицы или дома. Пользователи пишут их по-разному
+# («ул. Светланская 10», «улица Светланская, 10», «Светланская улица, д. 10»),
+# поэтому в ключе адреса они не учитываются
+_SKIPPED_WORDS = {
+    'ул', 'улица', 'пр', 'пр-т', 'просп', 'проспект', 'пер', 'переулок',
+    'б-р', 'бульвар', 'ш', 'шоссе', 'пл', 'площадь', 'наб', 'набережная',
+    'д', 'дом', 'г', 'город',
+}
+_PUNCTUATION = re.compile(r'[.,;:"«»()/\\]+')
+
+
+def normalize_city(city):
+    """Нормализованное название города: нижний регистр, ё → е, без лишних пробелов"""
+    if not city:
+        return ''
+    return ' '.join(city.lower().replace('ё', 'е').split())
+
+
+def normalize_address(address):
+    """
+    Нормализованный ключ адреса: нижний регистр, ё → е, без знаков препинания
+    и слов-обозначений типа улицы/дома. «ул. Светланская, д. 10» → «светланская 10»
+    """
+    if not address:
+        return ''
+    address = _PUNCTUATION.sub(' ', address.lower().replace('ё', 'е'))
+    return ' '.join(word for word in address.split() if word not in _SKIPPED_WORDS)
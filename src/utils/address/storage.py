@@ -0,0 +1,88 @@
+import logging
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import DatabaseError, transaction
+
+from .normalize import normalize_address, normalize_city
+from .suggest import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Минимальное сходство (доля общих триграмм) для нечёткого совпадения с адресом справочника
+FUZZY_LOOKUP_THRESHOLD = 0.7
+FUZZY_LOOKUP_CANDIDATES = 5
+
+
+def _address_model():
+    # Импорт внутри функции: utils.address импортируется моделями приложений при их загрузке
+    from apps.utils.models import Address
+    return Address
+
+
+def _house_numbers(query):
+    """Слова с цифрами (номера домов, «100-летия» и т. п.) — при нечётком поиске они должны совпадать"""
+    return [word for word in query.split() if any(char.isdigit() for char in word)]
+
+
+def lookup_address(address, city):
+    """
+    Ищет проверенный адрес в постоянном справочнике. Возвращает адрес или None.
+    Если точного ключа нет, ищет ключ с опечаткой в названии улицы (триграммный индекс pg_trgm),
+    номер дома при этом должен совпадать
+    """
+    query = normalize_address(address)
+    if not query:
+        return None
+    addresses = _address_model().objects.filter(city=normalize_city(city))
+    try:
+        # Ошибка запроса внутри транзакции вызывающего не должна её прерывать
+        with transaction.atomic():
+            formatted = addresses.filter(query=query).values_list('formatted', flat=True).first()
+            if formatted is not None:
+                return formatted
+            candidates = (
+                addresses.filter(query__trigram_similar=query)
+                .annotate(similarity=TrigramSimilarity('query', query))
+                .filter(similarity__gte=FUZZY_LOOKUP_THRESHOLD)
+                .order_by('-similarity', 'query')
+                .values_list('query', 'formatted')[:FUZZY_LOOKUP_CANDIDATES]
+            )
+            house_numbers = _house_numbers(query)
+            for candidate, formatted in candidates:
+                if _house_numbers(candidate) == house_numbers:
+                    return formatted
+            return None
+    except DatabaseError as e:
+        logger.error(f"Error while looking up address in storage: {e}")
+        return None
+
+
+def save_address(address, city, formatted, source='geocoder'):
+    """
+    Сохраняет проверенный адрес в справочник под ключом исходного запроса
+    и под ключом самого отформатированного адреса (для повторной проверки уже сохранённых адресов)
+    """
+    return bulk_save_addresses([(city, address, formatted), (city, formatted, formatted)], source=source)
+
+
+def bulk_save_addresses(rows, source, batch_size=1000):
+    """
+    Массово сохраняет адреса в справочник.
+    rows — итерируемое из кортежей (город, запрос, отформатированный адрес).
+    Уже существующие ключи не перезаписываются. Возвращает количество обработанных строк.
+    """
+    Address = _address_model()
+    objects = {}
+    for city, address, formatted in rows:
+        key = (normalize_city(city), normalize_address(address))
+        if key[0] and key[1] and formatted:
+            objects.setdefault(key, Address(city=key[0], query=key[1], formatted=formatted, source=source))
+    try:
+        with transaction.atomic():
+            Address.objects.bulk_create(objects.values(), batch_size=batch_size, ignore_conflicts=True)
+    except DatabaseError as e:
+        logger.error(f"Error while saving addresses to storage: {e}")
+        return 0
+    # Новые адреса должны попасть в подсказки
+    bump_versions({city for city, _ in objects})
+    return len(objects)
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .normalize import normalize_address, normalize_city
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'address_suggest_version:{}'
+RESULT_KEY = 'address_suggest:{}:{}'
+# Время жизни подсказок в общем кэше
+RESULT_CACHE_TIMEOUT = 300
+# Индекс города пересобирается после изменения справочника не чаще одного раза за этот интервал
+INDEX_REFRESH_INTERVAL = 60
+# Минимальная доля общих триграмм для нечёткого совпадения
+TRIGRAM_THRESHOLD = 0.3
+
+
+def trigrams(text):
+    """Триграммы строки с дополнением пробелами по краям слов (как в pg_trgm)"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class SuggestIndex:
+    """
+    Индекс подсказок адресов одного города в памяти процесса.
+
+    Сначала возвращаются адреса, нормализованный ключ которых начинается с запроса
+    (двоичный поиск по отсортированным ключам), затем — нечёткие совпадения
+    по доле общих триграмм, что находит адреса с опечатками и пропущенными буквами.
+    """
+
+    def __init__(self, addresses):
+        entries = {}
+        for formatted in addresses:
+            key = normalize_address(formatted)
+            if key:
+                entries.setdefault(key, formatted)
+        self.keys = sorted(entries)
+        self.addresses = [entries[key] for key in self.keys]
+        self.key_trigrams = [trigrams(key) for key in self.keys]
+        self.postings = defaultdict(list)
+        for position, key_trigrams in enumerate(self.key_trigrams):
+            for trigram in key_trigrams:
+                self.postings[trigram].append(position)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query, limit=10):
+        query = normalize_address(query)
+        if not query:
+            return []
+
+        found = []
+        position = bisect_left(self.keys, query)
+        while position < len(self.keys) and len(found) < limit and self.keys[position].startswith(query):
+            found.append(position)
+            position += 1
+
+        if len(found) < limit:
+            found.extend(self.fuzzy_search(query, set(found), limit - len(found)))
+
+        return [self.addresses[position] for position in found]
+
+    def fuzzy_search(self, query, excluded, limit):
+        """
+        Позиции ключей, похожих на запрос по доле общих триграмм.
+        Кандидаты отбираются по триграммам слов без цифр: триграммы номеров домов
+        есть у слишком многих адресов и только замедляют отбор
+        """
+        query_trigrams = trigrams(query)
+        street_words = ' '.join(word for word in query.split() if not any(char.isdigit() for char in word))
+        candidates = set()
+        for trigram in trigrams(street_words):
+            candidates.update(self.postings.get(trigram, ()))
+
+        scored = []
+        for candidate in candidates:
+            if candidate in excluded:
+                continue
+            key_trigrams = self.key_trigrams[candidate]
+            common = len(query_trigrams & key_trigrams)
+            similarity = common / (len(query_trigrams) + len(key_trigrams) - common)
+            if similarity >= TRIGRAM_THRESHOLD:
+                scored.append((-similarity, self.keys[candidate], candidate))
+        scored.sort()
+        return [candidate for _, _, candidate in scored[:limit]]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _address_model():
+    # Импорт внутри функции: utils.address импортируется моделями приложений при их загрузке
+    from apps.utils.models import Address
+    return Address
+
+
+def get_version(city):
+    """Версия справочника адресов города, меняется при добавлении адресов"""
+    key = VERSION_KEY.format(normalize_city(city))
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(cities):
+    """Отмечает, что справочник адресов городов изменился"""
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY.format(normalize_city(city)): version for city in cities}, timeout=None)
+
+
+def get_index(city, version):
+    """
+    Индекс подсказок города и версия справочника, по которой он построен. Строится из постоянного
+    справочника проверенных адресов (туда же записывается каждый адрес, найденный геокодером
+    и закэшированный как street_lookup). В течение INDEX_REFRESH_INTERVAL после построения
+    возвращается прежний индекс, даже если версия уже изменилась
+    """
+    city = normalize_city(city)
+    current = _indexes.get(city)
+    if current is not None:
+        index, index_version, built_at = current
+        if index_version == version or time.monotonic() - built_at < INDEX_REFRESH_INTERVAL:
+            return index, index_version
+
+    with _indexes_lock:
+        current = _indexes.get(city)
+        if current is not None and current[1] == version:
+            return current[0], current[1]
+        addresses = _address_model().objects.filter(city=city).values_list('formatted', flat=True).distinct()
+        index = SuggestIndex(addresses.iterator())
+        _indexes[city] = (index, version, time.monotonic())
+        logger.info(f"Built address suggest index for '{city}': {len(index)} addresses")
+        return index, version
+
+
+def suggest_addresses(city, query, limit=10):
+    """Подсказки адресов города по началу или части введённой строки (с кэшем результатов)"""
+    normalized_query = normalize_address(query)
+    if not normalized_query or not normalize_city(city):
+        return []
+
+    version = get_version(city)
+    digest = hashlib.md5(f"{normalize_city(city)}|{normalized_query}|{limit}".encode()).hexdigest()
+    result_key = RESULT_KEY.format(version, digest)
+    results = cache.get(result_key)
+    if results is None:
+        index, index_version = get_index(city, version)
+        results = index.search(normalized_query, limit)
+        # Ответ устаревшего индекса не кэшируется под новой версией: иначе новые адреса
+        # не появились бы в подсказках и после перестроения индекса
+        if index_version == version:
+            cache.set(result_key, results, timeout=RESULT_CACHE_TIMEOUT)
+    return results
+
+
+def clear_indexes():
+    """Сбрасывает индексы подсказок в памяти процесса"""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,183 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+
+from apps.utils.models import Address
+from utils.address import GeocoderUnavailable, find_address_by_name
+from utils.address.cache_utils import LRUCache, _local_cache, address_cache_key
+from utils.address.normalize import normalize_address
+from utils.address.storage import bulk_save_addresses, lookup_address
+from utils.rate_limit import TokenBucket
+
+
+def nominatim_response(road, house_number):
+    response = MagicMock()
+    response.json.return_value = [{'address': {'road': road, 'house_number': house_number}}]
+    return response
+
+
+@override_settings(NOMINATIM_RATE_LIMIT=1000)
+class AddressCacheTest(TestCase):
+    """Тесты многоуровневого кэша адресов и постоянного справочника"""
+
+    def setUp(self):
+        cache.clear()
+        _local_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(_local_cache.clear)
+
+    def test_normalize_address(self):
+        """Разные записи одного адреса дают один ключ"""
+        expected = 'светланская 10'
+        for address in ('Светланская 10', 'ул. Светланская, 10', 'улица Светланская 10', 'Светланская улица, д. 10'):
+            with self.subTest(address=address):
+                self.assertEqual(normalize_address(address), expected)
+
+    @patch('utils.address.geocoders.requests.Session.get')
+    def test_found_address_is_stored_permanently(self, mock_get):
+        """Найденный геокодером адрес сохраняется в справочник и больше не запрашивается"""
+        mock_get.return_value = nominatim_response('Светланская улица', '10')
+
+        self.assertEqual(find_address_by_name('ул. Светланская 10', 'Владивосток'), 'Светланская улица, д. 10')
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertTrue(Address.objects.filter(city='владивосток', query='светланская 10').exists())
+
+        # Общий кэш и память процесса очищены (например, после перезапуска) — ответ берётся из справочника
+        cache.clear()
+        _local_cache.clear()
+        self.assertEqual(find_address_by_name('Светланская, 10', 'Владивосток'), 'Светланская улица, д. 10')
+        # Повторная проверка уже отформатированного адреса (как в Booking.clean) тоже без сети
+        self.assertEqual(
+            find_address_by_name('Светланская улица, д. 10', 'Владивосток'), 'Светланская улица, д. 10'
+        )
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('utils.address.geocoders.requests.Session.get')
+    def test_negative_result_is_cached(self, mock_get):
+        """Отрицательный результат берётся из общего кэша, а не запрашивается повторно"""
+        mock_get.return_value = MagicMock(json=MagicMock(return_value=[]))
+
+        self.assertIsNone(find_address_by_name('Несуществующая 1', 'Владивосток'))
+        self.assertIsNone(find_address_by_name('Несуществующая 1', 'Владивосток'))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(Address.objects.exists())
+
+    def test_lru_cache_is_bounded(self):
+        """Кэш в памяти процесса вытесняет давно не использованные записи"""
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+
+    @patch('utils.address.geocoders.requests.Session.get')
+    def test_warm_address_cache_from_street_list(self, mock_get):
+        """Команда прогрева загружает офлайн-список улиц, после чего сеть не нужна"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as file:
+            file.write('city,street,house_number\n')
+            file.write('Владивосток,Океанский проспект,10\n')
+            file.write('Уссурийск,улица Ленина,5\n')
+        self.addCleanup(os.remove, file.name)
+
+        out = StringIO()
+        call_command('warm_address_cache', '--streets', file.name, stdout=out)
+
+        self.assertIn('Адресов из списка улиц: 2', out.getvalue())
+        self.assertEqual(
+            cache.get(address_cache_key('Океанский пр-т 10', 'Владивосток')), 'Океанский проспект, д. 10'
+        )
+        self.assertEqual(find_address_by_name('Океанский пр-т 10', 'Владивосток'), 'Океанский проспект, д. 10')
+        self.assertEqual(find_address_by_name('Ленина 5', 'Уссурийск'), 'улица Ленина, д. 5')
+        mock_get.assert_not_called()
+
+    def test_storage_lookup_tolerates_typos_but_not_other_houses(self):
+        """Адрес с опечаткой в улице находится в справочнике, а адрес с другим номером дома — нет"""
+        bulk_save_addresses([
+            ('Владивосток', 'Светланская улица 10', 'Светланская улица, д. 10'),
+            ('Владивосток', 'проспект 100-летия Владивостока 12', 'проспект 100-летия Владивостока, д. 12'),
+        ], source='street_list')
+
+        self.assertEqual(lookup_address('Светланска 10', 'Владивосток'), 'Светланская улица, д. 10')
+        self.assertEqual(
+            lookup_address('100-летия Владивостка 12', 'Владивосток'), 'проспект 100-летия Владивостока, д. 12'
+        )
+        self.assertIsNone(lookup_address('Светланская 12', 'Владивосток'))
+        self.assertIsNone(lookup_address('Светлая 10', 'Владивосток'))
+        self.assertIsNone(lookup_address('Светланская 10', 'Уссурийск'))
+
+    def test_storage_errors_do_not_break_callers_transaction(self):
+        """Ошибка запроса к справочнику откатывается до точки сохранения, транзакция вызывающего продолжается"""
+        def failing_query(execute, sql, params, many, context):
+            if Address._meta.db_table in sql:
+                sql, params = 'SELECT 1 / 0', ()
+            return execute(sql, params, many, context)
+
+        with transaction.atomic():
+            with connection.execute_wrapper(failing_query):
+                self.assertIsNone(lookup_address('Светланская 10', 'Владивосток'))
+                self.assertEqual(
+                    bulk_save_addresses([('Владивосток', 'Светланская 10', 'Светланская, д. 10')], 'booking'), 0
+                )
+            self.assertFalse(Address.objects.exists())
+
+    @patch('utils.address.cache_utils.save_address')
+    @patch('utils.address.cache_utils.lookup_address', return_value=None)
+    @patch('utils.address.geocoders.requests.Session.get')
+    def test_concurrent_misses_call_geocoder_once(self, mock_get, mock_lookup, mock_save):
+        """Одновременные промахи по одному адресу вызывают геокодер один раз, остальные ждут ответ"""
+        calls = []
+        calls_lock = threading.Lock()
+
+        def slow_response(*args, **kwargs):
+            with calls_lock:
+                calls.append(kwargs['params']['street'])
+            time.sleep(0.3)
+            return nominatim_response('Светланская улица', '10')
+
+        mock_get.side_effect = slow_response
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: find_address_by_name('ул. Светланская 10', 'Владивосток'), range(8)
+            ))
+
+        self.assertEqual(results, ['Светланская улица, д. 10'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    @patch('utils.address.geocoders.requests.Session.get')
+    def test_unavailable_geocoder_result_is_not_cached(self, mock_get):
+        """Ошибка сети не кэшируется как «адрес не найден» и передаётся вызывающему"""
+        mock_get.side_effect = requests.ConnectionError('timeout')
+
+        with self.assertRaises(GeocoderUnavailable):
+            find_address_by_name('Светланская 10', 'Владивосток')
+        self.assertIsNone(cache.get(address_cache_key('Светланская 10', 'Владивосток')))
+
+        mock_get.side_effect = None
+        mock_get.return_value = nominatim_response('Светланская улица', '10')
+        self.assertEqual(find_address_by_name('Светланская 10', 'Владивосток'), 'Светланская улица, д. 10')
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_token_bucket_limits_request_rate(self):
+        """Ограничитель выдаёт не больше capacity токенов сразу, затем по rate в секунду"""
+        bucket = TokenBucket(f'test_{time.time_ns()}', rate=1, capacity=2)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        wait = bucket.try_acquire()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 1)
+        self.assertFalse(bucket.acquire(max_wait=0))
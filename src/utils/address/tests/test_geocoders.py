@@ -0,0 +1,117 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from utils.address import find_address_by_name
+from utils.address.cache_utils import _local_cache
+from utils.address.geocoders import Geocoder, GeocoderChain, LocalGeocoder
+from utils.address.local_index import LocalAddressIndex, build_index
+
+
+class StandInGeocoder(Geocoder):
+    """Локальная замена сетевого геокодера для тестов"""
+
+    calls = []
+
+    def geocode(self, address, city=None):
+        self.calls.append((address, city))
+        return 'Запасная улица, д. 1' if address.startswith('Запасная') else None
+
+
+class LocalGeocoderTest(TestCase):
+    """Тесты офлайн-геокодера на локальном индексе адресов"""
+
+    rows = [
+        ('Владивосток', 'Светланская улица', '10'),
+        ('Владивосток', 'Океанский проспект', '10'),
+        ('Владивосток', 'Светланская улица', '10а'),
+        ('Уссурийск', 'улица Ленина', '5'),
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index_path = os.path.join(directory.name, 'address_index.bin')
+        build_index(self.index_path, self.rows)
+
+        cache.clear()
+        _local_cache.clear()
+        StandInGeocoder.calls = []
+        self.addCleanup(cache.clear)
+        self.addCleanup(_local_cache.clear)
+
+    def test_lookup_in_different_formats(self):
+        """Разные написания адреса находят одну запись в формате «улица, д. N»"""
+        index = LocalAddressIndex(self.index_path)
+        self.addCleanup(index.close)
+
+        self.assertEqual(len(index), 4)
+        for address in ('Светланская 10', 'ул. Светланская, 10', 'Светланская улица, д. 10'):
+            with self.subTest(address=address):
+                self.assertEqual(index.get(address, 'Владивосток'), 'Светланская улица, д. 10')
+        self.assertEqual(index.get('Светланская 10а', 'Владивосток'), 'Светланская улица, д. 10а')
+        self.assertEqual(index.get('Океанский пр-т 10', 'владивосток'), 'Океанский проспект, д. 10')
+        self.assertIsNone(index.get('Светланская 11', 'Владивосток'))
+        self.assertIsNone(index.get('Ленина 5', 'Владивосток'))
+
+    def test_missing_index_finds_nothing(self):
+        """Без файла индекса локальный геокодер ничего не находит"""
+        geocoder = LocalGeocoder(os.path.join(os.path.dirname(self.index_path), 'missing.bin'))
+        self.assertIsNone(geocoder.geocode('Светланская 10', 'Владивосток'))
+
+    def test_rebuilt_index_is_reloaded(self):
+        """После замены файла индекса геокодер открывает новый индекс, без замены — прежний"""
+        geocoder = LocalGeocoder(self.index_path)
+        self.assertIsNone(geocoder.geocode('Кирова 15', 'Артем'))
+        index = geocoder.get_index()
+        self.assertIs(geocoder.get_index(), index)
+
+        # Как в build_address_index: новый файл пишется рядом и атомарно заменяет прежний
+        temporary = f'{self.index_path}.tmp'
+        build_index(temporary, self.rows + [('Артем', 'улица Кирова', '15')])
+        os.replace(temporary, self.index_path)
+
+        self.assertEqual(geocoder.geocode('Кирова 15', 'Артем'), 'улица Кирова, д. 15')
+        self.assertIsNot(geocoder.get_index(), index)
+        self.assertEqual(len(index), 4)
+
+        os.remove(self.index_path)
+        self.assertIsNone(geocoder.geocode('Кирова 15', 'Артем'))
+
+    def test_chain_falls_back_to_next_geocoder(self):
+        """Адрес, которого нет в локальном индексе, ищется следующим геокодером"""
+        chain = GeocoderChain([LocalGeocoder(self.index_path), StandInGeocoder()])
+
+        self.assertEqual(chain.geocode('Ленина 5', 'Уссурийск'), 'улица Ленина, д. 5')
+        self.assertEqual(StandInGeocoder.calls, [])
+        self.assertEqual(chain.geocode('Запасная 1', 'Уссурийск'), 'Запасная улица, д. 1')
+        self.assertEqual(StandInGeocoder.calls, [('Запасная 1', 'Уссурийск')])
+
+    @patch('utils.address.geocoders.requests.get')
+    def test_find_address_by_name_uses_configured_geocoders(self, mock_get):
+        """find_address_by_name опрашивает геокодеры из настроек и не обращается к сети"""
+        geocoders = ['utils.address.geocoders.LocalGeocoder', 'utils.address.tests.test_geocoders.StandInGeocoder']
+        with override_settings(ADDRESS_GEOCODERS=geocoders, ADDRESS_LOCAL_INDEX_PATH=self.index_path):
+            self.assertEqual(find_address_by_name('Светланская 10', 'Владивосток'), 'Светланская улица, д. 10')
+            self.assertEqual(find_address_by_name('Запасная 1', 'Владивосток'), 'Запасная улица, д. 1')
+            self.assertIsNone(find_address_by_name('Несуществующая 1', 'Владивосток'))
+        mock_get.assert_not_called()
+
+    def test_build_address_index_command(self):
+        """Команда строит индекс из CSV-файла"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as file:
+            file.write('city,street,house_number\n')
+            file.write('Артем,улица Кирова,15\n')
+            file.write('Артем,улица Кирова,\n')
+        self.addCleanup(os.remove, file.name)
+
+        out = StringIO()
+        call_command('build_address_index', file.name, '--output', self.index_path, stdout=out)
+
+        self.assertIn('Адресов в индексе: 1', out.getvalue())
+        self.assertEqual(LocalGeocoder(self.index_path).geocode('Кирова 15', 'Артем'), 'улица Кирова, д. 15')
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.auth.models import User
+from utils.address.storage import bulk_save_addresses
+from utils.address.suggest import SuggestIndex, clear_indexes
+
+
+class AddressSuggestTest(APITestCase):
+    """Тесты подсказок адресов по справочнику проверенных адресов"""
+
+    addresses = [
+        'Светланская улица, д. 10',
+        'Светланская улица, д. 12',
+        'Семёновская улица, д. 5',
+        'Океанский проспект, д. 10',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        clear_indexes()
+        self.addCleanup(cache.clear)
+        self.addCleanup(clear_indexes)
+        bulk_save_addresses([('Владивосток', address, address) for address in self.addresses], source='booking')
+        bulk_save_addresses([('Уссурийск', 'улица Ленина, д. 5', 'улица Ленина, д. 5')], source='booking')
+
+        self.url = reverse('address_suggest')
+        self.client.force_authenticate(user=User.objects.create_user('+79111111114', 'userpass'))
+
+    def test_prefix_and_fuzzy_matches(self):
+        """Сначала адреса, начинающиеся с запроса, затем похожие по триграммам"""
+        index = SuggestIndex(self.addresses)
+
+        self.assertEqual(index.search('ул. Светл'), ['Светланская улица, д. 10', 'Светланская улица, д. 12'])
+        self.assertEqual(index.search('Океанский пр-т 10'), ['Океанский проспект, д. 10'])
+        # Опечатка: префикса нет, но адрес находится по общим триграммам
+        self.assertEqual(index.search('Светлнская 12', limit=1), ['Светланская улица, д. 12'])
+        self.assertEqual(index.search('Неизвестная'), [])
+
+    def test_suggest_endpoint(self):
+        """Эндпоинт возвращает подсказки только для указанного города"""
+        response = self.client.get(self.url, {'city': 'Владивосток', 'q': 'Светланская 1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][:2], ['Светланская улица, д. 10', 'Светланская улица, д. 12'])
+
+        response = self.client.get(self.url, {'city': 'Уссурийск', 'q': 'Лен'})
+        self.assertEqual(response.data['results'], ['улица Ленина, д. 5'])
+
+    def test_results_are_cached(self):
+        """Повторный запрос обслуживается из кэша без обращения к базе"""
+        params = {'city': 'Владивосток', 'q': 'Оке'}
+        self.client.get(self.url, params)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['results'], ['Океанский проспект, д. 10'])
+
+    @patch('utils.address.suggest.INDEX_REFRESH_INTERVAL', 0)
+    def test_new_addresses_appear_in_suggestions(self):
+        """Адрес, добавленный в справочник, попадает в подсказки"""
+        params = {'city': 'Владивосток', 'q': 'Алеутская'}
+        self.assertEqual(self.client.get(self.url, params).data['results'], [])
+
+        bulk_save_addresses([('Владивосток', 'Алеутская улица, д. 1', 'Алеутская улица, д. 1')], source='geocoder')
+
+        self.assertEqual(self.client.get(self.url, params).data['results'], ['Алеутская улица, д. 1'])
+
+    def test_stale_index_results_are_not_cached(self):
+        """Ответ индекса, построенного до добавления адреса, не кэшируется под новой версией справочника"""
+        params = {'city': 'Владивосток', 'q': 'Алеутская'}
+        self.assertEqual(self.client.get(self.url, params).data['results'], [])
+
+        bulk_save_addresses([('Владивосток', 'Алеутская улица, д. 1', 'Алеутская улица, д. 1')], source='geocoder')
+        # Индекс построен только что и ещё не перестраивается
+        self.assertEqual(self.client.get(self.url, params).data['results'], [])
+
+        with patch('utils.address.suggest.INDEX_REFRESH_INTERVAL', 0):
+            self.assertEqual(self.client.get(self.url, params).data['results'], ['Алеутская улица, д. 1'])
+
+    def test_invalid_parameters(self):
+        """Без города или запроса возвращается ошибка, без аутентификации — отказ"""
+        self.assertEqual(self.client.get(self.url, {'q': 'Светл'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(self.url, {'city': 'Владивосток', 'q': 'Св', 'limit': 'x'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(
+            self.client.get(self.url, {'city': 'Владивосток', 'q': 'Светл'}).status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
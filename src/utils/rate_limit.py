@@ -0,0 +1,73 @@
+import logging
+import time
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Пополнение и списание токенов выполняются в Redis одним скриптом, поэтому ведро
+# общее для всех процессов и серверов. Время берётся из Redis (TIME), чтобы
+# расхождение часов серверов не влияло на скорость пополнения.
+# Возвращает 0, если токен получен, иначе — сколько секунд ждать следующего токена.
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов «ведро токенов», общий для всего кластера.
+
+    rate — сколько токенов добавляется в секунду, capacity — размер ведра (допустимый всплеск).
+    При недоступности Redis ограничение не применяется: внешний вызов важнее лимита.
+    """
+
+    def __init__(self, name, rate, capacity=1, alias='default'):
+        self.key = f"rate_limit:{name}"
+        self.rate = rate
+        self.capacity = capacity
+        self.alias = alias
+        self._script = None
+
+    def try_acquire(self):
+        """Пытается взять токен. Возвращает 0 при успехе или время ожидания следующего токена в секундах"""
+        try:
+            if self._script is None:
+                self._script = get_redis_connection(self.alias).register_script(TOKEN_BUCKET_SCRIPT)
+            return float(self._script(keys=[self.key], args=[self.rate, self.capacity]))
+        except RedisError as e:
+            logger.error(f"Rate limiter {self.key} is unavailable: {e}")
+            return 0
+
+    def acquire(self, max_wait):
+        """
+        Ждёт токен не дольше max_wait секунд.
+        Возвращает True, если токен получен, и False, если ожидание превысило бы max_wait.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                logger.warning(f"Rate limit {self.key} exceeded, gave up waiting")
+                return False
+            time.sleep(wait)
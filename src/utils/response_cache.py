@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Варианты ключа кэша по пользователю
+VARY_PUBLIC = 'public'  # ответ одинаков для всех, кто прошёл проверку прав
+VARY_USER = 'user'      # ответ зависит от пользователя
+
+STATS_KEY = 'response_cache_stats:{}:{}'
+
+
+def _normalized_query(request):
+    """Параметры запроса в каноническом порядке, чтобы ?a=1&b=2 и ?b=2&a=1 давали один ключ"""
+    return sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+
+
+def build_cache_key(name, prefix, request, vary):
+    """
+    Собирает ключ кэша ответа. В ключ явно входят: имя кэша, префикс с версией данных,
+    путь и отсортированные параметры запроса, а для VARY_USER ещё и идентификатор пользователя.
+    Заголовки (в том числе Authorization) в ключ не входят: права проверяются до обращения к кэшу.
+    """
+    parts = [request.path, json.dumps(_normalized_query(request), ensure_ascii=False)]
+    if vary == VARY_USER:
+        user = request.user
+        parts.append(f"user:{user.pk}" if user and user.is_authenticated else "anonymous")
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"response_cache:{name}:{prefix}:{digest}"
+
+
+def compute_etag(data):
+    """ETag по содержимому данных ответа (не зависит от формата вывода)"""
+    payload = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_cache_stats(names):
+    """Счётчики попаданий и промахов кэша ответов по именам кэшей"""
+    keys = {
+        (name, outcome): STATS_KEY.format(name, outcome)
+        for name in names for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(list(keys.values()))
+    return {
+        name: {outcome: values.get(keys[(name, outcome)], 0) for outcome in ('hits', 'misses')}
+        for name in names
+    }
+
+
+def _finalize(request, data, etag, vary):
+    """Формирует ответ (200 с данными или 304) с заголовками кэширования"""
+    if _etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    # Эндпоинты требуют аутентификации, поэтому общие прокси не должны хранить ответ
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Accept, Authorization' if vary == VARY_USER else 'Accept'
+    return response
+
+
+# Имена всех кэшей ответов, зарегистрированных через cache_response
+REGISTERED_CACHES = []
+
+
+def cache_response(name, prefix_func, timeout, vary=VARY_PUBLIC):
+    """
+    Декоратор методов ViewSet для кэширования ответов DRF.
+
+    prefix_func(view, request, *args, **kwargs) возвращает префикс ключа, обычно с версией данных,
+    поэтому инвалидация выполняется сменой версии без поиска ключей. В кэше хранятся данные
+    ответа и их ETag; при совпадении If-None-Match возвращается 304 без тела.
+    Кэшируются только успешные ответы (200).
+    """
+    if vary not in (VARY_PUBLIC, VARY_USER):
+        raise ValueError(f"Unknown vary mode: {vary}")
+    REGISTERED_CACHES.append(name)
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            cache_key = build_cache_key(name, prefix_func(view, request, *args, **kwargs), request, vary)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                _count(name, 'hits')
+                return _finalize(request, entry['data'], entry['etag'], vary)
+
+            _count(name, 'misses')
+            response = method(view, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            etag = compute_etag(response.data)
+            cache.set(cache_key, {'data': response.data, 'etag': etag}, timeout)
+            logger.debug(f"Response cached: {cache_key}")
+            return _finalize(request, response.data, etag, vary)
+        return wrapper
+    return decorator
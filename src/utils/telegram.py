@@ -0,0 +1,100 @@
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramError(Exception):
+    """Telegram отклонил сообщение (например, пользователь заблокировал бота); повтор не поможет"""
+
+
+class TelegramUnavailable(TelegramError):
+    """
+    Сообщение не отправлено по временной причине (сеть, 429/5xx, исчерпан лимит отправки).
+    retry_after — через сколько секунд Telegram разрешает повторить запрос, если он это сообщил.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TelegramClient:
+    """
+    Отправка сообщений через Bot API Telegram.
+
+    Запросы идут через общий для процесса requests.Session с пулом keep-alive соединений
+    и раздельными таймаутами подключения и чтения. Перед каждым запросом берётся токен
+    из общего для кластера ограничителя (TELEGRAM_RATE_LIMIT сообщений в секунду).
+    Адрес API задаётся настройкой TELEGRAM_API_URL, в тестах — локальный фейковый сервер.
+    """
+
+    timeout = (3, 10)  # подключение, чтение
+    # Сколько секунд сообщение готово ждать своей очереди у ограничителя
+    max_rate_limit_wait = 5
+    pool_size = 10
+
+    def __init__(self, api_url=None, token=None, rate_limit=None):
+        self.api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.token = token or settings.TELEGRAM_BOT_TOKEN
+        rate_limit = rate_limit or settings.TELEGRAM_RATE_LIMIT
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.rate_limiter = TokenBucket('telegram', rate=rate_limit, capacity=rate_limit)
+
+    def send_message(self, chat_id, text):
+        """Отправляет сообщение; при ошибке выбрасывает TelegramError или TelegramUnavailable"""
+        if not self.rate_limiter.acquire(self.max_rate_limit_wait):
+            raise TelegramUnavailable("Telegram rate limit exceeded")
+
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        try:
+            response = self.session.post(url, data={'chat_id': chat_id, 'text': text}, timeout=self.timeout)
+        except requests.RequestException as e:
+            # Текст исключения requests содержит URL с токеном бота: токен вырезается,
+            # исходное исключение не прикрепляется, чтобы токен не попал в логи и трейсбеки
+            reason = str(e).replace(self.token, '***') if self.token else str(e)
+            raise TelegramUnavailable(f"Telegram request failed: {type(e).__name__}: {reason}") from None
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = None
+            try:
+                retry_after = response.json().get('parameters', {}).get('retry_after')
+            except ValueError:
+                pass
+            raise TelegramUnavailable(f"Telegram responded with {response.status_code}", retry_after)
+        if not response.ok:
+            raise TelegramError(f"Telegram rejected message to {chat_id}: {response.status_code} {response.text}")
+        logger.debug(f"Telegram message sent to {chat_id}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_telegram_client():
+    """Клиент Telegram (создаётся один раз на процесс)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TelegramClient()
+    return _client
+
+
+@receiver(setting_changed)
+def reset_telegram_client(setting, **kwargs):
+    """Пересоздаёт клиент при изменении настроек (override_settings в тестах)"""
+    global _client
+    if setting in ('TELEGRAM_API_URL', 'TELEGRAM_BOT_TOKEN', 'TELEGRAM_RATE_LIMIT'):
+        _client = None
@@ -0,0 +1,74 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeTelegramServer:
+    """
+    Локальная замена Bot API Telegram для тестов.
+
+    Принимает sendMessage и запоминает сообщения в messages как (chat_id, text).
+    Первые fail_count запросов получают ответ fail_status (по умолчанию 429 с retry_after),
+    а chat_id из blocked_chats — 403, как для пользователя, заблокировавшего бота.
+    """
+
+    def __init__(self, fail_count=0, fail_status=429, retry_after=1, blocked_chats=()):
+        self.messages = []
+        self.requests = 0
+        self.fail_count = fail_count
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.blocked_chats = set(blocked_chats)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handle(self, path, data):
+        with self._lock:
+            self.requests += 1
+            if not path.endswith('/sendMessage'):
+                return 404, {'ok': False, 'description': 'Not Found'}
+            if self.requests <= self.fail_count:
+                return self.fail_status, {
+                    'ok': False, 'description': 'Too Many Requests',
+                    'parameters': {'retry_after': self.retry_after},
+                }
+            if data['chat_id'] in self.blocked_chats:
+                return 403, {'ok': False, 'description': 'Forbidden: bot was blocked by the user'}
+            self.messages.append((data['chat_id'], data['text']))
+            return 200, {'ok': True, 'result': {'message_id': len(self.messages)}}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                data = {key: values[0] for key, values in parse_qs(body).items()}
+                status, payload = fake._handle(self.path, data)
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+from celery.exceptions import Retry
+from django.test import SimpleTestCase, override_settings
+
+from apps.booking.tasks import send_telegram_messages
+from utils.telegram import TelegramError, TelegramUnavailable, get_telegram_client
+from utils.tests.fake_telegram import FakeTelegramServer
+
+
+class TelegramClientTest(SimpleTestCase):
+    """Тесты клиента Telegram на локальном фейковом Bot API"""
+
+    def run_with(self, server):
+        server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        settings_override = override_settings(TELEGRAM_API_URL=server.url, TELEGRAM_RATE_LIMIT=1000)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return server
+
+    def test_message_is_delivered(self):
+        """Сообщение доходит до Bot API, соединения переиспользуются одним клиентом"""
+        server = self.run_with(FakeTelegramServer())
+        client = get_telegram_client()
+
+        client.send_message('111', 'Первое')
+        client.send_message('222', 'Второе')
+
+        self.assertIs(get_telegram_client(), client)
+        self.assertEqual(server.messages, [('111', 'Первое'), ('222', 'Второе')])
+
+    def test_too_many_requests_is_temporary(self):
+        """429 — временная ошибка с retry_after из ответа Telegram"""
+        self.run_with(FakeTelegramServer(fail_count=1, retry_after=7))
+
+        with self.assertRaises(TelegramUnavailable) as context:
+            get_telegram_client().send_message('111', 'Текст')
+
+        self.assertEqual(context.exception.retry_after, 7)
+
+    @override_settings(TELEGRAM_BOT_TOKEN='123456:secret-token')
+    def test_network_error_does_not_expose_token(self):
+        """Ошибка сети — временная, а токен бота из URL запроса не попадает в текст исключения"""
+        server = self.run_with(FakeTelegramServer())
+        server.__exit__(None, None, None)
+
+        with self.assertRaises(TelegramUnavailable) as context:
+            get_telegram_client().send_message('111', 'Текст')
+
+        self.assertNotIn('secret-token', str(context.exception))
+        self.assertIsNone(context.exception.__cause__)
+        self.assertTrue(context.exception.__suppress_context__)
+
+    def test_blocked_chat_is_rejected(self):
+        """403 — постоянная ошибка, повтор не нужен"""
+        self.run_with(FakeTelegramServer(blocked_chats={'111'}))
+
+        with self.assertRaises(TelegramError) as context:
+            get_telegram_client().send_message('111', 'Текст')
+
+        self.assertNotIsInstance(context.exception, TelegramUnavailable)
+
+    def test_task_drops_rejected_messages(self):
+        """Отклонённое сообщение пропускается, остальные сообщения пакета доставляются"""
+        server = self.run_with(FakeTelegramServer(blocked_chats={'111'}))
+
+        delivered = send_telegram_messages([['111', 'Первое'], ['222', 'Второе']])
+
+        self.assertEqual(delivered, 1)
+        self.assertEqual(server.messages, [('222', 'Второе')])
+
+    def test_task_retries_undelivered_messages(self):
+        """При 429 недоставленный остаток пакета повторяется не раньше retry_after"""
+        self.run_with(FakeTelegramServer(fail_count=1, retry_after=30))
+        messages = [['111', 'Первое'], ['222', 'Второе']]
+
+        with patch.object(send_telegram_messages, 'retry', side_effect=Retry()) as mock_retry:
+            with self.assertRaises(Retry):
+                send_telegram_messages(messages)
+
+        mock_retry.assert_called_once_with(args=[messages], countdown=30)